@@ -11,6 +11,7 @@ import threading
 import traceback
 import time
 import queue
+import multiprocessing
 from typing import Dict, Any, Optional
 
 # 设置环境变量以避免PyTorch的pin_memory警告
@@ -90,19 +91,18 @@ def command_listener(device_manager: DeviceManager, logger: logging.Logger):
             except queue.Empty:
                 continue
                 
-            # 广播命令到所有设备
-            for device_state in device_manager.device_states.values():
+            # 广播命令到所有设备（设备守护可能同时增加设备，遍历副本）
+            for device_state in list(device_manager.device_states.values()):
                 device_state.command_queue.put(cmd)
             
             # 处理全局命令
             if cmd == 'e':
                 logger.info("收到退出命令，正在停止所有设备...")
-                for device_state in device_manager.device_states.values():
-                    device_state.script_running = False
+                device_manager.stop_all_devices()
                 break
             elif cmd == 's':
                 logger.info("显示所有设备统计信息:")
-                for serial, device_state in device_manager.device_states.items():
+                for serial, device_state in list(device_manager.device_states.items()):
                     logger.info(f"\n--- 设备 {serial} 统计 ---")
                     device_state.show_round_statistics()
                     
@@ -196,4 +196,6 @@ def main(enable_command_listener=True):
 
 
 if __name__ == "__main__":
+    # 打包后的程序以进程模式运行设备时需要
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -9,6 +9,7 @@ import sys
 import os
 import logging
 import queue
+import multiprocessing
 
 # 添加src目录到系统路径
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
@@ -28,6 +29,9 @@ def setup_logging():
     return logger
 
 if __name__ == "__main__":
+    # 打包后的程序以进程模式运行设备时需要
+    multiprocessing.freeze_support()
+
     # 设置日志
     logger = setup_logging()
     logger.info("=== Shadowverse Automation UI 启动 ===")
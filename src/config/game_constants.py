@@ -20,6 +20,13 @@ OUR_ATKHP_REGION=(263, 470, 1015, 480)
 # 敌方护盾检测区域 (左上角x, 左上角y, 右下角x, 右下角y)
 ENEMY_SHIELD_REGION = (164, 136, 1096, 228)
 
+# 手牌区域，用于等待手牌展开动画结束
+HAND_CARDS_REGION = (229, 539, 1130, 710)
+
+# 敌方场地区域（随从卡面到攻击力/血量数字），用于判断推测扫描结果是否仍然有效
+ENEMY_BOARD_REGION = (164, 136, 1096, 310)
+SPECULATIVE_SIMILARITY_THRESHOLD = 0.98  # 缩略图未变化像素比例不低于该值视为场面未变
+
 # 敌方随从位置偏移
 ENEMY_FOLLOWER_OFFSET_X = -50  # 从血量中心到随从中心的X偏移
 ENEMY_FOLLOWER_OFFSET_Y = -70  # 从血量中心到随从中心的Y偏移
@@ -49,6 +56,10 @@ BLANK_CLICK_RANDOM = 2  # 随机偏移范围
 OCR_CROP_SIZE = 45  # 用于血量识别的裁剪区域大小
 OCR_CROP_HALF_SIZE = OCR_CROP_SIZE // 2  # 裁剪区域的一半大小
 
+# 随从数字模板识别参数（模板结果不明确时才使用OCR）
+DIGIT_TEMPLATE_MIN_SCORE = 0.75   # 最佳模板相关系数下限
+DIGIT_TEMPLATE_MIN_MARGIN = 0.08  # 最佳数值与次佳数值的相关系数差距下限
+
 # ============================= HSV颜色范围 =============================
 
 # 敌方随从血量颜色（红色）
@@ -156,6 +167,9 @@ SHIELD_FOLLOWER_NAMES = [
     "鸣咽的圣骑士维尔伯特"
 ]
 PYRAMID_LEVELS = 2
+PYRAMID_MIN_TEMPLATE_SIZE = 12        # 降采样后模板短边小于该值时不再使用更高层
+PYRAMID_MIN_SEARCH_POSITIONS = 20000  # 搜索位置数少于该值时直接原图匹配
+PYRAMID_REJECT_MARGIN = 0.3           # 粗匹配得分低于(阈值-该值)时直接判定未命中
 
 # 角度匹配参数
 ANGLE_RANGE = 30        # 角度搜索范围
@@ -164,6 +178,10 @@ ANGLE_STEPS = [5.0, 1.0, 0.2]  # 三级角度扫描步长
 # 模板匹配阈值
 TEMPLATE_MATCH_THRESHOLD = 0.85
 
+# 模板搜索区域参数（按钮检测只在学习到的区域内匹配）
+TEMPLATE_ROI_MARGIN = 24           # 学习到的搜索区域向外扩展的像素
+TEMPLATE_ROI_FALLBACK_MISSES = 10  # 区域内连续未命中N次后回退全图搜索一次
+
 # ============================= 调试参数 =============================
 
 # 调试绘制参数
@@ -221,6 +239,19 @@ TIMEOUTS = {
     "screenshot_delay": 0.05,   # 截图延迟
 }
 
+# 主循环各场景的检测间隔 (最小间隔, 最大间隔)（秒），键为场景分类器的场景名
+# 本轮有操作或场景切换时使用最小间隔，空闲时按退避系数增长到最大间隔
+TICK_INTERVALS = {
+    "unknown": (0.5, 1.0),
+    "lobby": (0.5, 2.0),          # 大厅/登录
+    "matchmaking": (1.0, 3.0),    # 排队匹配、加载
+    "mulligan": (0.3, 1.0),       # 换牌
+    "my_turn": (0.2, 0.6),        # 我方回合
+    "enemy_turn": (0.3, 1.0),     # 敌方回合（最大间隔不超过原固定1秒，不增加结束回合按钮的发现延迟）
+    "result": (0.2, 0.8),         # 结算界面
+}
+TICK_BACKOFF_FACTOR = 1.5  # 空闲时间隔增长倍数
+
 # ============================= 文件路径 =============================
 
 # 模板文件路径
@@ -40,11 +40,21 @@ DISCLAIMER = """
 DEFAULT_CONFIG = {
     "adb_port": 16384,
     "extra_templates_dir": "extra_templates",
+    "worker_mode": "thread",  # 设备运行模式: thread(线程) / process(每个设备独立进程) / async(asyncio协程)
+    "auto_discover_devices": False,  # 是否同时启动adb可见但未写入devices的设备
     "auto_restart": {
         "enabled": True,
         "output_timeout": 300,  # 5分钟无输出超时（秒）
         "match_timeout": 1200    # 20分钟无新战斗超时（秒）
     },
+    "supervisor": {
+        "enabled": True,
+        "check_interval": 5,           # 检查间隔（秒）
+        "heartbeat_timeout": 600,      # 主循环10分钟无心跳判定为卡死（秒）
+        "restart_backoff_base": 5,     # 第一次重启前等待（秒），连续失败逐次翻倍
+        "restart_backoff_max": 300,    # 重启等待上限（秒）
+        "watch_config": True           # 配置文件修改后自动启动新增设备、停止移除的设备
+    },
     "devices": [
         {
             "name": "MuMu模拟器",
@@ -73,7 +83,10 @@ DEFAULT_CONFIG = {
     "templates": {
         "threshold": 0.85,
         "pyramid_levels": 2,
-        "edge_thresholds": [50, 200]
+        "edge_thresholds": [50, 200],
+        "roi_margin": 24,
+        "roi_fallback_misses": 10,
+        "search_regions": {}
     }
 }
 
@@ -0,0 +1,265 @@
+"""
+asyncio设备调度器
+worker_mode 为 "async" 时所有设备的主循环作为协程运行在同一个事件循环中：
+空闲等待和截图是异步的，不占用线程；识别和回合操作等阻塞逻辑交给有上限的线程池执行
+"""
+
+import asyncio
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from src.device.capture_backend import AdbRawCaptureBackend, find_adb_path
+from src.device.tick_scheduler import AdaptiveTickScheduler
+from src.game.game_manager import GameManager
+from src.utils.frame import Frame
+
+logger = logging.getLogger(__name__)
+
+WORKER_MODE_ASYNC = "async"
+
+# 异步截图超时时间（秒）
+ASYNC_CAPTURE_TIMEOUT = 5.0
+
+
+class AsyncDeviceOrchestrator:
+    """
+    asyncio设备调度器
+
+    - 每个设备一个协程：命令队列检查、暂停、节拍等待都在事件循环中完成
+    - 截图通过异步子进程 `adb exec-out screencap` 读取原始帧缓冲
+    - 按钮识别与处理（包括整个回合的操作）在线程池中执行，线程数有上限，
+      设备数量远多于线程数时，空闲设备不占用任何线程
+    """
+
+    def __init__(self, device_manager, max_workers: Optional[int] = None):
+        """
+        Args:
+            device_manager: DeviceManager（复用其连接、命令处理和游戏逻辑）
+            max_workers: 阻塞逻辑线程池的线程数，默认max(设备数, min(8, CPU核心数))，
+                每个设备的回合逻辑会占用一个线程直到回合结束，线程数少于设备数时其余设备会排队等待
+        """
+        self.device_manager = device_manager
+        self.max_workers = max_workers
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.adb_path = find_adb_path()
+        # 运行中的事件循环和各设备的协程任务（运行时增加设备、停止设备用）
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._pending_serials = set()
+        # 各设备在线程池中尚未执行完的阻塞调用数（取消协程不会中断已在执行的调用）
+        self._busy_calls: Dict[str, int] = {}
+        self._busy_lock = threading.Lock()
+        # 异步截图失败后改用同步截图的设备
+        self._sync_capture_devices = set()
+
+        # 统计
+        self.async_captures = 0
+        self.sync_captures = 0
+        self.total_capture_time = 0.0
+
+    def run(self, devices: List[tuple]):
+        """
+        运行所有设备直到全部结束（阻塞，在调度线程中调用）
+
+        Args:
+            devices: [(设备配置, DeviceState)]
+        """
+        if not self.max_workers:
+            self.max_workers = max(len(devices), min(8, os.cpu_count() or 4))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="DeviceAction")
+        try:
+            asyncio.run(self._run_all(devices))
+        finally:
+            self._loop = None
+            self.executor.shutdown(wait=False)
+
+    async def _run_all(self, devices: List[tuple]):
+        logger.info(f"asyncio调度器启动: {len(devices)} 个设备, 阻塞逻辑线程池 {self.max_workers} 线程")
+        self._loop = asyncio.get_running_loop()
+        for device_config, device_state in devices:
+            self._spawn(device_config, device_state)
+        # 运行期间可能加入新设备，直到所有设备协程结束
+        while self._tasks:
+            await asyncio.wait(list(self._tasks.values()), return_when=asyncio.FIRST_COMPLETED)
+        self._loop = None
+
+    def _spawn(self, device_config: Dict[str, Any], device_state):
+        """在事件循环中创建设备协程"""
+        serial = device_config["serial"]
+        self._pending_serials.discard(serial)
+        task = asyncio.ensure_future(self._device_task(device_config, device_state))
+        self._tasks[serial] = task
+
+        def _on_done(done_task, serial=serial):
+            if self._tasks.get(serial) is done_task:
+                del self._tasks[serial]
+        task.add_done_callback(_on_done)
+
+    def add_device(self, device_config: Dict[str, Any], device_state) -> bool:
+        """
+        在运行中的事件循环里加入设备（可从其他线程调用）
+
+        Returns:
+            bool: 调度器未在运行时返回False，需要重新启动调度线程
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return False
+        self._pending_serials.add(device_config["serial"])
+        try:
+            loop.call_soon_threadsafe(self._spawn, device_config, device_state)
+        except RuntimeError:
+            self._pending_serials.discard(device_config["serial"])
+            return False
+        return True
+
+    def cancel_device(self, serial: str):
+        """取消设备协程（用于卡死的设备，可从其他线程调用）"""
+        loop = self._loop
+        task = self._tasks.get(serial)
+        if loop is not None and task is not None:
+            loop.call_soon_threadsafe(task.cancel)
+
+    def is_device_running(self, serial: str) -> bool:
+        """设备协程或其阻塞调用是否仍在运行（包括已提交尚未创建的协程）"""
+        with self._busy_lock:
+            busy = serial in self._busy_calls
+        return busy or serial in self._tasks or serial in self._pending_serials
+
+    async def _run_blocking(self, fn, *args, serial: Optional[str] = None):
+        """在线程池中执行阻塞函数，指定serial时记录该设备尚未结束的调用"""
+        future = self.executor.submit(fn, *args)
+        if serial is not None:
+            with self._busy_lock:
+                self._busy_calls[serial] = self._busy_calls.get(serial, 0) + 1
+            future.add_done_callback(lambda _future: self._release_busy(serial))
+        return await asyncio.wrap_future(future)
+
+    def _release_busy(self, serial: str):
+        with self._busy_lock:
+            count = self._busy_calls.get(serial, 0) - 1
+            if count > 0:
+                self._busy_calls[serial] = count
+            else:
+                self._busy_calls.pop(serial, None)
+
+    async def _device_task(self, device_config: Dict[str, Any], device_state):
+        """单个设备的协程，对应线程模式的 _device_worker"""
+        serial = device_config["serial"]
+        manager = self.device_manager
+        try:
+            logger.info(f"设备 {serial} 协程开始")
+            if not await self._run_blocking(manager._connect_device, device_config, device_state, serial=serial):
+                error_msg = f"无法连接设备: {serial}"
+                logger.error(error_msg)
+                manager.notification_manager.show_error(f"设备连接错误: {serial}", error_msg)
+                return
+
+            game_manager = await self._run_blocking(GameManager, device_state, serial=serial)
+            device_state.game_manager = game_manager
+            await self._device_loop(device_state, game_manager)
+        except Exception as e:
+            logger.exception(f"设备 {serial} 协程异常: {str(e)}")
+        finally:
+            await self._run_blocking(manager._cleanup_device, device_state, serial=serial)
+            logger.info(f"设备 {serial} 协程结束")
+
+    async def _device_loop(self, device_state, game_manager):
+        """设备主循环，与 DeviceManager._run_device_loop 的行为一致"""
+        manager = self.device_manager
+        device_state.logger.info("设备主循环开始 (asyncio)")
+
+        init_screenshot = await self._capture(device_state)
+        await self._run_blocking(manager._detect_initial_state, device_state, game_manager, init_screenshot,
+                                 serial=device_state.serial)
+
+        skip_buttons = ['enemy_round']
+        tick_scheduler = AdaptiveTickScheduler(device_state.device_config.get('tick_intervals'))
+        device_state.tick_scheduler = tick_scheduler
+
+        while device_state.script_running:
+            start_time = time.time()
+            device_state.last_heartbeat = start_time
+
+            if await self._run_blocking(device_state.check_timeout_and_restart, serial=device_state.serial):
+                await asyncio.sleep(30)
+                continue
+
+            # 命令队列语义与线程模式相同：每轮开始时处理全部待处理命令
+            while not device_state.command_queue.empty():
+                cmd = device_state.command_queue.get()
+                manager._handle_command(device_state, cmd)
+
+            if device_state.script_paused:
+                device_state.logger.debug("脚本暂停中...输入 'r' 继续")
+                await asyncio.sleep(1)
+                continue
+
+            screenshot = await self._capture(device_state)
+            if screenshot is None:
+                await asyncio.sleep(2)
+                continue
+            acted = await self._run_blocking(manager._process_game_logic, device_state, game_manager,
+                                             skip_buttons, screenshot, serial=device_state.serial)
+
+            process_time = time.time() - start_time
+            interval = tick_scheduler.next_interval(game_manager.scene_classifier.scene, acted)
+            await asyncio.sleep(max(0.0, interval - process_time))
+
+    def _use_async_capture(self, device_state) -> bool:
+        """截图预取、独立截图进程和深色截图方法仍使用设备自身的截图方式"""
+        config = device_state.device_config
+        return (device_state.serial not in self._sync_capture_devices
+                and device_state.capture_pipeline is None
+                and not config.get('screenshot_deep_color', False))
+
+    async def _capture(self, device_state) -> Optional[Frame]:
+        """截图：优先异步读取原始帧缓冲，失败后该设备改用线程池中的同步截图"""
+        start_time = time.time()
+        if self._use_async_capture(device_state):
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    self.adb_path, "-s", device_state.serial, "exec-out", "screencap",
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+                )
+                try:
+                    data, _ = await asyncio.wait_for(process.communicate(), timeout=ASYNC_CAPTURE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    raise
+                frame = AdbRawCaptureBackend._decode(data)
+                frame.timestamp = start_time
+                self.async_captures += 1
+                self.total_capture_time += time.time() - start_time
+                return frame
+            except Exception as e:
+                device_state.logger.warning(f"异步截图失败，该设备改用同步截图: {str(e)}")
+                self._sync_capture_devices.add(device_state.serial)
+
+        frame = await self._run_blocking(device_state.take_screenshot, serial=device_state.serial)
+        self.sync_captures += 1
+        self.total_capture_time += time.time() - start_time
+        return frame
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度器统计信息"""
+        captures = self.async_captures + self.sync_captures
+        return {
+            'max_workers': self.max_workers,
+            'async_captures': self.async_captures,
+            'sync_captures': self.sync_captures,
+            'avg_capture_time': self.total_capture_time / captures if captures else 0.0,
+            'executor_queue': self.executor._work_queue.qsize() if self.executor else 0,
+        }
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出调度器统计信息"""
+        log = target_logger or logger
+        stats = self.get_stats()
+        log.info(f"asyncio调度器: 线程池 {stats['max_workers']} 线程 (排队 {stats['executor_queue']}), "
+                 f"异步截图 {stats['async_captures']} 次, 同步截图 {stats['sync_captures']} 次, "
+                 f"平均截图耗时 {stats['avg_capture_time'] * 1000:.0f}ms")
@@ -0,0 +1,155 @@
+"""
+截图后端
+提供可插拔的设备截图方式：PNG截图(adb screencap -p) 和 原始帧缓冲(screencap 不编码)
+"""
+
+import os
+import shutil
+import struct
+import threading
+import logging
+from typing import Any, Optional
+import cv2
+import numpy as np
+from src.utils.frame import Frame
+
+logger = logging.getLogger(__name__)
+
+# screencap 原始输出的像素格式
+PIXEL_FORMAT_RGBA_8888 = 1
+PIXEL_FORMAT_RGBX_8888 = 2
+
+
+def find_adb_path() -> str:
+    """获取adb可执行文件路径（优先使用adbutils自带的adb）"""
+    try:
+        from adbutils import adb_path
+        path = adb_path()
+        if path and os.path.exists(path):
+            return path
+    except Exception:
+        pass
+    return shutil.which("adb") or "adb"
+
+
+class ScreenCaptureBackend:
+    """截图后端基类"""
+
+    name = "base"
+
+    def __init__(self, device_state):
+        self.device_state = device_state
+
+    def capture(self) -> Optional[Any]:
+        """执行一次截图，返回PIL图像或Frame，失败返回None"""
+        raise NotImplementedError
+
+
+class AdbPngCaptureBackend(ScreenCaptureBackend):
+    """通过 adbutils 的 screenshot() 截图（设备端PNG编码，主机端解码）"""
+
+    name = "png"
+
+    def capture(self) -> Optional[Any]:
+        adb_device = self.device_state.adb_device
+        if adb_device is None:
+            return None
+        return adb_device.screenshot()
+
+
+class AdbRawCaptureBackend(ScreenCaptureBackend):
+    """
+    读取 screencap 的原始RGBA帧缓冲，省去设备端PNG编码和主机端PNG解码。
+    原始数据直接从adb连接读入本线程复用的缓冲区，转换为BGR后缓冲区即可用于下一次截图。
+    解析失败时自动回退到PNG截图。
+    """
+
+    name = "raw"
+
+    def __init__(self, device_state):
+        super().__init__(device_state)
+        self._fallback = AdbPngCaptureBackend(device_state)
+        self._use_fallback = False
+        # 复用的帧缓冲读取缓冲区，按需扩容；预取线程和同步截图可能同时截图，每个线程各用一个
+        self._local = threading.local()
+
+    def capture(self) -> Optional[Any]:
+        adb_device = self.device_state.adb_device
+        if adb_device is None:
+            return None
+        if self._use_fallback:
+            return self._fallback.capture()
+        try:
+            return self._decode(self._read_raw(adb_device))
+        except Exception as e:
+            self.device_state.logger.warning(f"原始帧缓冲截图失败，改用PNG截图: {str(e)}")
+            self._use_fallback = True
+            return self._fallback.capture()
+
+    def _read_raw(self, adb_device):
+        """读取 screencap 原始输出（优先exec通道，避免shell终端转换换行符）"""
+        try:
+            conn = adb_device.open_transport()
+            try:
+                conn.send_command("exec:screencap")
+                conn.check_okay()
+                sock = getattr(conn, "conn", None)
+                if sock is None:
+                    return conn.read_until_close(encoding=None)
+                return self._recv_into_buffer(sock)
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.debug(f"exec通道读取帧缓冲失败，改用shell: {str(e)}")
+            return adb_device.shell("screencap", encoding=None, rstrip=False)
+
+    def _recv_into_buffer(self, sock) -> memoryview:
+        """把连接中的数据读到关闭为止，写入本线程复用的缓冲区，返回有效数据部分"""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = bytearray()
+        size = 0
+        while True:
+            if size == len(buffer):
+                # 第一次截图或分辨率变大时扩容，之后的截图不再分配内存
+                buffer.extend(bytes(max(len(buffer), 1 << 20)))
+            received = sock.recv_into(memoryview(buffer)[size:])
+            if received == 0:
+                return memoryview(buffer)[:size]
+            size += received
+
+    @staticmethod
+    def _decode(data) -> Frame:
+        """
+        解析 screencap 原始数据: 头部(宽, 高, 格式[, 色彩空间]) + RGBA像素
+
+        data 可能是复用的读取缓冲区，返回的Frame持有转换后的BGR副本，不引用data
+        """
+        if not data or len(data) < 12:
+            raise ValueError("帧缓冲数据为空")
+        width, height, pixel_format = struct.unpack_from('<III', data, 0)
+        pixel_bytes = width * height * 4
+        header_size = len(data) - pixel_bytes
+        if header_size not in (12, 16):
+            raise ValueError(f"帧缓冲数据长度异常: {len(data)} (尺寸 {width}x{height})")
+        if pixel_format not in (PIXEL_FORMAT_RGBA_8888, PIXEL_FORMAT_RGBX_8888):
+            raise ValueError(f"不支持的像素格式: {pixel_format}")
+        # 在原始字节上建立数组视图，一次转换为BGR
+        rgba = np.frombuffer(data, dtype=np.uint8, count=pixel_bytes, offset=header_size).reshape(height, width, 4)
+        return Frame(bgr=cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR))
+
+
+CAPTURE_BACKENDS = {
+    AdbPngCaptureBackend.name: AdbPngCaptureBackend,
+    AdbRawCaptureBackend.name: AdbRawCaptureBackend,
+}
+
+
+def create_capture_backend(device_state) -> ScreenCaptureBackend:
+    """根据设备配置 screenshot_backend 创建截图后端，默认使用PNG截图"""
+    backend_name = device_state.device_config.get('screenshot_backend', AdbPngCaptureBackend.name)
+    backend_cls = CAPTURE_BACKENDS.get(backend_name)
+    if backend_cls is None:
+        device_state.logger.warning(f"未知的截图后端 '{backend_name}'，使用PNG截图")
+        backend_cls = AdbPngCaptureBackend
+    return backend_cls(device_state)
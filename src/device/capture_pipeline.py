@@ -0,0 +1,180 @@
+"""
+截图预取管线
+每个设备一个后台截图线程，最新帧保存在双缓冲中，识别代码取帧时无需等待完整的ADB截图往返
+"""
+
+import threading
+import time
+import logging
+from typing import Dict, Optional
+
+from src.utils.frame import Frame
+
+logger = logging.getLogger(__name__)
+
+
+class CapturePipeline:
+    """
+    截图预取管线（生产者：后台截图线程；消费者：识别代码）
+
+    后台线程只在最近有取帧请求时连续截图，空闲一段时间后自动暂停，避免无谓占用ADB带宽。
+    """
+
+    def __init__(self, device_state, min_interval: float = 0.0, idle_timeout: float = 3.0):
+        """
+        Args:
+            device_state: 设备状态对象（提供同步截图方法 capture_frame）
+            min_interval: 两次截图开始之间的最小间隔（秒）
+            idle_timeout: 超过该时间没有取帧请求则暂停截图（秒）
+        """
+        self.device_state = device_state
+        self.min_interval = min_interval
+        self.idle_timeout = idle_timeout
+
+        # 双缓冲：生产者写入后台缓冲后交换，消费者只读取前台缓冲
+        self._buffers = [None, None]
+        self._front = 0
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._last_request = 0.0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        # 统计
+        self.frames_captured = 0
+        self.frames_served = 0
+        self.capture_failures = 0
+        self.total_capture_time = 0.0
+        self.total_staleness = 0.0
+        self.max_staleness = 0.0
+        self.total_wait_time = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """启动后台截图线程"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"Capture-{self.device_state.serial}", daemon=True)
+        self._thread.start()
+        self.device_state.logger.info("截图预取管线已启动")
+
+    def stop(self):
+        """停止后台截图线程"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def _run(self):
+        """后台截图循环"""
+        while self._running and self.device_state.script_running:
+            with self._cond:
+                # 没有取帧需求时暂停
+                while self._running and time.time() - self._last_request > self.idle_timeout:
+                    self._cond.wait(timeout=0.5)
+                if not self._running:
+                    break
+
+            start_time = time.time()
+            try:
+                frame = self.device_state.capture_frame()
+            except Exception as e:
+                frame = None
+                self.device_state.logger.error(f"预取截图失败: {str(e)}")
+            capture_time = time.time() - start_time
+
+            if frame is None:
+                self.capture_failures += 1
+                time.sleep(0.1)
+                continue
+
+            with self._cond:
+                self._seq += 1
+                frame.seq = self._seq
+                back = 1 - self._front
+                self._buffers[back] = frame
+                self._front = back
+                self.frames_captured += 1
+                self.total_capture_time += capture_time
+                self._cond.notify_all()
+
+            remaining = self.min_interval - (time.time() - start_time)
+            if remaining > 0:
+                time.sleep(remaining)
+
+        self._running = False
+
+    def latest(self) -> Optional[Frame]:
+        """获取最新帧（不等待），同时标记有取帧需求"""
+        with self._cond:
+            self._mark_request()
+            return self._buffers[self._front]
+
+    def get_frame_after(self, timestamp: float, timeout: float = 2.0) -> Optional[Frame]:
+        """
+        获取截图开始时间不早于timestamp的最新帧
+
+        Args:
+            timestamp: 帧的最早截图开始时间
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            Optional[Frame]: 满足条件的帧，超时返回None
+        """
+        wait_start = time.time()
+        deadline = wait_start + timeout
+        with self._cond:
+            self._mark_request()
+            while True:
+                frame = self._buffers[self._front]
+                if frame is not None and frame.timestamp >= timestamp:
+                    self._record_served(frame, time.time() - wait_start)
+                    return frame
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._cond.wait(timeout=remaining)
+
+    def _mark_request(self):
+        """记录取帧请求并唤醒暂停中的截图线程（调用方需持有锁）"""
+        was_idle = time.time() - self._last_request > self.idle_timeout
+        self._last_request = time.time()
+        if was_idle:
+            self._cond.notify_all()
+
+    def _record_served(self, frame: Frame, waited: float):
+        """记录一次取帧的等待时间和帧的陈旧程度（调用方需持有锁）"""
+        staleness = time.time() - frame.timestamp
+        self.frames_served += 1
+        self.total_wait_time += waited
+        self.total_staleness += staleness
+        self.max_staleness = max(self.max_staleness, staleness)
+
+    def get_stats(self) -> Dict:
+        """获取管线统计信息"""
+        served = self.frames_served or 1
+        captured = self.frames_captured or 1
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_served': self.frames_served,
+            'capture_failures': self.capture_failures,
+            'avg_capture_time': self.total_capture_time / captured,
+            'avg_wait_time': self.total_wait_time / served,
+            'avg_staleness': self.total_staleness / served,
+            'max_staleness': self.max_staleness,
+        }
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出管线统计信息"""
+        log = target_logger or logger
+        stats = self.get_stats()
+        log.info(f"截图预取: 截图 {stats['frames_captured']} 帧 (失败 {stats['capture_failures']}), "
+                 f"取帧 {stats['frames_served']} 次, 平均截图耗时 {stats['avg_capture_time'] * 1000:.0f}ms, "
+                 f"平均等待 {stats['avg_wait_time'] * 1000:.0f}ms, "
+                 f"帧陈旧度 平均 {stats['avg_staleness'] * 1000:.0f}ms / 最大 {stats['max_staleness'] * 1000:.0f}ms")
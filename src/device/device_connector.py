@@ -0,0 +1,150 @@
+"""
+设备连接器
+启动时发现adb可见的设备，并发连接所有设备并预热uiautomator2代理；
+连接失败按指数退避加随机抖动重试，多台模拟器同时重连时不会挤在同一时刻
+"""
+
+import random
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 连接重试默认参数
+DEFAULT_CONNECT_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 1.0   # 第一次重试的基础等待（秒），之后每次翻倍
+DEFAULT_BACKOFF_MAX = 30.0   # 单次重试等待上限（秒）
+# 并发连接的最大线程数
+MAX_CONNECT_WORKERS = 16
+
+
+def discover_adb_devices() -> List[str]:
+    """返回adb可见且处于在线状态(device)的设备序列号"""
+    try:
+        from adbutils import adb
+        return [info.serial for info in adb.list() if info.state == "device"]
+    except Exception as e:
+        logger.warning(f"发现adb设备失败: {str(e)}")
+        return []
+
+
+def backoff_delay(attempt: int, base: float = DEFAULT_BACKOFF_BASE, max_delay: float = DEFAULT_BACKOFF_MAX) -> float:
+    """第attempt次重试前的等待时间：指数增长，在上限的50%~100%之间随机抖动"""
+    delay = min(max_delay, base * (2 ** (attempt - 1)))
+    return random.uniform(delay / 2, delay)
+
+
+class DeviceConnector:
+    """
+    设备连接器
+
+    - prepare() 在启动时把所有设备的连接和u2代理预热提交到线程池并发执行
+    - connect() 供设备工作线程调用：已预连接的设备直接取结果，否则当场连接
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            config: 全局配置，读取 connect_retries / connect_backoff_base / connect_backoff_max
+        """
+        config = config or {}
+        self.max_retries = config.get("connect_retries", DEFAULT_CONNECT_RETRIES)
+        self.backoff_base = config.get("connect_backoff_base", DEFAULT_BACKOFF_BASE)
+        self.backoff_max = config.get("connect_backoff_max", DEFAULT_BACKOFF_MAX)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        # 统计: serial -> {'attempts', 'connect_time', 'warmup_time', 'connected'}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def prepare(self, serials: List[str]):
+        """并发连接并预热所有设备（不阻塞）"""
+        serials = [serial for serial in serials if serial not in self._futures]
+        if not serials:
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=min(MAX_CONNECT_WORKERS, max(1, len(serials))),
+                                                    thread_name_prefix="DeviceConnect")
+            for serial in serials:
+                self._futures[serial] = self._executor.submit(self._connect_with_backoff, serial)
+        logger.info(f"开始并发连接 {len(serials)} 个设备")
+
+    def connect(self, serial: str, should_continue=None) -> Optional[Tuple[Any, Any]]:
+        """
+        获取设备连接，返回 (adb_device, u2_device)，连接失败返回None
+
+        Args:
+            serial: 设备序列号
+            should_continue: 可选的回调，返回False时放弃重试
+        """
+        with self._lock:
+            future = self._futures.pop(serial, None)
+        if future is not None:
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning(f"设备 {serial} 预连接异常: {str(e)}")
+                result = None
+            if result is not None:
+                return result
+            logger.info(f"设备 {serial} 预连接失败，重新连接")
+        return self._connect_with_backoff(serial, should_continue)
+
+    def _connect_with_backoff(self, serial: str, should_continue=None) -> Optional[Tuple[Any, Any]]:
+        """连接设备并预热u2代理，失败按指数退避加抖动重试"""
+        from adbutils import adb
+        import uiautomator2 as u2
+
+        stats = {'attempts': 0, 'connect_time': 0.0, 'warmup_time': 0.0, 'connected': False}
+        self._stats[serial] = stats
+        start_time = time.time()
+        for attempt in range(1, self.max_retries + 1):
+            stats['attempts'] = attempt
+            try:
+                adb_device = adb.device(serial)
+                if adb_device is None:
+                    raise RuntimeError(f"无法连接设备: {serial}")
+                # 确认设备在线，离线设备在这里就失败，不必等到u2连接超时
+                adb_device.shell("echo ok")
+
+                u2_device = u2.connect(serial)
+                warmup_start = time.time()
+                # 访问设备信息会确保代理已安装并启动，避免第一次点击或截图时才等待
+                u2_device.info
+                stats['warmup_time'] = time.time() - warmup_start
+                stats['connect_time'] = time.time() - start_time
+                stats['connected'] = True
+                logger.info(f"已连接设备: {serial} (第 {attempt} 次尝试, 耗时 {stats['connect_time']:.1f}s)")
+                return adb_device, u2_device
+            except Exception as e:
+                if attempt >= self.max_retries or (should_continue is not None and not should_continue()):
+                    break
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                logger.warning(f"连接设备 {serial} 失败，{delay:.1f}秒后重试 {attempt}/{self.max_retries}。错误: {str(e)}")
+                time.sleep(delay)
+
+        stats['connect_time'] = time.time() - start_time
+        logger.error(f"设备连接失败: {serial}")
+        return None
+
+    def shutdown(self):
+        """释放连接线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各设备的连接统计"""
+        return {serial: dict(stats) for serial, stats in self._stats.items()}
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出连接统计"""
+        log = target_logger or logger
+        for serial, stats in self.get_stats().items():
+            status = "成功" if stats['connected'] else "失败"
+            log.info(f"设备连接 {serial}: {status}, 尝试 {stats['attempts']} 次, "
+                     f"耗时 {stats['connect_time']:.1f}s (u2预热 {stats['warmup_time']:.1f}s)")
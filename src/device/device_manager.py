@@ -7,14 +7,20 @@ import threading
 import logging
 import time
 from adbutils import device
-import cv2
-import numpy as np
 import os
 import random
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from src.device.device_state import DeviceState
+from src.device.tick_scheduler import AdaptiveTickScheduler
+from src.device.process_worker import RemoteDeviceState, WORKER_MODE_THREAD, WORKER_MODE_PROCESS
+from src.device.async_orchestrator import AsyncDeviceOrchestrator, WORKER_MODE_ASYNC
+from src.device.device_connector import DeviceConnector, discover_adb_devices
+from src.device.supervisor import DeviceSupervisor
 from src.game.game_manager import GameManager
 from src.game.game_actions import GameActions
+from src.utils.frame import Frame
+from src.utils.vision_pool import VisionWorkerPool
+from src.utils.ocr_service import OcrServer, get_ocr_service
 
 logger = logging.getLogger(__name__)
 
@@ -25,71 +31,167 @@ class DeviceManager:
     def __init__(self, config_manager, notification_manager):
         self.config_manager = config_manager
         self.notification_manager = notification_manager
+        # 进程模式下为 RemoteDeviceState 代理
         self.device_states: Dict[str, DeviceState] = {}
         self.device_threads: Dict[str, threading.Thread] = {}
+        # 进程模式下向设备进程提供OCR的服务（主进程持有唯一的OCR模型）
+        self.ocr_server = None
+        # asyncio模式的调度器
+        self.orchestrator: Optional[AsyncDeviceOrchestrator] = None
+        # 设备连接器（启动时并发连接和预热）
+        self.connector = DeviceConnector(config_manager.config if config_manager else None)
+        # 设备守护（监控工作线程，崩溃或卡死时重启，运行时增删设备）
+        self.supervisor: Optional[DeviceSupervisor] = None
+        self.worker_mode = WORKER_MODE_THREAD
     
     def start_all_devices(self):
-        """启动所有设备"""
+        """启动所有设备，并按配置启动设备守护"""
         devices = self.config_manager.get_devices()
+        auto_discover = self.config_manager.config.get("auto_discover_devices", False)
         
-        if not devices:
+        if not devices and not auto_discover:
             error_msg = "配置文件中未找到设备列表，请添加设备配置"
             logger.error(error_msg)
             self.notification_manager.show_error("配置错误", error_msg)
             return
         
         logger.info(f"发现 {len(devices)} 个设备配置")
-        
-        # 优先启动标记为全局默认的设备
-        global_device = None
+
+        worker_mode = self.config_manager.config.get("worker_mode", WORKER_MODE_THREAD)
+        mode_names = {WORKER_MODE_THREAD: "线程", WORKER_MODE_PROCESS: "独立进程", WORKER_MODE_ASYNC: "asyncio协程"}
+        if worker_mode not in mode_names:
+            logger.warning(f"未知的运行模式 '{worker_mode}'，使用线程模式")
+            worker_mode = WORKER_MODE_THREAD
+        logger.info(f"设备运行模式: {mode_names[worker_mode]}")
+        self.worker_mode = worker_mode
+
+        selected_devices = self._select_devices()
+        global_devices = [device_config for device_config in selected_devices if device_config.get("is_global", False)]
+        if global_devices:
+            logger.info(f"优先启动全局默认设备: {global_devices[0]['serial']}")
+
+        # 进程模式下设备在各自进程中连接；其他模式先并发连接和预热所有设备，工作线程直接取用连接结果
+        if worker_mode != WORKER_MODE_PROCESS:
+            self.connector.prepare([device_config["serial"] for device_config in selected_devices])
+
+        if worker_mode == WORKER_MODE_ASYNC:
+            self._start_async_devices(selected_devices)
+        else:
+            for device_config in selected_devices:
+                self._start_device(device_config, worker_mode)
+
+        supervisor_config = self.config_manager.config.get("supervisor", {})
+        if supervisor_config.get("enabled", True):
+            self.supervisor = DeviceSupervisor(self, supervisor_config)
+            self.supervisor.supervise(selected_devices)
+            self.supervisor.start()
+
+    def _select_devices(self) -> List[Dict[str, Any]]:
+        """
+        按当前配置选择要运行的设备（启动时和设备守护重新加载配置时使用）
+
+        有标记为全局默认(is_global)的设备时只运行该设备，否则运行所有设备；
+        开启 auto_discover_devices 时加入adb可见但未配置的设备
+        """
+        devices = list(self.config_manager.get_devices())
+        if self.config_manager.config.get("auto_discover_devices", False):
+            devices.extend(self._discover_new_devices(devices))
+
         for device_config in devices:
-            if device_config.get("is_global", False):
-                global_device = device_config
-                break
-        
-        # 如果找到全局默认设备，只启动这个设备
-        if global_device:
-            serial = global_device.get("serial")
-            if serial:
-                logger.info(f"优先启动全局默认设备: {serial}")
-                
-                # 创建设备状态
-                device_state = DeviceState(serial, self.config_manager.config, global_device)
-                self.device_states[serial] = device_state
-                
-                # 启动设备工作线程
-                thread = threading.Thread(
-                    target=self._device_worker,
-                    args=(global_device, device_state),
-                    daemon=True
-                )
-                thread.start()
-                self.device_threads[serial] = thread
-                
-                logger.info(f"已启动设备线程: {serial}")
-                return
-        
-        # 如果没有全局默认设备，启动所有设备
+            if device_config.get("is_global", False) and device_config.get("serial"):
+                return [device_config]
+
+        selected_devices = []
         for device_config in devices:
-            serial = device_config.get("serial")
-            if not serial:
+            if not device_config.get("serial"):
                 logger.error("设备配置缺少serial字段")
                 continue
-            
-            # 创建设备状态
+            selected_devices.append(device_config)
+        return selected_devices
+
+    def _discover_new_devices(self, devices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """发现adb可见但不在配置中的设备，使用默认设备配置"""
+        known_serials = {device_config.get("serial") for device_config in devices}
+        discovered = []
+        for serial in discover_adb_devices():
+            if serial not in known_serials:
+                discovered.append({"name": serial, "serial": serial})
+        if discovered:
+            logger.debug(f"自动发现 {len(discovered)} 个未配置的设备: {', '.join(d['serial'] for d in discovered)}")
+        return discovered
+
+    def _start_async_devices(self, device_configs: List[Dict[str, Any]]):
+        """asyncio模式：所有设备作为协程运行在同一个调度线程的事件循环中"""
+        devices = []
+        for device_config in device_configs:
+            serial = device_config["serial"]
             device_state = DeviceState(serial, self.config_manager.config, device_config)
             self.device_states[serial] = device_state
-            
-            # 启动设备工作线程
+            devices.append((device_config, device_state))
+
+        if self.orchestrator is not None:
+            # 调度器仍在运行时直接加入其事件循环
+            devices = [(device_config, device_state) for device_config, device_state in devices
+                       if not self.orchestrator.add_device(device_config, device_state)]
+            if not devices:
+                logger.info(f"已加入asyncio调度器: {', '.join(c['serial'] for c in device_configs)}")
+                return
+
+        self.orchestrator = AsyncDeviceOrchestrator(self, self.config_manager.config.get("async_max_workers"))
+        thread = threading.Thread(target=self.orchestrator.run, args=(devices,), name="AsyncOrchestrator", daemon=True)
+        thread.start()
+        self.device_threads["asyncio"] = thread
+        logger.info(f"已启动asyncio调度线程: {len(devices)} 个设备")
+
+    def _start_device(self, device_config: Dict[str, Any], worker_mode: str = WORKER_MODE_THREAD):
+        """
+        启动单个设备
+
+        线程模式：在设备工作线程中直接运行主循环
+        进程模式：主循环在独立进程中运行，设备线程负责转发该进程的日志和事件
+        asyncio模式：加入调度器的事件循环（调度器已结束时重新启动）
+        """
+        serial = device_config["serial"]
+
+        if worker_mode == WORKER_MODE_ASYNC:
+            self._start_async_devices([device_config])
+            return
+
+        if worker_mode == WORKER_MODE_PROCESS:
+            if self.ocr_server is None:
+                try:
+                    self.ocr_server = OcrServer(get_ocr_service())
+                except Exception as e:
+                    logger.error(f"启动OCR服务失败，设备进程将各自加载OCR模型: {str(e)}")
+            device_state = RemoteDeviceState(serial, self.config_manager.config, device_config, self.ocr_server)
+            self.device_states[serial] = device_state
+            device_state.start()
+
             thread = threading.Thread(
-                target=self._device_worker,
-                args=(device_config, device_state),
+                target=device_state.relay_events,
+                args=(self.notification_manager,),
                 daemon=True
             )
             thread.start()
             self.device_threads[serial] = thread
-            
-            logger.info(f"已启动设备线程: {serial}")
+
+            logger.info(f"已启动设备进程: {serial} (PID: {device_state.process.pid})")
+            return
+
+        # 创建设备状态
+        device_state = DeviceState(serial, self.config_manager.config, device_config)
+        self.device_states[serial] = device_state
+
+        # 启动设备工作线程
+        thread = threading.Thread(
+            target=self._device_worker,
+            args=(device_config, device_state),
+            daemon=True
+        )
+        thread.start()
+        self.device_threads[serial] = thread
+
+        logger.info(f"已启动设备线程: {serial}")
     
     def _device_worker(self, device_config: Dict[str, Any], device_state: DeviceState):
         """设备工作线程"""
@@ -122,74 +224,33 @@ class DeviceManager:
             logger.info(f"设备 {serial} 工作线程结束")
     
     def _connect_device(self, device_config: Dict[str, Any], device_state: DeviceState) -> bool:
-        """连接设备"""
-        serial = device_config["serial"]
-        max_retries = 5
-        retry_delay = 10
-
-        for attempt in range(1, max_retries + 1):
-            try:
-                from adbutils import adb
-                import uiautomator2 as u2
-                
-                # 直接连接设备
-                adb_device = adb.device(serial)
-                if adb_device is None:
-                    raise RuntimeError(f"无法连接设备: {serial}")
-
-                # 同时返回 u2 设备对象
-                u2_device = u2.connect(serial)
-                device_state.u2_device = u2_device
-                device_state.adb_device = adb_device
-                
-                logger.info(f"已连接设备: {serial}")
-                return True
-
-            except Exception as e:
-                if attempt < max_retries:
-                    logger.warning(f"连接设备 {serial} 失败，重试 {attempt}/{max_retries}。错误: {str(e)}")
-                    time.sleep(retry_delay)
-                else:
-                    logger.error(f"设备连接失败: {serial}")
-                    return False
-        
-        return False
+        """连接设备（启动时已并发预连接的设备直接取用结果，失败按指数退避重试）"""
+        result = self.connector.connect(device_config["serial"], lambda: device_state.script_running)
+        if result is None:
+            return False
+        device_state.adb_device, device_state.u2_device = result
+        return True
     
     def _run_device_loop(self, device_state: DeviceState, game_manager: GameManager):
         """运行设备主循环"""
         device_state.logger.info("设备主循环开始")
         
         # 检测脚本启动时是否已经在对战中
-        device_state.logger.info("检测当前游戏状态...")
-        init_screenshot = device_state.take_screenshot()
-        if init_screenshot is not None:
-            # 转换为OpenCV格式
-            init_screenshot_np = np.array(init_screenshot)
-            init_screenshot_cv = cv2.cvtColor(init_screenshot_np, cv2.COLOR_RGB2BGR)
-            gray_init_screenshot = cv2.cvtColor(init_screenshot_cv, cv2.COLOR_BGR2GRAY)
-
-            # 加载模板
-            templates = game_manager.template_manager.load_templates(device_state.config)
-
-            # 检测是否已经在游戏中
-            if game_manager.detect_existing_match(gray_init_screenshot, templates):
-                # 设置本次运行的对战次数
-                device_state.current_run_matches = 1
-                device_state.in_match = True
-                device_state.logger.debug(f"本次运行对战次数: {device_state.current_run_matches} (包含已开始的对战)")
-            else:
-                device_state.logger.debug("未检测到进行中的对战")
-        else:
-            device_state.logger.warning("无法获取初始截图，跳过状态检测")
+        self._detect_initial_state(device_state, game_manager, device_state.take_screenshot())
 
         # 跳过按钮列表
         skip_buttons = ['enemy_round']
 
+        # 自适应节拍：按场景和最近是否有操作调整检测间隔
+        tick_scheduler = AdaptiveTickScheduler(device_state.device_config.get('tick_intervals'))
+        device_state.tick_scheduler = tick_scheduler
+
         # 主工作循环
         device_state.logger.debug("脚本初始化完成，开始运行...")
 
         while device_state.script_running:
             start_time = time.time()
+            device_state.last_heartbeat = start_time
 
             # 检查超时并重启游戏
             if device_state.check_timeout_and_restart():
@@ -209,51 +270,90 @@ class DeviceManager:
                 continue
 
             # 主要游戏逻辑
-            self._process_game_logic(device_state, game_manager, skip_buttons)
+            acted = self._process_game_logic(device_state, game_manager, skip_buttons)
 
-            # 计算处理时间并调整等待
+            # 计算处理时间，按场景和本轮是否有操作决定等待
             process_time = time.time() - start_time
-            sleep_time = max(0, 1 - process_time)
-            time.sleep(sleep_time)
+            tick_scheduler.sleep(game_manager.scene_classifier.scene, acted, process_time)
     
-    def _process_game_logic(self, device_state: DeviceState, game_manager: GameManager, skip_buttons: List[str]):
-        """处理游戏逻辑"""
+    def _detect_initial_state(self, device_state: DeviceState, game_manager: GameManager,
+                              init_screenshot: Optional[Frame]):
+        """检测脚本启动时是否已经在对战中"""
+        device_state.logger.info("检测当前游戏状态...")
+        if init_screenshot is not None:
+            gray_init_screenshot = init_screenshot.gray
+
+            # 加载模板
+            templates = game_manager.template_manager.load_templates(device_state.config)
+
+            # 检测是否已经在游戏中
+            if game_manager.detect_existing_match(gray_init_screenshot, templates):
+                # 设置本次运行的对战次数
+                device_state.current_run_matches = 1
+                device_state.in_match = True
+                device_state.logger.debug(f"本次运行对战次数: {device_state.current_run_matches} (包含已开始的对战)")
+            else:
+                device_state.logger.debug("未检测到进行中的对战")
+        else:
+            device_state.logger.warning("无法获取初始截图，跳过状态检测")
+
+    def _process_game_logic(self, device_state: DeviceState, game_manager: GameManager, skip_buttons: List[str],
+                            screenshot: Optional[Frame] = None) -> bool:
+        """
+        处理游戏逻辑
+
+        Args:
+            screenshot: 已获取的截图（asyncio模式异步截图后传入），None表示在此截图
+
+        Returns:
+            bool: 本轮是否处理了按钮（跳过按钮不算），用于调整主循环节拍
+        """
         # 获取截图
-        screenshot = device_state.take_screenshot()
+        if screenshot is None:
+            screenshot = device_state.take_screenshot()
         if screenshot is None:
             time.sleep(2)
-            return
+            return False
 
-        # 转换为OpenCV格式
-        screenshot_np = np.array(screenshot)
-        screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-        gray_screenshot = cv2.cvtColor(screenshot_cv, cv2.COLOR_BGR2GRAY)
+        # 灰度图由Frame按需计算并缓存
+        gray_screenshot = screenshot.gray
 
-        # 检查其他按钮
+        # 检查其他按钮（由场景分类器决定检测顺序并跳过当前场景不可能出现的按钮）
         button_detected = False
+        any_hit = False
+        acted = False
+        match_count = 0
         templates = game_manager.template_manager.templates
+        scene_classifier = game_manager.scene_classifier
         
-        for key, template_info in templates.items():
+        for key in scene_classifier.get_candidate_keys(templates):
+            template_info = templates.get(key)
             if not template_info:
                 continue
 
-            max_loc, max_val = game_manager.template_manager.match_template(gray_screenshot, template_info)
+            match_count += 1
+            max_loc, max_val = game_manager.template_manager.match_template_roi(gray_screenshot, template_info)
             if max_val >= template_info['threshold'] and max_loc is not None:
                 # 更新活动时间（检测到任何按钮都算作活动）
                 device_state.update_activity_time()
+                scene_classifier.record_hit(key)
                 
                 if key in skip_buttons:
+                    # 跳过按钮（如敌方回合）只确认场景，继续检测其他按钮（敌方回合中也可能弹出确认/重试对话框）；
+                    # 不计入命中，长时间只命中跳过按钮时仍会定期全扫描
                     continue
+                any_hit = True
+                acted = True
                 if key == 'LoginPage':
-                    device_state.u2_device.click(659 + random.randint(-10, 10), 338 + random.randint(-10, 10))
+                    device_state.input.click(659 + random.randint(-10, 10), 338 + random.randint(-10, 10))
                     continue
 
                 if key == 'mainPage':
-                    device_state.u2_device.click(987 + random.randint(-10, 10), 447 + random.randint(-10, 10))
+                    device_state.input.click(987 + random.randint(-10, 10), 447 + random.randint(-10, 10))
                     continue
 
                 if key == 'dailyCard':
-                    device_state.u2_device.click(640 + random.randint(-2, 2), 646 + random.randint(-2, 2))
+                    device_state.input.click(640 + random.randint(-2, 2), 646 + random.randint(-2, 2))
                     continue
 
                 if key != device_state.last_detected_button:
@@ -267,7 +367,7 @@ class DeviceManager:
                     # 计算中心点并点击
                     center_x = max_loc[0] + template_info['w'] // 2
                     center_y = max_loc[1] + template_info['h'] // 2
-                    device_state.u2_device.click(center_x + random.randint(-2, 2), center_y + random.randint(-2, 2))
+                    device_state.input.click(center_x + random.randint(-2, 2), center_y + random.randint(-2, 2))
                     time.sleep(3)
                     device_state.logger.debug(f"调用start_new_match后 - in_match: {device_state.in_match}")
                     continue
@@ -278,7 +378,7 @@ class DeviceManager:
                     time.sleep(0.5)
                     center_x = max_loc[0] + template_info['w'] // 2
                     center_y = max_loc[1] + template_info['h'] // 2
-                    device_state.u2_device.click(center_x + random.randint(-2, 2), center_y + random.randint(-2, 2))
+                    device_state.input.click(center_x + random.randint(-2, 2), center_y + random.randint(-2, 2))
                     break
 
                 if key == 'end_round':
@@ -315,7 +415,7 @@ class DeviceManager:
                     # 自动点击结束回合按钮
                     center_x = max_loc[0] + template_info['w'] // 2
                     center_y = max_loc[1] + template_info['h'] // 2
-                    device_state.u2_device.click(center_x + random.randint(-2, 2), center_y + random.randint(-2, 2))
+                    device_state.input.click(center_x + random.randint(-2, 2), center_y + random.randint(-2, 2))
                     device_state.logger.info("结束回合")
                     button_detected = True
                     if key != device_state.last_detected_button:
@@ -328,7 +428,7 @@ class DeviceManager:
                 # 计算中心点并点击（除了结束回合按钮）
                 center_x = max_loc[0] + template_info['w'] // 2
                 center_y = max_loc[1] + template_info['h'] // 2
-                device_state.u2_device.click(center_x + random.randint(-2, 2), center_y + random.randint(-2, 2))
+                device_state.input.click(center_x + random.randint(-2, 2), center_y + random.randint(-2, 2))
                 button_detected = True
 
                 if key != device_state.last_detected_button:
@@ -338,6 +438,9 @@ class DeviceManager:
                 device_state.last_detected_button = key
                 time.sleep(0.5)
                 break
+
+        scene_classifier.end_tick(match_count, any_hit)
+        return acted
     
     def _handle_command(self, device_state: DeviceState, cmd: str):
         """处理用户命令"""
@@ -361,6 +464,24 @@ class DeviceManager:
             print(f">>> 正在退出脚本... (设备: {serial}) <<<")
         elif cmd == "s":
             device_state.show_round_statistics()
+            if device_state.game_manager:
+                device_state.game_manager.scene_classifier.log_stats(logger)
+                game_actions = device_state.game_manager.game_actions
+                logger.info(f"推测扫描: 结果有效 {game_actions.speculative_hits} 次, "
+                            f"场面变化重新扫描 {game_actions.speculative_misses} 次")
+            if device_state.capture_pipeline:
+                device_state.capture_pipeline.log_stats(logger)
+            if device_state.tick_scheduler:
+                device_state.tick_scheduler.log_stats(logger)
+            device_state.input.log_stats(logger)
+            VisionWorkerPool.get_shared().log_stats(logger)
+            get_ocr_service().log_stats(logger)
+            if self.orchestrator:
+                self.orchestrator.log_stats(logger)
+            self.connector.log_stats(logger)
+            if self.supervisor:
+                self.supervisor.log_stats(logger)
+            logger.info(f"条件等待相对固定等待累计节省: {device_state.wait_time_saved:.1f}s")
             print(f">>> 已显示统计信息 (设备: {serial}) <<<")
         else:
             logger.warning(f"未知命令: '{cmd}'. 可用命令:'p'暂停, 'r'恢复, 'e'退出 或 's'统计")
@@ -368,6 +489,12 @@ class DeviceManager:
     
     def _cleanup_device(self, device_state: DeviceState):
         """清理设备资源"""
+        # 停止截图预取线程
+        if device_state.capture_pipeline:
+            device_state.capture_pipeline.stop()
+        # 关闭输入通道
+        device_state.close_input()
+
         # 结束当前对战（如果正在进行）
         if device_state.in_match:
             device_state.end_current_match()
@@ -383,9 +510,45 @@ class DeviceManager:
         device_state.logger.info(f"完成对战次数: {summary['matches_completed']}")
         device_state.logger.info("===== 脚本结束运行 =====")
     
+    def _is_worker_alive(self, serial: str) -> bool:
+        """设备的工作线程（进程模式为转发线程，asyncio模式为设备协程及其在线程池中的调用）是否仍在运行"""
+        if self.worker_mode == WORKER_MODE_ASYNC:
+            return self.orchestrator is not None and self.orchestrator.is_device_running(serial)
+        thread = self.device_threads.get(serial)
+        return thread is not None and thread.is_alive()
+
+    def _stop_worker(self, serial: str, force: bool = False):
+        """
+        停止设备
+
+        Args:
+            force: 设备卡死时强制停止：进程模式结束进程，asyncio模式取消协程（已在执行的阻塞调用仍会执行完）；
+                   线程无法强制结束，旧线程在下次检查运行状态时退出，设备守护等其退出后才重启
+        """
+        device_state = self.device_states.get(serial)
+        if device_state is None:
+            return
+        device_state.script_running = False
+        if not force:
+            return
+        if self.worker_mode == WORKER_MODE_PROCESS:
+            device_state.terminate()
+        elif self.worker_mode == WORKER_MODE_ASYNC and self.orchestrator is not None:
+            self.orchestrator.cancel_device(serial)
+
+    def stop_all_devices(self):
+        """停止设备守护和所有设备"""
+        if self.supervisor:
+            self.supervisor.stop()
+        for device_state in list(self.device_states.values()):
+            device_state.script_running = False
+
     def wait_for_completion(self):
         """等待所有设备完成"""
-        for serial, thread in self.device_threads.items():
+        # 设备守护运行时设备线程可能被重启替换，先等守护结束
+        if self.supervisor:
+            self.supervisor.join()
+        for serial, thread in list(self.device_threads.items()):
             thread.join()
             logger.info(f"设备线程已结束: {serial}")
     
@@ -12,8 +12,14 @@ import queue
 import subprocess
 import psutil
 from collections import defaultdict
-from typing import Any, Optional, List, Dict, TYPE_CHECKING
+from typing import Any, Optional, List, Dict, Iterator, TYPE_CHECKING
 from src.utils.resource_utils import ensure_directory
+from src.device.capture_backend import create_capture_backend
+from src.device.capture_pipeline import CapturePipeline
+from src.device.shared_frame_ring import ProcessCapturePipeline
+from src.device.input_driver import GestureScript, InputDriver, create_input_driver
+from src.utils.frame import Frame
+from src.utils.utils import wait_until, WaitResult
 
 if TYPE_CHECKING:
     from src.game.game_manager import GameManager
@@ -30,6 +36,8 @@ class DeviceState:
         # 脚本运行状态
         self.script_running = True
         self.script_paused = False
+        # 主循环每轮更新的心跳时间，设备守护据此判断工作线程是否卡死
+        self.last_heartbeat = time.time()
         
         # 设置日志器（必须在其他初始化之前）
         self.logger = self._setup_logger()
@@ -67,6 +75,12 @@ class DeviceState:
         # 超时检测相关属性
         self.last_activity_time = time.time()  # 最后一次活动时间
         self.last_match_time = time.time()     # 最后一次战斗时间
+
+        # 条件等待相对原固定等待累计节省的时间（秒）
+        self.wait_time_saved = 0.0
+
+        # 主循环自适应节拍（设备主循环开始时创建）
+        self.tick_scheduler: Optional[Any] = None
         
         # 从配置中读取超时设置
         auto_restart_config = config.get("auto_restart", {})
@@ -77,6 +91,8 @@ class DeviceState:
         # 设备对象
         self.u2_device: Optional[Any] = None
         self.adb_device: Optional[Any] = None
+        # 输入驱动（点击/拖动），首次使用时按设备配置input_backend创建
+        self._input_driver: Optional[InputDriver] = None
         
         # 游戏管理器
         self.game_manager: Optional['GameManager'] = None
@@ -89,6 +105,19 @@ class DeviceState:
     
     def _init_screenshot_method(self):
         """初始化截图方法选择，只在程序启动时执行一次"""
+        # 截图后端（PNG截图或原始帧缓冲），由设备配置screenshot_backend决定
+        self.capture_backend = create_capture_backend(self)
+        self.logger.info(f"截图后端: {self.capture_backend.name}")
+        # 截图预取管线（可选），在设备连接后首次截图时启动
+        # capture_process: 独立截图进程 + 共享内存帧缓冲；capture_prefetch: 后台截图线程
+        self.capture_pipeline: Optional[Any] = None
+        self.prefetch_max_age = self.device_config.get('prefetch_max_age', 0.15)
+        if self.device_config.get('capture_process', False):
+            self.capture_pipeline = ProcessCapturePipeline(self, slots=self.device_config.get('capture_slots', 4))
+            self.logger.info(f"已启用独立截图进程 (最大帧龄 {self.prefetch_max_age}s)")
+        elif self.device_config.get('capture_prefetch', False):
+            self.capture_pipeline = CapturePipeline(self)
+            self.logger.info(f"已启用截图预取 (最大帧龄 {self.prefetch_max_age}s)")
         try:
             # 从设备配置中获取screenshot_deep_color值，默认为False
             screenshot_deep_color = self.device_config.get('screenshot_deep_color', False)
@@ -146,17 +175,118 @@ class DeviceState:
 
         return logger
 
-    def take_screenshot(self) -> Optional[Any]:
+    @property
+    def input(self) -> InputDriver:
+        """输入驱动，click/swipe 参数与 uiautomator2 一致"""
+        if self._input_driver is None:
+            self._input_driver = create_input_driver(self)
+            self.logger.info(f"输入后端: {self._input_driver.name}")
+        return self._input_driver
+
+    @property
+    def stop_requested(self) -> bool:
+        """是否已请求停止（主循环因此退出时不需要重启）"""
+        return not self.script_running
+
+    def gesture_script(self) -> GestureScript:
+        """创建绑定本设备的手势脚本，链式添加点击/拖动/等待后调用 run() 一次提交"""
+        return GestureScript(self.run_gesture_script)
+
+    def run_gesture_script(self, script: GestureScript, wait: bool = True):
+        """
+        执行手势脚本：持久adb shell通道下整段脚本一次发送、等待在设备端完成，
+        其他输入后端按顺序逐步执行
+
+        Args:
+            script: 手势脚本
+            wait: 是否等待脚本执行完毕（脚本后通常要截图确认结果，默认等待）
+        """
+        if script.steps:
+            self.input.run_script(script, wait)
+
+    def close_input(self):
+        """关闭输入通道（设备清理时调用）"""
+        if self._input_driver is not None:
+            self._input_driver.close()
+
+    def take_screenshot(self, min_timestamp: Optional[float] = None) -> Optional[Frame]:
         """
         执行截图，使用初始化时选择的截图方法
+        返回Frame对象，BGR/灰度/HSV等转换结果在同一帧内按需计算并缓存
+
+        Args:
+            min_timestamp: 启用截图预取时，返回帧的最早截图开始时间；
+                默认取当前时间减去prefetch_max_age，且不早于最近一次点击/拖动完成的时间
+                （先等待未确认的手势执行完毕），保证操作后拿到的不是操作前的帧；
+                轮询比较相邻帧时应传入本次轮询开始时间。
+                未启用预取时忽略
+        """
+        pipeline = self.capture_pipeline
+        if pipeline is not None and self.adb_device is not None:
+            if not pipeline.running:
+                pipeline.start()
+            if min_timestamp is None:
+                min_timestamp = time.time() - self.prefetch_max_age
+                if self._input_driver is not None:
+                    # 不等待确认提交的手势可能仍在设备上执行
+                    self._input_driver.flush()
+                    min_timestamp = max(min_timestamp, self._input_driver.last_input_time)
+            frame = pipeline.get_frame_after(min_timestamp)
+            if frame is not None:
+                return frame
+            if pipeline.running:
+                self.logger.warning("预取截图超时，改为同步截图")
+        return self.capture_frame()
+
+    def iter_capture_burst(self, n: int, min_interval: float = 0.0, region=None,
+                           since: Optional[float] = None) -> Iterator[Frame]:
+        """
+        连续截取n帧（流式），每得到一帧立即返回，调用方可以在处理第1帧的同时继续截取后续帧
+
+        Args:
+            n: 截图次数
+            min_interval: 相邻两帧截图开始时间的最小间隔（秒），用于覆盖动画的不同阶段
+            region: 可选区域 (x1, y1, x2, y2)，指定时返回裁剪后的子帧
+            since: 上一帧的截图时间，第1帧也与其保持min_interval间隔
+
+        Yields:
+            Frame: 带时间戳的帧（截图失败的帧会被跳过）
         """
-        return self._screenshot_method()
+        last_start = since
+        for _ in range(n):
+            if last_start is not None:
+                wait = min_interval - (time.time() - last_start)
+                if wait > 0:
+                    time.sleep(wait)
+            last_start = time.time()
+            frame = self.take_screenshot(min_timestamp=last_start)
+            if frame is None:
+                continue
+            yield frame.subframe(region) if region else frame
+
+    def capture_burst(self, n: int, min_interval: float = 0.0, region=None,
+                      since: Optional[float] = None) -> List[Frame]:
+        """连续截取n帧并一次返回，参数同iter_capture_burst"""
+        return list(self.iter_capture_burst(n, min_interval, region, since))
+
+    def wait_until(self, condition, timeout: float = 5.0, poll: float = 0.1, min_wait: float = 0.0,
+                   legacy_delay: Optional[float] = None, label: str = "") -> WaitResult:
+        """轮询截图直到条件满足或超时，参数见 src.utils.utils.wait_until"""
+        return wait_until(self, condition, timeout, poll, min_wait, legacy_delay, label)
+
+    def capture_frame(self) -> Optional[Frame]:
+        """同步截图一次，帧时间戳为截图开始时间"""
+        capture_time = time.time()
+        frame = Frame.from_any(self._screenshot_method(), timestamp=capture_time)
+        if frame is not None:
+            frame.timestamp = capture_time
+        return frame
 
     def take_screenshot_normal(self) -> Optional[Any]:
         """获取设备截图"""
         if self.adb_device is None:
             return None
-        return self.adb_device.screenshot()
+        return self.capture_backend.capture()
 
     def take_screenshot_MuMugblobe(self) -> Optional[Any]:
         """获取设备截图"""
@@ -201,31 +331,18 @@ class DeviceState:
         #     return None
 
         try:
-            screenshot = self.adb_device.screenshot()
+            screenshot = self.capture_backend.capture()
             if screenshot is not None:
-                # 转换为numpy数组进行亮度调整
-                import numpy as np
+                # 转换为BGR格式（OpenCV默认格式）进行亮度调整
                 import cv2
-                
-                # 将PIL图像转换为numpy数组
-                img_array = np.array(screenshot)
-                
-                # 转换为BGR格式（OpenCV默认格式）
-                if len(img_array.shape) == 3:
-                    img_bgr = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-                else:
-                    img_bgr = img_array
+                img_bgr = Frame.from_any(screenshot).bgr
                 
                 # 提高亮度45
                 brightness = 45
                 img_brightened = cv2.add(img_bgr, brightness)
                 
-                # 转换回RGB格式
-                img_rgb = cv2.cvtColor(img_brightened, cv2.COLOR_BGR2RGB)
-                
-                # 转换回PIL图像
-                from PIL import Image
-                return Image.fromarray(img_rgb)
+                # 直接以BGR数组构造帧，省去转回PIL图像
+                return Frame(bgr=img_brightened)
             else:
                 return None
         except Exception as e:
@@ -421,6 +538,9 @@ class DeviceState:
             # 重置超时计时器
             self.update_activity_time()
             self.update_match_time()
+            # 应用重启后回到登录/大厅界面，场景分类器需重新识别场景，不再只检测对战中的按钮
+            if self.game_manager is not None:
+                self.game_manager.scene_classifier.reset()
             return True
         except Exception as e:
             self.logger.error(f"重启应用过程中出错: {e}")
@@ -0,0 +1,400 @@
+"""
+输入驱动
+点击和拖动统一经过InputDriver：默认仍使用uiautomator2；可选持久adb shell通道，
+手势以命令行写入同一个长连接shell，省去每次操作一次HTTP请求的往返
+"""
+
+import re
+import subprocess
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+from src.device.capture_backend import find_adb_path
+
+logger = logging.getLogger(__name__)
+
+_ACK_PATTERN = re.compile(r"__ACK_(\d+)__")
+
+
+class _Gesture:
+    __slots__ = ('kind', 'seq', 'submit_time', 'planned_time', 'done')
+
+    def __init__(self, kind: str, seq: int, planned_time: float = 0.0):
+        self.kind = kind
+        self.seq = seq
+        self.submit_time = time.time()
+        # 手势脚本中计划的等待和拖动时长，统计延迟时扣除
+        self.planned_time = planned_time
+        self.done = threading.Event()
+
+
+class GestureScript:
+    """
+    手势脚本：按顺序执行的点击、拖动和等待，作为一个整体提交给输入驱动
+
+    持久adb shell通道下整段脚本写成一行命令在设备端执行，步骤之间的等待由设备端sleep完成，
+    只需一次往返；其他驱动按顺序逐步执行。用法：
+        device_state.gesture_script().drag(...).wait(0.3).tap(x, y).run()
+    """
+
+    def __init__(self, runner: Optional[Callable[['GestureScript', bool], None]] = None):
+        """
+        Args:
+            runner: 执行脚本的函数 (脚本, 是否等待完成)，通常为 DeviceState.run_gesture_script
+        """
+        self.steps: List[tuple] = []
+        self._runner = runner
+
+    def tap(self, x, y) -> 'GestureScript':
+        """点击 (x, y)"""
+        self.steps.append(("tap", int(x), int(y)))
+        return self
+
+    def drag(self, fx, fy, tx, ty, duration: float = 0.1) -> 'GestureScript':
+        """从 (fx, fy) 拖动到 (tx, ty)，耗时duration秒"""
+        self.steps.append(("swipe", int(fx), int(fy), int(tx), int(ty), float(duration)))
+        return self
+
+    def wait(self, seconds: float) -> 'GestureScript':
+        """等待seconds秒后再执行下一步"""
+        if seconds > 0:
+            self.steps.append(("wait", float(seconds)))
+        return self
+
+    @property
+    def planned_time(self) -> float:
+        """脚本中计划的等待和拖动总时长（秒）"""
+        total = 0.0
+        for step in self.steps:
+            if step[0] == "wait":
+                total += step[1]
+            elif step[0] == "swipe":
+                total += step[5]
+        return total
+
+    def run(self, wait: bool = True):
+        """提交脚本；wait为True时等待脚本执行完毕"""
+        if self._runner is None:
+            raise RuntimeError("手势脚本未绑定设备，请通过 device_state.gesture_script() 创建")
+        self._runner(self, wait)
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+
+class InputDriver:
+    """
+    输入驱动基类
+
+    click/swipe 的参数与 uiautomator2 一致（swipe的duration单位为秒），
+    现有调用处可以直接把 u2_device 换成 device_state.input
+    """
+
+    name = "base"
+
+    def __init__(self, device_state):
+        self.device_state = device_state
+        self._stats_lock = threading.Lock()
+        # 手势类型 -> [次数, 延迟总和, 最大延迟]
+        self._latency: Dict[str, list] = {}
+        # 最近一次手势完成的时间，早于它的预取截图不能反映操作结果
+        # （不等待确认时先记为提交时间，收到确认后再推后）
+        self.last_input_time = 0.0
+
+    def click(self, x, y, wait: Optional[bool] = None):
+        """点击 (x, y)；wait为None时使用驱动默认的确认方式"""
+        raise NotImplementedError
+
+    def swipe(self, fx, fy, tx, ty, duration: float = 0.1, wait: Optional[bool] = None):
+        """从 (fx, fy) 拖动到 (tx, ty)，耗时duration秒"""
+        raise NotImplementedError
+
+    def run_script(self, script: GestureScript, wait: bool = True):
+        """
+        执行手势脚本，默认实现按顺序逐步执行（每一步一次往返）
+
+        Args:
+            script: 手势脚本
+            wait: 是否等待脚本执行完毕（逐步执行时总是等待）
+        """
+        start_time = time.time()
+        for step in script.steps:
+            kind = step[0]
+            if kind == "tap":
+                self.click(step[1], step[2], wait=True)
+            elif kind == "swipe":
+                self.swipe(step[1], step[2], step[3], step[4], step[5], wait=True)
+            elif kind == "wait":
+                time.sleep(step[1])
+        self.last_input_time = time.time()
+        self._record_latency("script", max(0.0, time.time() - start_time - script.planned_time))
+
+    def flush(self, timeout: float = 3.0) -> bool:
+        """等待已提交的手势全部执行完毕"""
+        return True
+
+    def close(self):
+        """释放输入通道"""
+        pass
+
+    def _record_latency(self, kind: str, latency: float):
+        with self._stats_lock:
+            stats = self._latency.setdefault(kind, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += latency
+            stats[2] = max(stats[2], latency)
+
+    def get_stats(self) -> Dict:
+        """获取各类手势的延迟统计"""
+        with self._stats_lock:
+            return {
+                kind: {'count': count, 'avg_latency': total / count if count else 0.0, 'max_latency': max_latency}
+                for kind, (count, total, max_latency) in self._latency.items()
+            }
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出手势延迟统计"""
+        log = target_logger or logger
+        stats = self.get_stats()
+        if not stats:
+            log.info(f"输入驱动({self.name}): 暂无操作")
+            return
+        text = ", ".join(f"{kind} {item['count']} 次 平均 {item['avg_latency'] * 1000:.0f}ms "
+                         f"最大 {item['max_latency'] * 1000:.0f}ms" for kind, item in stats.items())
+        log.info(f"输入驱动({self.name}): {text}")
+
+
+class U2InputDriver(InputDriver):
+    """uiautomator2 输入（每个手势一次HTTP请求）"""
+
+    name = "u2"
+
+    def click(self, x, y, wait: Optional[bool] = None):
+        start_time = time.time()
+        self.device_state.u2_device.click(x, y)
+        self.last_input_time = time.time()
+        self._record_latency("tap", time.time() - start_time)
+
+    def swipe(self, fx, fy, tx, ty, duration: float = 0.1, wait: Optional[bool] = None):
+        start_time = time.time()
+        self.device_state.u2_device.swipe(fx, fy, tx, ty, duration)
+        self.last_input_time = time.time()
+        self._record_latency("swipe", time.time() - start_time)
+
+
+class AdbShellInputDriver(InputDriver):
+    """
+    持久adb shell输入通道
+
+    启动一个长期存在的 `adb shell`，每个手势写入一行 `input ...; echo __ACK_n__`，
+    后台线程读取回显确认手势完成并记录延迟。
+    手势脚本整段写成一行 `input ...; sleep ...; input ...; echo __ACK_n__`，只有一次往返
+    - 确认模式(wait=True)：等待回显后返回，时序与uiautomator2一致
+    - 不等待模式(wait=False)：写入后立即返回，手势按提交顺序在设备上依次执行
+    通道异常且无法重建时回退到uiautomator2
+    """
+
+    name = "adb_shell"
+
+    def __init__(self, device_state, wait_ack: bool = True, ack_timeout: float = 3.0):
+        """
+        Args:
+            device_state: 设备状态对象
+            wait_ack: 默认是否等待手势执行完成
+            ack_timeout: 等待手势确认的超时时间（秒）
+        """
+        super().__init__(device_state)
+        self.wait_ack = wait_ack
+        self.ack_timeout = ack_timeout
+        self._process: Optional[subprocess.Popen] = None
+        self._write_lock = threading.Lock()
+        self._pending: Dict[int, _Gesture] = {}
+        self._pending_lock = threading.Lock()
+        self._seq = 0
+        self._input_command = None
+        self._fallback: Optional[U2InputDriver] = None
+        self.ack_timeouts = 0
+
+    def _detect_input_command(self) -> str:
+        """Android 12起 `cmd input` 在system_server内执行，比启动新进程的 `input` 快得多"""
+        try:
+            output = self.device_state.adb_device.shell("cmd input 2>&1")
+            if "tap" in output:
+                return "cmd input"
+        except Exception as e:
+            logger.debug(f"检测cmd input失败: {str(e)}")
+        return "input"
+
+    def _ensure_channel(self) -> bool:
+        """确保shell通道可用，进程已退出时重建"""
+        if self._process is not None and self._process.poll() is None:
+            return True
+        if self._process is not None:
+            self.device_state.logger.warning("输入通道已断开，正在重建")
+            self._fail_pending()
+        try:
+            if self._input_command is None:
+                self._input_command = self._detect_input_command()
+                self.device_state.logger.info(f"持久输入通道使用 `{self._input_command}`")
+            self._process = subprocess.Popen(
+                [find_adb_path(), "-s", self.device_state.serial, "shell"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                bufsize=0, creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+            )
+            threading.Thread(target=self._read_acks, args=(self._process,),
+                             name=f"InputAck-{self.device_state.serial}", daemon=True).start()
+            return True
+        except Exception as e:
+            self.device_state.logger.error(f"启动持久输入通道失败，改用uiautomator2: {str(e)}")
+            self._process = None
+            self._fallback = U2InputDriver(self.device_state)
+            return False
+
+    def _read_acks(self, process: subprocess.Popen):
+        """读取shell回显，确认手势完成"""
+        try:
+            for raw_line in iter(process.stdout.readline, b""):
+                line = raw_line.decode("utf-8", errors="ignore").strip()
+                match = _ACK_PATTERN.search(line)
+                if not match:
+                    if line:
+                        logger.debug(f"输入通道输出: {line}")
+                    continue
+                with self._pending_lock:
+                    gesture = self._pending.pop(int(match.group(1)), None)
+                if gesture is not None:
+                    ack_time = time.time()
+                    latency = ack_time - gesture.submit_time - gesture.planned_time
+                    self._record_latency(gesture.kind, max(0.0, latency))
+                    # 不等待确认的手势在这里才真正执行完毕
+                    self.last_input_time = max(self.last_input_time, ack_time)
+                    gesture.done.set()
+        except Exception as e:
+            logger.debug(f"输入通道读取结束: {str(e)}")
+
+    def _discard_process(self):
+        """结束已损坏的shell通道进程，避免残留adb shell进程"""
+        process = self._process
+        self._process = None
+        if process is not None:
+            try:
+                process.kill()
+                process.wait(timeout=2)
+            except Exception as e:
+                logger.debug(f"结束输入通道进程失败: {str(e)}")
+        self._fail_pending()
+
+    def _fail_pending(self):
+        """通道断开时释放所有等待中的手势"""
+        with self._pending_lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for gesture in pending:
+            gesture.done.set()
+
+    def _format_step(self, step: tuple) -> str:
+        """把脚本步骤转换为shell命令"""
+        kind = step[0]
+        if kind == "tap":
+            return f"{self._input_command} tap {step[1]} {step[2]}"
+        if kind == "swipe":
+            duration_ms = max(1, int(step[5] * 1000))
+            return f"{self._input_command} swipe {step[1]} {step[2]} {step[3]} {step[4]} {duration_ms}"
+        return f"sleep {step[1]:.3f}"
+
+    def _send(self, kind: str, steps: List[tuple], wait: Optional[bool], planned_time: float = 0.0) -> bool:
+        """把一个或多个步骤写成一行命令，返回是否通过持久通道发送"""
+        if self._fallback is not None or not self._ensure_channel():
+            return False
+        with self._write_lock:
+            self._seq += 1
+            gesture = _Gesture(kind, self._seq, planned_time)
+            with self._pending_lock:
+                self._pending[gesture.seq] = gesture
+            commands = "; ".join(self._format_step(step) for step in steps)
+            line = f"{commands}; echo __ACK_{gesture.seq}__\n"
+            try:
+                self._process.stdin.write(line.encode("utf-8"))
+                self._process.stdin.flush()
+            except Exception as e:
+                with self._pending_lock:
+                    self._pending.pop(gesture.seq, None)
+                self.device_state.logger.warning(f"写入输入通道失败: {str(e)}")
+                self._discard_process()
+                return False
+
+        if wait if wait is not None else self.wait_ack:
+            if not gesture.done.wait(self.ack_timeout + planned_time):
+                self.ack_timeouts += 1
+                self.device_state.logger.warning(f"等待手势确认超时: {commands}")
+        self.last_input_time = max(self.last_input_time, time.time())
+        return True
+
+    def click(self, x, y, wait: Optional[bool] = None):
+        if not self._send("tap", [("tap", int(x), int(y))], wait):
+            (self._fallback or U2InputDriver(self.device_state)).click(x, y)
+
+    def swipe(self, fx, fy, tx, ty, duration: float = 0.1, wait: Optional[bool] = None):
+        step = ("swipe", int(fx), int(fy), int(tx), int(ty), float(duration))
+        if not self._send("swipe", [step], wait):
+            (self._fallback or U2InputDriver(self.device_state)).swipe(fx, fy, tx, ty, duration)
+
+    def run_script(self, script: GestureScript, wait: bool = True):
+        """整段脚本写成一行命令，等待在设备端执行，只需一次往返"""
+        if not script.steps:
+            return
+        if not self._send("script", script.steps, wait, script.planned_time):
+            (self._fallback or U2InputDriver(self.device_state)).run_script(script, wait)
+
+    def flush(self, timeout: float = 3.0) -> bool:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._pending_lock:
+                if not self._pending:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def close(self):
+        process = self._process
+        self._process = None
+        if process is None:
+            return
+        try:
+            process.stdin.write(b"exit\n")
+            process.stdin.flush()
+            process.wait(timeout=2)
+        except Exception:
+            process.kill()
+        self._fail_pending()
+
+    def get_stats(self) -> Dict:
+        stats = super().get_stats()
+        if self._fallback is not None:
+            for kind, item in self._fallback.get_stats().items():
+                stats[f"{kind}(u2回退)"] = item
+        return stats
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        super().log_stats(target_logger)
+        if self.ack_timeouts:
+            (target_logger or logger).info(f"  手势确认超时 {self.ack_timeouts} 次")
+
+
+INPUT_DRIVERS = {
+    U2InputDriver.name: U2InputDriver,
+    AdbShellInputDriver.name: AdbShellInputDriver,
+}
+
+
+def create_input_driver(device_state) -> InputDriver:
+    """根据设备配置 input_backend 创建输入驱动，默认使用uiautomator2"""
+    config = device_state.device_config
+    backend_name = config.get('input_backend', U2InputDriver.name)
+    if backend_name == AdbShellInputDriver.name:
+        return AdbShellInputDriver(device_state, wait_ack=config.get('input_wait_ack', True))
+    if backend_name not in INPUT_DRIVERS:
+        device_state.logger.warning(f"未知的输入后端 '{backend_name}'，使用uiautomator2")
+    return U2InputDriver(device_state)
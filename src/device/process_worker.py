@@ -0,0 +1,246 @@
+"""
+设备进程模式
+worker_mode 为 "process" 时每个设备的主循环在独立进程中运行，识别计算不再争用同一个GIL；
+命令、日志、通知和运行总结通过进程间队列与主进程交互
+"""
+
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKER_MODE_THREAD = "thread"
+WORKER_MODE_PROCESS = "process"
+
+# 主进程 -> 设备进程：停止主循环（区别于用户输入的 'e' 命令）
+COMMAND_STOP = "__stop__"
+
+# 设备进程 -> 主进程的事件类型（日志直接以LogRecord发送）
+EVENT_NOTIFY = "notify"    # 需要在主进程弹出的通知 (类型, 级别, 标题, 内容)
+EVENT_SUMMARY = "summary"  # 运行总结 (类型, 总结字典)
+EVENT_EXIT = "exit"        # 设备进程结束 (类型, 是否因停止请求而结束)
+
+
+class _RelayNotificationManager:
+    """设备进程中的通知管理器：把通知转发给主进程显示"""
+
+    def __init__(self, event_queue):
+        self.event_queue = event_queue
+
+    def show_error(self, title: str, message: str):
+        self.event_queue.put((EVENT_NOTIFY, "error", title, message))
+
+    def show_warning(self, title: str, message: str):
+        self.event_queue.put((EVENT_NOTIFY, "warning", title, message))
+
+    def show_notification(self, title: str, message: str):
+        self.event_queue.put((EVENT_NOTIFY, "info", title, message))
+
+
+def _setup_process_logging(config: Dict[str, Any], event_queue):
+    """设备进程的日志全部经队列发给主进程，由主进程的处理器统一输出"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    level_name = config.get("ui", {}).get("log_level", "INFO").upper()
+    root.setLevel(getattr(logging, level_name, logging.INFO))
+    root.addHandler(logging.handlers.QueueHandler(event_queue))
+
+
+def _relay_commands(command_queue, device_state, heartbeat=None):
+    """设备进程内的命令转发线程：进程间命令队列 -> 设备命令队列，同时把主循环心跳同步给主进程"""
+    while device_state.script_running:
+        if heartbeat is not None:
+            heartbeat.value = device_state.last_heartbeat
+        try:
+            cmd = command_queue.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        except (EOFError, OSError):
+            break
+        if cmd == COMMAND_STOP:
+            device_state.script_running = False
+            break
+        device_state.command_queue.put(cmd)
+
+
+def device_process_main(device_config: Dict[str, Any], config: Dict[str, Any], command_queue, event_queue,
+                        ocr_address=None, ocr_authkey: Optional[bytes] = None, heartbeat=None):
+    """
+    设备进程入口：初始化OCR、连接设备并运行主循环
+
+    Args:
+        device_config: 设备配置
+        config: 全局配置
+        command_queue: 主进程发来的命令
+        event_queue: 发往主进程的日志和事件
+        ocr_address: 主进程OCR服务地址，None表示本进程自行加载OCR模型
+        ocr_authkey: 主进程OCR服务的认证密钥
+        heartbeat: 与主进程共享的主循环心跳时间 (multiprocessing.Value)
+    """
+    _setup_process_logging(config, event_queue)
+    serial = device_config["serial"]
+
+    # 在函数内导入，避免与device_manager循环导入
+    from src.device.device_connector import DeviceConnector
+    from src.device.device_manager import DeviceManager
+    from src.device.device_state import DeviceState
+    from src.utils.gpu_utils import setup_gpu, get_easyocr_reader
+    from src.utils.ocr_service import use_remote_ocr_service
+
+    device_state = None
+    try:
+        if ocr_address is not None:
+            # 使用主进程的OCR服务，本进程不加载OCR模型
+            use_remote_ocr_service(ocr_address, ocr_authkey)
+        else:
+            gpu_enabled = setup_gpu()
+            if get_easyocr_reader(gpu_enabled=gpu_enabled) is None:
+                logger.warning(f"设备进程 {serial} OCR reader初始化失败，后续OCR功能不可用")
+
+        device_state = DeviceState(serial, config, device_config)
+        # 设备日志文件由本进程写入，控制台和界面输出交给主进程
+        for handler in list(device_state.logger.handlers):
+            if not isinstance(handler, logging.FileHandler):
+                device_state.logger.removeHandler(handler)
+
+        threading.Thread(target=_relay_commands, args=(command_queue, device_state, heartbeat),
+                         name=f"CommandRelay-{serial}", daemon=True).start()
+
+        device_manager = DeviceManager(None, _RelayNotificationManager(event_queue))
+        device_manager.connector = DeviceConnector(config)
+        device_manager.device_states[serial] = device_state
+        device_manager._device_worker(device_config, device_state)
+    except Exception as e:
+        logger.exception(f"设备进程 {serial} 异常: {str(e)}")
+    finally:
+        if device_state is not None:
+            event_queue.put((EVENT_SUMMARY, device_state.get_run_summary()))
+        event_queue.put((EVENT_EXIT, device_state is not None and device_state.stop_requested))
+
+
+class RemoteDeviceState:
+    """
+    主进程中代表设备进程的状态代理
+
+    提供命令监听、运行总结和设备守护用到的DeviceState接口：command_queue、script_running、
+    stop_requested、last_heartbeat、show_round_statistics、get_run_summary
+    """
+
+    def __init__(self, serial: str, config: Dict[str, Any], device_config: Dict[str, Any], ocr_server=None):
+        """
+        Args:
+            ocr_server: 主进程的OcrServer，设备进程通过它共享OCR模型
+        """
+        self.serial = serial
+        self.config = config
+        self.device_config = device_config
+        self.logger = logging.getLogger(f"Device-{serial}")
+
+        # 使用spawn启动，各平台行为一致，也不会继承主进程的线程和设备连接
+        context = multiprocessing.get_context("spawn")
+        self.command_queue = context.Queue()
+        self.event_queue = context.Queue()
+        self._heartbeat = context.Value("d", time.time(), lock=False)
+        self.process = context.Process(
+            target=device_process_main,
+            args=(device_config, config, self.command_queue, self.event_queue,
+                  ocr_server.address if ocr_server else None,
+                  ocr_server.authkey if ocr_server else None,
+                  self._heartbeat),
+            name=f"Device-{serial}",
+            # 非守护进程：设备进程需要能启动自己的截图进程(capture_process)
+            daemon=False
+        )
+        self._script_running = True
+        self._summary: Optional[Dict[str, Any]] = None
+        self.game_manager = None
+        # 主进程请求停止，或设备进程内因 'e' 命令结束
+        self.stop_requested = False
+
+    @property
+    def script_running(self) -> bool:
+        return self._script_running and self.process.is_alive()
+
+    @script_running.setter
+    def script_running(self, value: bool):
+        if not value and self._script_running:
+            self.stop_requested = True
+            self.command_queue.put(COMMAND_STOP)
+        self._script_running = value
+
+    @property
+    def last_heartbeat(self) -> float:
+        """设备进程主循环最近一次心跳时间"""
+        return self._heartbeat.value
+
+    def start(self):
+        """启动设备进程"""
+        self.process.start()
+
+    def terminate(self):
+        """强制结束设备进程（用于卡死的设备）"""
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def show_round_statistics(self):
+        """统计信息由设备进程处理 's' 命令时输出并转发到主进程日志"""
+        self.logger.debug("统计信息由设备进程输出")
+
+    def get_run_summary(self) -> Dict[str, Any]:
+        """获取设备进程结束时上报的运行总结"""
+        if self._summary is not None:
+            return self._summary
+        return {
+            "start_time": "-",
+            "duration": "-",
+            "matches_completed": 0,
+            "serial": self.serial
+        }
+
+    def relay_events(self, notification_manager=None):
+        """
+        转发设备进程的日志和事件，直到设备进程结束（在主进程的设备线程中运行）
+
+        Args:
+            notification_manager: 主进程的通知管理器
+        """
+        while True:
+            try:
+                item = self.event_queue.get(timeout=0.5)
+            except queue.Empty:
+                if not self.process.is_alive():
+                    break
+                continue
+            except (EOFError, OSError):
+                break
+
+            if isinstance(item, logging.LogRecord):
+                logging.getLogger(item.name).handle(item)
+                continue
+
+            event_type = item[0]
+            if event_type == EVENT_NOTIFY:
+                _, level, title, message = item
+                if notification_manager:
+                    if level == "error":
+                        notification_manager.show_error(title, message)
+                    elif level == "warning":
+                        notification_manager.show_warning(title, message)
+                    else:
+                        notification_manager.show_notification(title, message)
+            elif event_type == EVENT_SUMMARY:
+                self._summary = item[1]
+            elif event_type == EVENT_EXIT:
+                self.stop_requested = self.stop_requested or item[1]
+                break
+
+        self.process.join(timeout=5)
+        self._script_running = False
+        if self.process.exitcode not in (0, None):
+            logger.error(f"设备进程 {self.serial} 异常退出 (退出码: {self.process.exitcode})")
@@ -0,0 +1,371 @@
+"""
+共享内存帧环形缓冲
+截图进程把BGR帧写入 multiprocessing.shared_memory 中固定数量的帧槽，设备进程直接在共享内存上
+建立NumPy视图读取最新帧，无需序列化和复制；帧被引用期间所在帧槽被钉住，不会被截图进程覆盖
+"""
+
+import ctypes
+import multiprocessing
+import os
+import threading
+import time
+import logging
+import weakref
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.utils.frame import Frame
+
+logger = logging.getLogger(__name__)
+
+# 帧数据起始位置对齐字节数
+_ALIGNMENT = 64
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """打开已有的共享内存块，并避免本进程退出时被资源跟踪器误删"""
+    try:
+        return shared_memory.SharedMemory(name=name, create=False, track=False)
+    except TypeError:
+        # Python 3.13 以前不支持track参数
+        shm = shared_memory.SharedMemory(name=name, create=False)
+        if os.name == "posix":
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+        return shm
+
+
+class SharedFrameRing:
+    """
+    共享内存帧环形缓冲（一个写入进程，一个读取进程内任意线程）
+
+    共享内存布局: [写入序号, 最新帧槽, 丢帧数] [各帧槽序号] [各帧槽引用数] [各帧槽时间戳] [帧槽像素...]
+    帧槽的分配和钉住在跨进程锁内完成，像素复制在锁外进行
+    """
+
+    def __init__(self, shape: Tuple[int, int, int], slots: int = 4, name: Optional[str] = None, condition=None):
+        """
+        Args:
+            shape: 帧形状 (高, 宽, 通道数)
+            slots: 帧槽数量，至少为2
+            name: 已有共享内存块的名称，None表示新建
+            condition: 跨进程条件变量，新建时自动创建
+        """
+        self.shape = tuple(int(v) for v in shape)
+        self.slots = max(2, int(slots))
+        self._owner = name is None
+        self._condition = condition or multiprocessing.get_context("spawn").Condition()
+
+        header_size = 8 * (3 + 3 * self.slots)
+        self._pixel_offset = (header_size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+        frame_bytes = int(np.prod(self.shape))
+        self._frame_bytes = frame_bytes
+        # 每次取帧新建一个帧槽像素的缓冲导出对象，NumPy视图以它为base：
+        # 视图的切片、reshape等派生数组都会引用它（而不是中间视图），全部释放后才解除钉住
+        self._slot_buffer_type = type("_SlotBuffer", (ctypes.c_uint8 * frame_bytes,), {})
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=self._pixel_offset + frame_bytes * self.slots)
+        else:
+            self._shm = _attach_shared_memory(name)
+        self.name = self._shm.name
+
+        buf = self._shm.buf
+        self._meta = np.ndarray((3,), dtype=np.int64, buffer=buf, offset=0)
+        self._slot_seq = np.ndarray((self.slots,), dtype=np.int64, buffer=buf, offset=24)
+        self._slot_pins = np.ndarray((self.slots,), dtype=np.int64, buffer=buf, offset=24 + 8 * self.slots)
+        self._slot_ts = np.ndarray((self.slots,), dtype=np.float64, buffer=buf, offset=24 + 16 * self.slots)
+        self._pixels = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=buf, offset=self._pixel_offset)
+        if self._owner:
+            self._meta[:] = (0, -1, 0)
+            self._slot_seq[:] = 0
+            self._slot_pins[:] = 0
+            self._slot_ts[:] = 0.0
+
+        # 本进程读取的帧数
+        self.frames_read = 0
+
+    def __getstate__(self):
+        # 传给截图进程时只传递共享内存名称和同步对象
+        return {'shape': self.shape, 'slots': self.slots, 'name': self.name, 'condition': self._condition}
+
+    def __setstate__(self, state):
+        self.__init__(state['shape'], state['slots'], state['name'], state['condition'])
+
+    @property
+    def write_seq(self) -> int:
+        """已写入的帧数"""
+        return int(self._meta[0]) if self._meta is not None else 0
+
+    @property
+    def frames_dropped(self) -> int:
+        """帧槽全部被钉住而丢弃的帧数"""
+        return int(self._meta[2]) if self._meta is not None else 0
+
+    # ------------------------------------------------------------------ 写入端
+
+    def write(self, bgr: np.ndarray, timestamp: float) -> bool:
+        """
+        写入一帧（截图进程调用）
+
+        Returns:
+            bool: 是否写入成功，所有可用帧槽都被读取端钉住时丢弃该帧
+        """
+        if bgr.shape != self.shape:
+            raise ValueError(f"帧尺寸不匹配: {bgr.shape} != {self.shape}")
+
+        with self._condition:
+            latest = int(self._meta[1])
+            slot = None
+            for i in range(1, self.slots + 1):
+                candidate = (latest + i) % self.slots
+                if candidate != latest and self._slot_pins[candidate] == 0:
+                    slot = candidate
+                    break
+            if slot is None:
+                self._meta[2] += 1
+                return False
+            self._slot_seq[slot] = -1  # 写入中
+
+        np.copyto(self._pixels[slot], bgr)
+
+        with self._condition:
+            seq = int(self._meta[0]) + 1
+            self._slot_seq[slot] = seq
+            self._slot_ts[slot] = timestamp
+            self._meta[0] = seq
+            self._meta[1] = slot
+            self._condition.notify_all()
+        return True
+
+    # ------------------------------------------------------------------ 读取端
+
+    def _pin_latest(self) -> Optional[Frame]:
+        """钉住最新帧槽并返回零拷贝Frame（调用方需持有锁）"""
+        slot = int(self._meta[1])
+        if slot < 0:
+            return None
+        self._slot_pins[slot] += 1
+        pin = self._slot_buffer_type.from_buffer(self._shm.buf, self._pixel_offset + slot * self._frame_bytes)
+        weakref.finalize(pin, self._unpin, slot)
+        # 不能直接用 self._pixels[slot]：其切片的base会折叠到 self._pixels，不引用中间视图
+        view = np.frombuffer(pin, dtype=np.uint8).reshape(self.shape)
+        self.frames_read += 1
+        return Frame(bgr=view, timestamp=float(self._slot_ts[slot]), seq=int(self._slot_seq[slot]))
+
+    def _unpin(self, slot: int):
+        try:
+            with self._condition:
+                self._slot_pins[slot] -= 1
+        except Exception:
+            # 缓冲已关闭
+            pass
+
+    def latest(self) -> Optional[Frame]:
+        """获取最新帧（不等待、不复制），还没有帧时返回None"""
+        with self._condition:
+            return self._pin_latest()
+
+    def get_frame_after(self, timestamp: float, timeout: float) -> Optional[Frame]:
+        """等待截图开始时间不早于timestamp的帧，超时返回None"""
+        with self._condition:
+            ready = self._condition.wait_for(
+                lambda: self._meta[1] >= 0 and self._slot_ts[int(self._meta[1])] >= timestamp, timeout)
+            if not ready:
+                return None
+            return self._pin_latest()
+
+    def close(self):
+        """关闭共享内存（创建者同时删除共享内存块）"""
+        try:
+            self._meta = self._slot_seq = self._slot_pins = self._slot_ts = self._pixels = None
+            self._shm.close()
+        except BufferError:
+            # 仍被引用的帧保持映射有效，进程退出时释放
+            logger.warning("仍有帧引用共享内存，延迟释放")
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _CaptureContext:
+    """截图进程中提供给截图后端的最小设备上下文"""
+
+    def __init__(self, serial: str, device_config: Dict):
+        from adbutils import adb
+        self.serial = serial
+        self.device_config = device_config
+        self.logger = logging.getLogger(f"Capture-{serial}")
+        self.adb_device = adb.device(serial)
+
+
+def capture_process_main(serial: str, device_config: Dict, ring: SharedFrameRing, stop_event,
+                         last_request, min_interval: float, idle_timeout: float):
+    """
+    截图进程入口：按截图后端持续截图写入共享内存环形缓冲
+
+    Args:
+        last_request: 读取端最近一次取帧的时间（共享double），超过idle_timeout未取帧时暂停截图
+    """
+    from src.device.capture_backend import create_capture_backend
+
+    try:
+        context = _CaptureContext(serial, device_config)
+        backend = create_capture_backend(context)
+    except Exception as e:
+        logger.error(f"截图进程初始化失败: {str(e)}")
+        return
+
+    size_warned = False
+    while not stop_event.is_set():
+        if time.time() - last_request.value > idle_timeout:
+            stop_event.wait(0.05)
+            continue
+
+        start_time = time.time()
+        try:
+            frame = Frame.from_any(backend.capture(), timestamp=start_time)
+        except Exception as e:
+            frame = None
+            logger.error(f"截图进程截图失败: {str(e)}")
+        if frame is None:
+            stop_event.wait(0.1)
+            continue
+
+        bgr = frame.bgr
+        if bgr.shape != ring.shape:
+            if not size_warned:
+                logger.warning(f"截图尺寸变化 {bgr.shape} != {ring.shape}，丢弃该帧")
+                size_warned = True
+            continue
+        ring.write(bgr, start_time)
+
+        remaining = min_interval - (time.time() - start_time)
+        if remaining > 0:
+            stop_event.wait(remaining)
+    ring.close()
+
+
+class ProcessCapturePipeline:
+    """
+    独立进程截图管线，接口与CapturePipeline一致
+
+    截图和解码在截图进程中完成，设备进程通过共享内存环形缓冲零拷贝读取最新帧
+    """
+
+    def __init__(self, device_state, slots: int = 4, min_interval: float = 0.0, idle_timeout: float = 3.0):
+        """
+        Args:
+            device_state: 设备状态对象
+            slots: 环形缓冲帧槽数量（同时被引用的帧超过 slots-1 个时截图进程会丢帧）
+            min_interval: 两次截图开始之间的最小间隔（秒）
+            idle_timeout: 超过该时间没有取帧请求则暂停截图（秒）
+        """
+        self.device_state = device_state
+        self.slots = slots
+        self.min_interval = min_interval
+        self.idle_timeout = idle_timeout
+        self.ring: Optional[SharedFrameRing] = None
+        self._process = None
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = self._context.Event()
+        self._last_request = self._context.Value('d', 0.0, lock=False)
+        self._start_failed = False
+        self._lock = threading.Lock()
+
+        # 统计
+        self.frames_served = 0
+        self.total_staleness = 0.0
+        self.max_staleness = 0.0
+        self.total_wait_time = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        """用一次同步截图确定帧尺寸，创建共享内存并启动截图进程（启动失败后不再重试）"""
+        with self._lock:
+            if self.running or self._start_failed:
+                return
+            if self.ring is not None:
+                # 截图进程意外退出后重新启动
+                self.device_state.logger.warning("截图进程已退出，正在重新启动")
+                self.ring.close()
+                self.ring = None
+            try:
+                frame = self.device_state.capture_frame()
+                if frame is None:
+                    raise RuntimeError("无法获取初始截图")
+                self.ring = SharedFrameRing(frame.bgr.shape, self.slots)
+                self._last_request.value = time.time()
+                self._process = self._context.Process(
+                    target=capture_process_main,
+                    args=(self.device_state.serial, self.device_state.device_config, self.ring,
+                          self._stop_event, self._last_request, self.min_interval, self.idle_timeout),
+                    name=f"Capture-{self.device_state.serial}",
+                    daemon=True
+                )
+                self._process.start()
+                self.device_state.logger.info(f"截图进程已启动 (共享内存帧槽 {self.slots} 个)")
+            except Exception as e:
+                self._start_failed = True
+                self.device_state.logger.error(f"启动截图进程失败，改为同步截图: {str(e)}")
+
+    def stop(self):
+        """停止截图进程并释放共享内存"""
+        self._stop_event.set()
+        if self._process is not None:
+            self._process.join(timeout=2)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def latest(self) -> Optional[Frame]:
+        """获取最新帧（不等待），同时标记有取帧需求"""
+        self._last_request.value = time.time()
+        return self.ring.latest() if self.ring else None
+
+    def get_frame_after(self, timestamp: float, timeout: float = 2.0) -> Optional[Frame]:
+        """获取截图开始时间不早于timestamp的最新帧，超时返回None"""
+        if self.ring is None:
+            return None
+        wait_start = time.time()
+        self._last_request.value = wait_start
+        frame = self.ring.get_frame_after(timestamp, timeout)
+        if frame is not None:
+            staleness = time.time() - frame.timestamp
+            self.frames_served += 1
+            self.total_wait_time += time.time() - wait_start
+            self.total_staleness += staleness
+            self.max_staleness = max(self.max_staleness, staleness)
+        return frame
+
+    def get_stats(self) -> Dict:
+        """获取管线统计信息"""
+        served = self.frames_served or 1
+        return {
+            'frames_captured': self.ring.write_seq if self.ring else 0,
+            'frames_dropped': self.ring.frames_dropped if self.ring else 0,
+            'frames_served': self.frames_served,
+            'avg_wait_time': self.total_wait_time / served,
+            'avg_staleness': self.total_staleness / served,
+            'max_staleness': self.max_staleness,
+        }
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出管线统计信息"""
+        log = target_logger or logger
+        stats = self.get_stats()
+        log.info(f"截图进程: 截图 {stats['frames_captured']} 帧 (帧槽占满丢弃 {stats['frames_dropped']}), 取帧 {stats['frames_served']} 次 (零拷贝), "
+                 f"平均等待 {stats['avg_wait_time'] * 1000:.0f}ms, "
+                 f"帧陈旧度 平均 {stats['avg_staleness'] * 1000:.0f}ms / 最大 {stats['max_staleness'] * 1000:.0f}ms")
@@ -0,0 +1,233 @@
+"""
+设备守护
+监控各设备工作线程（进程/协程）的存活和主循环心跳：崩溃或卡死的设备按指数退避重启；
+运行中修改配置文件增加或移除设备时，无需重启程序即可启动或停止对应设备
+"""
+
+import os
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from src.device.device_connector import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# 守护默认参数（可在配置文件 supervisor 中覆盖）
+DEFAULT_CHECK_INTERVAL = 5.0        # 检查间隔（秒）
+DEFAULT_HEARTBEAT_TIMEOUT = 600.0   # 主循环无心跳多久判定为卡死（秒）
+DEFAULT_RESTART_BACKOFF_BASE = 5.0  # 第一次重启前的等待（秒），连续失败时逐次翻倍
+DEFAULT_RESTART_BACKOFF_MAX = 300.0 # 重启等待上限（秒）
+
+STATE_RUNNING = "running"  # 运行中
+STATE_WAITING = "waiting"  # 已退出或卡死，等待重启
+STATE_STOPPED = "stopped"  # 已按请求停止，不再重启
+STATE_REMOVED = "removed"  # 已从配置中移除
+
+STATE_NAMES = {
+    STATE_RUNNING: "运行中",
+    STATE_WAITING: "等待重启",
+    STATE_STOPPED: "已停止",
+    STATE_REMOVED: "已移除",
+}
+
+
+class _SupervisedDevice:
+    """单个设备的守护记录"""
+
+    def __init__(self, device_config: Dict[str, Any]):
+        self.device_config = device_config
+        self.serial = device_config["serial"]
+        self.state = STATE_RUNNING
+        self.started_at = time.time()
+        self.restart_at = 0.0
+        # 连续失败次数，决定下次重启的退避时长；稳定运行一段时间后清零
+        self.failures = 0
+        self.restarts = 0
+        self.hangs = 0
+        # 已输出“等待旧工作线程退出”的日志
+        self.waiting_logged = False
+
+
+class DeviceSupervisor:
+    """
+    设备守护
+
+    - 工作线程/进程/协程意外退出（异常、连接失败）时按指数退避加抖动重启
+    - 主循环超过 heartbeat_timeout 没有心跳时判定为卡死：进程模式结束进程、asyncio模式取消协程，
+      线程模式无法强制结束线程，只通知旧线程退出；旧线程（或asyncio模式线程池中仍在执行的调用）
+      真正结束之前不会启动新的工作线程，避免两个工作线程同时操作同一台设备
+    - 因 'e' 命令等停止请求而结束的设备不再重启，全部设备停止后守护结束
+    - 配置文件修改时间变化后重新加载配置，按设备选择结果启动新增设备、停止已移除的设备
+    """
+
+    def __init__(self, device_manager, config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            device_manager: DeviceManager（负责设备的选择、启动和停止）
+            config: 配置中的 supervisor 部分
+        """
+        config = config or {}
+        self.device_manager = device_manager
+        self.check_interval = config.get("check_interval", DEFAULT_CHECK_INTERVAL)
+        self.heartbeat_timeout = config.get("heartbeat_timeout", DEFAULT_HEARTBEAT_TIMEOUT)
+        self.backoff_base = config.get("restart_backoff_base", DEFAULT_RESTART_BACKOFF_BASE)
+        self.backoff_max = config.get("restart_backoff_max", DEFAULT_RESTART_BACKOFF_MAX)
+        self.watch_config = config.get("watch_config", True)
+
+        self._devices: Dict[str, _SupervisedDevice] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._config_mtime = self._get_config_mtime()
+
+    def supervise(self, device_configs: List[Dict[str, Any]]):
+        """登记已启动的设备"""
+        for device_config in device_configs:
+            self._devices[device_config["serial"]] = _SupervisedDevice(device_config)
+
+    def start(self):
+        """启动守护线程"""
+        self._thread = threading.Thread(target=self._run, name="DeviceSupervisor", daemon=True)
+        self._thread.start()
+        logger.info(f"设备守护已启动: {len(self._devices)} 个设备, 心跳超时 {self.heartbeat_timeout:.0f}s")
+
+    def stop(self):
+        """停止守护（不再重启或增加设备）"""
+        self._stop_event.set()
+
+    def join(self):
+        """等待守护结束"""
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                if self.watch_config:
+                    self._check_config()
+                self._check_workers()
+            except Exception as e:
+                logger.exception(f"设备守护检查出错: {str(e)}")
+            if self._all_stopped():
+                logger.info("所有设备均已停止，设备守护结束")
+                break
+
+    def _all_stopped(self) -> bool:
+        states = [record.state for record in self._devices.values()]
+        return (STATE_STOPPED in states
+                and all(state in (STATE_STOPPED, STATE_REMOVED) for state in states))
+
+    def _get_config_mtime(self) -> Optional[float]:
+        config_manager = self.device_manager.config_manager
+        try:
+            return os.path.getmtime(config_manager.config_file)
+        except (OSError, AttributeError):
+            return None
+
+    def _check_config(self):
+        """配置文件变化（或开启自动发现）时重新选择设备"""
+        config_manager = self.device_manager.config_manager
+        mtime = self._get_config_mtime()
+        if mtime != self._config_mtime:
+            self._config_mtime = mtime
+            if not config_manager.reload():
+                logger.warning("配置文件已修改但校验失败，暂不调整设备")
+                return
+            logger.info("检测到配置文件变化，已重新加载")
+        elif not config_manager.config.get("auto_discover_devices", False):
+            return
+        self._reconcile(self.device_manager._select_devices())
+
+    def _reconcile(self, desired_configs: List[Dict[str, Any]]):
+        """启动新增的设备，停止已移除的设备"""
+        desired = {device_config["serial"]: device_config for device_config in desired_configs}
+        for serial, device_config in desired.items():
+            record = self._devices.get(serial)
+            if record is None or record.state == STATE_REMOVED:
+                logger.info(f"新增设备 {serial}，正在启动")
+                record = _SupervisedDevice(device_config)
+                self._devices[serial] = record
+                if self.device_manager._is_worker_alive(serial):
+                    # 移除后又加回的设备，旧工作线程退出后再启动
+                    record.state = STATE_WAITING
+                    record.restart_at = time.time()
+                else:
+                    self._start(record)
+            else:
+                # 配置变化在设备下次重启时生效
+                record.device_config = device_config
+
+        for serial, record in self._devices.items():
+            if serial not in desired and record.state in (STATE_RUNNING, STATE_WAITING):
+                logger.info(f"设备 {serial} 已从配置中移除，正在停止")
+                record.state = STATE_REMOVED
+                self.device_manager._stop_worker(serial)
+
+    def _check_workers(self):
+        now = time.time()
+        for record in list(self._devices.values()):
+            if record.state == STATE_RUNNING:
+                self._check_running(record, now)
+            elif record.state == STATE_WAITING and now >= record.restart_at:
+                if self.device_manager._is_worker_alive(record.serial):
+                    if not record.waiting_logged:
+                        logger.warning(f"设备 {record.serial} 的旧工作线程仍在运行，等待其退出后再重启")
+                        record.waiting_logged = True
+                    continue
+                logger.info(f"正在重启设备 {record.serial}")
+                record.restarts += 1
+                record.waiting_logged = False
+                self._start(record)
+
+    def _check_running(self, record: _SupervisedDevice, now: float):
+        manager = self.device_manager
+        device_state = manager.device_states.get(record.serial)
+        if manager._is_worker_alive(record.serial):
+            silence = now - device_state.last_heartbeat
+            if silence > self.heartbeat_timeout:
+                record.hangs += 1
+                logger.error(f"设备 {record.serial} 主循环已 {silence:.0f} 秒无心跳，判定为卡死，强制停止")
+                manager._stop_worker(record.serial, force=True)
+                self._schedule_restart(record, now, "卡死")
+            elif record.failures and now - record.started_at > self.backoff_max:
+                # 稳定运行足够久，下次失败重新从基础退避时长开始
+                record.failures = 0
+            return
+
+        if device_state is None or device_state.stop_requested:
+            record.state = STATE_STOPPED
+            logger.info(f"设备 {record.serial} 已停止")
+            return
+        self._schedule_restart(record, now, "工作线程已退出")
+
+    def _schedule_restart(self, record: _SupervisedDevice, now: float, reason: str):
+        record.failures += 1
+        delay = backoff_delay(record.failures, self.backoff_base, self.backoff_max)
+        record.state = STATE_WAITING
+        record.restart_at = now + delay
+        logger.warning(f"设备 {record.serial} {reason}，{delay:.1f}秒后重启 (连续第 {record.failures} 次)")
+
+    def _start(self, record: _SupervisedDevice):
+        record.state = STATE_RUNNING
+        record.started_at = time.time()
+        try:
+            self.device_manager._start_device(record.device_config, self.device_manager.worker_mode)
+        except Exception as e:
+            logger.error(f"启动设备 {record.serial} 失败: {str(e)}")
+            self._schedule_restart(record, time.time(), "启动失败")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各设备的守护统计"""
+        return {
+            serial: {'state': record.state, 'restarts': record.restarts, 'hangs': record.hangs,
+                     'failures': record.failures}
+            for serial, record in list(self._devices.items())
+        }
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出守护统计"""
+        log = target_logger or logger
+        for serial, stats in self.get_stats().items():
+            log.info(f"设备守护 {serial}: {STATE_NAMES.get(stats['state'], stats['state'])}, "
+                     f"重启 {stats['restarts']} 次 (其中卡死 {stats['hangs']} 次)")
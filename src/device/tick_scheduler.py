@@ -0,0 +1,107 @@
+"""
+主循环自适应节拍
+根据当前场景和最近是否有操作决定下一轮检测的间隔：即将发生状态切换的场景快速轮询，空闲场景指数退避
+"""
+
+import time
+import logging
+from typing import Dict, Optional, Tuple
+
+from src.config.game_constants import TICK_INTERVALS, TICK_BACKOFF_FACTOR
+from src.game.scene_classifier import SCENE_NAMES
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveTickScheduler:
+    """
+    自适应节拍调度器
+
+    - 每个场景有 (最小间隔, 最大间隔)
+    - 本轮点击了按钮或场景发生切换时回到最小间隔
+    - 连续空闲时间隔按退避系数增长，直到最大间隔
+    """
+
+    def __init__(self, intervals: Optional[Dict[str, Tuple[float, float]]] = None,
+                 backoff: float = TICK_BACKOFF_FACTOR):
+        """
+        Args:
+            intervals: 场景 -> (最小间隔, 最大间隔)（秒），未列出的场景使用 'unknown' 的设置
+            backoff: 空闲时每轮间隔的增长倍数
+        """
+        self.intervals = dict(TICK_INTERVALS)
+        if intervals:
+            self.intervals.update({scene: tuple(value) for scene, value in intervals.items()})
+        self.backoff = backoff
+        self.scene: Optional[str] = None
+        self.interval = self._bounds(None)[0]
+        self._last_tick: Optional[float] = None
+
+        # 统计：场景 -> [轮数, 间隔总和]
+        self._scene_ticks: Dict[str, list] = {}
+        self.total_ticks = 0
+        self.start_time = time.time()
+
+    def _bounds(self, scene: Optional[str]) -> Tuple[float, float]:
+        return self.intervals.get(scene) or self.intervals.get('unknown', (0.5, 1.0))
+
+    def next_interval(self, scene: str, acted: bool) -> float:
+        """
+        计算下一轮检测的间隔
+
+        Args:
+            scene: 当前场景
+            acted: 本轮是否处理了按钮（点击/执行回合操作）
+
+        Returns:
+            float: 距本轮开始应间隔的时间（秒）
+        """
+        min_interval, max_interval = self._bounds(scene)
+        if acted or scene != self.scene:
+            self.interval = min_interval
+        else:
+            self.interval = min(max(self.interval, min_interval) * self.backoff, max_interval)
+        self.scene = scene
+
+        now = time.time()
+        if self._last_tick is not None:
+            stats = self._scene_ticks.setdefault(scene, [0, 0.0])
+            stats[0] += 1
+            stats[1] += now - self._last_tick
+        self._last_tick = now
+        self.total_ticks += 1
+        return self.interval
+
+    def sleep(self, scene: str, acted: bool, process_time: float):
+        """按本轮结果计算间隔并等待（扣除本轮处理耗时）"""
+        interval = self.next_interval(scene, acted)
+        time.sleep(max(0.0, interval - process_time))
+
+    def get_stats(self) -> Dict:
+        """获取节拍统计信息"""
+        elapsed = time.time() - self.start_time
+        scenes = {}
+        for scene, (ticks, total) in self._scene_ticks.items():
+            avg = total / ticks if ticks else 0.0
+            scenes[scene] = {
+                'ticks': ticks,
+                'avg_interval': avg,
+                'tick_rate': 1.0 / avg if avg else 0.0,
+            }
+        return {
+            'scene': self.scene,
+            'current_interval': self.interval,
+            'total_ticks': self.total_ticks,
+            'tick_rate': self.total_ticks / elapsed if elapsed > 0 else 0.0,
+            'scenes': scenes,
+        }
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出节拍统计信息"""
+        log = target_logger or logger
+        stats = self.get_stats()
+        log.info(f"主循环节拍: 当前间隔 {stats['current_interval']:.2f}s, 共 {stats['total_ticks']} 轮, "
+                 f"平均 {stats['tick_rate']:.2f} 轮/秒")
+        for scene, scene_stats in stats['scenes'].items():
+            log.info(f"  [{SCENE_NAMES.get(scene, scene)}] {scene_stats['ticks']} 轮, 平均间隔 {scene_stats['avg_interval']:.2f}s "
+                     f"({scene_stats['tick_rate']:.2f} 轮/秒)")
@@ -10,7 +10,8 @@ from typing import TYPE_CHECKING
 from src.config.card_priorities import get_high_priority_cards
 from src.config import settings
 from src.config.game_constants import DEFAULT_ATTACK_TARGET, DEFAULT_ATTACK_RANDOM
-from src.game.game_actions import human_like_drag
+from src.game.game_actions import human_like_drag, human_like_drag_params
+from src.utils.utils import RoiStable
 
 if TYPE_CHECKING:
     from src.device.device_state import DeviceState
@@ -97,14 +98,14 @@ class CardPlaySpecialActions:
         if card_name == "勇武的堕天使奥莉薇":
             # 等待画面稳定
             from src.utils.utils import wait_for_screen_stable
-            wait_for_screen_stable(self.device_state)
+            wait_for_screen_stable(self.device_state, label="出牌")
             self.device_state.logger.info(f"检测到打出{card_name}，增加2点费用")
             # 这里需要在调用方处理费用增加，我们通过返回值来通知
             self._extra_cost_bonus = 2
         elif card_name == "白银骑士团团长艾蜜莉亚":
             # 等待画面稳定
             from src.utils.utils import wait_for_screen_stable
-            wait_for_screen_stable(self.device_state)
+            wait_for_screen_stable(self.device_state, label="出牌")
             self.device_state.logger.info(f"检测到打出{card_name}，增加3点费用")
             # 这里需要在调用方处理费用增加，我们通过返回值来通知
             self._extra_cost_bonus = 3
@@ -115,7 +116,7 @@ class CardPlaySpecialActions:
         if card_name in high_priority_names:
             # 等待画面稳定
             from src.utils.utils import wait_for_screen_stable
-            wait_for_screen_stable(self.device_state)
+            wait_for_screen_stable(self.device_state, label="出牌")
         
         time.sleep(0.1)
         return True
@@ -148,15 +149,15 @@ class CardPlaySpecialActions:
             return False
         else:
             self.device_state.logger.info(f"检测到{card_name}，划出卡牌后选择敌方玩家目标")
-            # 划出卡牌
-            human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-            time.sleep(0.1)  # 等待
         
         enemy_x = DEFAULT_ATTACK_TARGET[0] + random.randint(-DEFAULT_ATTACK_RANDOM, DEFAULT_ATTACK_RANDOM)
         enemy_y = DEFAULT_ATTACK_TARGET[1] + random.randint(-DEFAULT_ATTACK_RANDOM, DEFAULT_ATTACK_RANDOM)
-        self.device_state.u2_device.click(enemy_x, enemy_y)
+        # 划出卡牌 -> 等待 -> 选择敌方玩家，一次提交
+        script = self.device_state.gesture_script()
+        script.drag(*human_like_drag_params(center_x, center_y, target_x, 400)).wait(0.1)
+        script.tap(enemy_x, enemy_y).wait(0.1)
+        script.run()
         self.device_state.logger.info(f"{card_name}选择敌方玩家目标: ({enemy_x}, {enemy_y})")
-        time.sleep(0.1)  # 等待0.1秒
     
     def _handle_enemy_player_target(self, card_name, center_x, center_y, target_x):
         """处理优先破坏护盾，，否则选择敌方玩家目标"""
@@ -164,27 +165,24 @@ class CardPlaySpecialActions:
         shield_targets = self._scan_shield_targets()
         shield_detected = bool(shield_targets)
         
+        script = self.device_state.gesture_script()
+        # 划出卡牌
+        script.drag(*human_like_drag_params(center_x, center_y, target_x, 400))
         if shield_detected:
             self.device_state.logger.info(f"检测到护盾，划出{card_name}后破坏护盾随从")
-            # 划出卡牌
-            human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-            time.sleep(0.3)  # 等待
-            
             # 点击护盾随从（选择第一个护盾）
             shield_x, shield_y = shield_targets[0]
-            self.device_state.u2_device.click(shield_x, shield_y)
+            script.wait(0.3).tap(shield_x, shield_y)
             self.device_state.logger.info(f"点击护盾随从位置: ({shield_x}, {shield_y})")
         else:
             self.device_state.logger.info(f"检测到{card_name}，划出卡牌后选择敌方玩家目标")
-            # 划出卡牌
-            human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-            time.sleep(0.1)  # 等待
+            script.wait(0.1)
         
         enemy_x = DEFAULT_ATTACK_TARGET[0] + random.randint(-DEFAULT_ATTACK_RANDOM, DEFAULT_ATTACK_RANDOM)
         enemy_y = DEFAULT_ATTACK_TARGET[1] + random.randint(-DEFAULT_ATTACK_RANDOM, DEFAULT_ATTACK_RANDOM)
-        self.device_state.u2_device.click(enemy_x, enemy_y)
+        script.tap(enemy_x, enemy_y).wait(0.1)
+        script.run()
         self.device_state.logger.info(f"{card_name}选择敌方玩家目标: ({enemy_x}, {enemy_y})")
-        time.sleep(0.1)  # 等待0.1秒
     
     def _handle_shield_or_highest_hp_target(self, card_name, center_x, center_y, target_x):
         """处理优先破坏护盾，否则选择血量最高的敌方随从"""
@@ -195,59 +193,59 @@ class CardPlaySpecialActions:
         
         if shield_detected:
             self.device_state.logger.info("检测到护盾，划出卡牌后破坏护盾随从")
-            # 划出卡牌
-            human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-            time.sleep(0.3)  # 等待
-            
-            # 点击护盾随从（选择第一个护盾）
+            # 划出卡牌后点击护盾随从（选择第一个护盾），一次提交
             shield_x, shield_y = shield_targets[0]
-            self.device_state.u2_device.click(shield_x, shield_y)
+            script = self.device_state.gesture_script()
+            script.drag(*human_like_drag_params(center_x, center_y, target_x, 400)).wait(0.3)
+            script.tap(shield_x, shield_y)
+            script.run()
             self.device_state.logger.info(f"点击护盾随从位置: ({shield_x}, {shield_y})")
         else:
             self.device_state.logger.info("未检测到护盾，尝试检测血量最高的敌方随从")
 
-            # 检测敌方随从
+            # 检测敌方随从（划出卡牌前完成识别，划出和点击可以一次提交）
             screenshot = self.device_state.take_screenshot()
-            time.sleep(0.1)  # 等待0.1秒
-            # 划出卡牌
-            human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-            time.sleep(0.1)  # 等待0.1秒
-            if screenshot:
-                enemy_followers = self._scan_enemy_followers(screenshot)
-                if enemy_followers:
-                    # 找出血量最高的随从
-                    try:
-                        max_hp_follower = max(enemy_followers, key=lambda x: int(x[3]) if x[3].isdigit() else 0)
-                        enemy_x, enemy_y, _, _ = max_hp_follower
-                        enemy_x = int(enemy_x)
-                        enemy_y = int(enemy_y)
-                        self.device_state.u2_device.click(enemy_x, enemy_y)
-                        self.device_state.logger.info(f"点击血量最高的敌方随从位置: ({enemy_x}, {enemy_y})")
-                    except Exception as e:
-                        self.device_state.logger.warning(f"选择敌方随从时出错: {str(e)}")
+            enemy_followers = self._scan_enemy_followers(screenshot) if screenshot else []
+            drag_params = human_like_drag_params(center_x, center_y, target_x, 400)
+            if screenshot and enemy_followers:
+                script = self.device_state.gesture_script()
+                script.drag(*drag_params).wait(0.3)
+                # 找出血量最高的随从
+                try:
+                    max_hp_follower = max(enemy_followers, key=lambda x: int(x[3]) if x[3].isdigit() else 0)
+                    enemy_x, enemy_y, _, _ = max_hp_follower
+                    enemy_x = int(enemy_x)
+                    enemy_y = int(enemy_y)
+                    script.tap(enemy_x, enemy_y)
+                    self.device_state.logger.info(f"点击血量最高的敌方随从位置: ({enemy_x}, {enemy_y})")
+                except Exception as e:
+                    self.device_state.logger.warning(f"选择敌方随从时出错: {str(e)}")
+                script.run()
+            else:
+                # 划出卡牌，可选目标需要划出后再识别
+                self.device_state.gesture_script().drag(*drag_params).wait(0.1).run()
+            if screenshot and not enemy_followers:
+                player_x = DEFAULT_ATTACK_TARGET[0] + random.randint(-DEFAULT_ATTACK_RANDOM, DEFAULT_ATTACK_RANDOM)
+                player_y = DEFAULT_ATTACK_TARGET[1] + random.randint(-DEFAULT_ATTACK_RANDOM, DEFAULT_ATTACK_RANDOM)
+                self.device_state.logger.info("未检测到敌方随从，尝试检测敌方护符或者其他可选择目标")
+                time.sleep(0.5)  # 等待0.几秒
+                can_choosetargets = self.device_state.game_manager.card_can_choose_target_like_amulet()
+                # 依次点击可选目标后确认并点击敌方玩家，一次提交
+                script = self.device_state.gesture_script()
+                for pos in can_choosetargets or []:
+                    script.tap(pos[0], pos[1]).wait(0.1)
+                script.tap(645+random.randint(-3, 3), 232+random.randint(-2, 2)).wait(0.1)
+                script.tap(player_x+random.randint(-3, 3), player_y+random.randint(-2, 2))
+                script.run()
+                if can_choosetargets:
+                    self.device_state.logger.info(f"选择了一个可破坏目标(护符之类)")
                 else:
-                    player_x = DEFAULT_ATTACK_TARGET[0] + random.randint(-DEFAULT_ATTACK_RANDOM, DEFAULT_ATTACK_RANDOM)
-                    player_y = DEFAULT_ATTACK_TARGET[1] + random.randint(-DEFAULT_ATTACK_RANDOM, DEFAULT_ATTACK_RANDOM)
-                    self.device_state.logger.info("未检测到敌方随从，尝试检测敌方护符或者其他可选择目标")
-                    time.sleep(0.5)  # 等待0.几秒
-                    can_choosetargets = self.device_state.game_manager.card_can_choose_target_like_amulet()
-                    if can_choosetargets:
-                        for pos in can_choosetargets:
-                            self.device_state.u2_device.click(pos[0], pos[1])
-                            time.sleep(0.1)
+                    self.device_state.logger.info("未检测到可破坏目标")
 
-                        self.device_state.u2_device.click(645+random.randint(-3, 3),232+random.randint(-2, 2))
-                        time.sleep(0.1)
-                        self.device_state.u2_device.click(player_x+random.randint(-3, 3), player_y+random.randint(-2, 2))
-                        self.device_state.logger.info(f"选择了一个可破坏目标(护符之类)")
-                    else:
-                        self.device_state.u2_device.click(645+random.randint(-3, 3),232+random.randint(-2, 2))
-                        time.sleep(0.1)
-                        self.device_state.u2_device.click(player_x+random.randint(-3, 3), player_y+random.randint(-2, 2))
-                        self.device_state.logger.info("未检测到可破坏目标")
 
-
-        time.sleep(2.7)
+        # 等待指向性效果结算完成（画面稳定即可继续，最长仍为原来的2.7秒）
+        self.device_state.wait_until(RoiStable(), timeout=2.7, min_wait=0.8,
+                                     legacy_delay=2.7, label=f"{card_name}效果结算")
     
     def _handle_shield_or_highest_hp_noenemy_retrun_point_target(self, card_name, center_x, center_y, target_x):
         """处理优先破坏护盾，否则选择血量最高的敌方随从，若未检测到敌方随从则不消耗能量点"""
@@ -258,15 +256,16 @@ class CardPlaySpecialActions:
         
         if shield_detected:
             self.device_state.logger.info("检测到护盾，划出卡牌后破坏护盾随从")
-            # 划出卡牌
-            human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-            time.sleep(0.5)  # 等待
-            
-            # 点击护盾随从（选择第一个护盾）
+            # 划出卡牌后点击护盾随从（选择第一个护盾），一次提交
             shield_x, shield_y = shield_targets[0]
-            self.device_state.u2_device.click(shield_x, shield_y)
+            script = self.device_state.gesture_script()
+            script.drag(*human_like_drag_params(center_x, center_y, target_x, 400)).wait(0.5)
+            script.tap(shield_x, shield_y)
+            script.run()
             self.device_state.logger.info(f"点击护盾随从位置: ({shield_x}, {shield_y})")
-            time.sleep(2.7)
+            # 等待指向性效果结算完成（画面稳定即可继续，最长仍为原来的2.7秒）
+            self.device_state.wait_until(RoiStable(), timeout=2.7, min_wait=0.8,
+                                         legacy_delay=2.7, label=f"{card_name}效果结算")
         else:
             self.device_state.logger.info("未检测到护盾，检测敌方随从")
             # 检测敌方随从
@@ -275,9 +274,9 @@ class CardPlaySpecialActions:
                 enemy_followers = self._scan_enemy_followers(screenshot)
                 if enemy_followers:
                     self.device_state.logger.info("检测到敌方随从，划出卡牌后破坏血量最高的敌方随从")
+                    script = self.device_state.gesture_script()
                     # 划出卡牌
-                    human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-                    time.sleep(0.2)  # 等待0.2秒
+                    script.drag(*human_like_drag_params(center_x, center_y, target_x, 400)).wait(0.2)
                     
                     # 找出血量最高的随从
                     try:
@@ -285,11 +284,14 @@ class CardPlaySpecialActions:
                         enemy_x, enemy_y, _, _ = max_hp_follower
                         enemy_x = int(enemy_x)
                         enemy_y = int(enemy_y)
-                        self.device_state.u2_device.click(enemy_x, enemy_y)
+                        script.tap(enemy_x, enemy_y)
                         self.device_state.logger.info(f"点击血量最高的敌方随从位置: ({enemy_x}, {enemy_y})")
                     except Exception as e:
                         self.device_state.logger.warning(f"选择敌方随从时出错: {str(e)}")
-                    time.sleep(2.7)
+                    script.run()
+                    # 等待指向性效果结算完成（画面稳定即可继续，最长仍为原来的2.7秒）
+                    self.device_state.wait_until(RoiStable(), timeout=2.7, min_wait=0.8,
+                                                 legacy_delay=2.7, label=f"{card_name}效果结算")
                 else:
                     self.device_state.logger.info("未检测到敌方随从，不消耗能量点，直接返回")
                     # 不划出卡牌，不消耗能量点
@@ -305,25 +307,23 @@ class CardPlaySpecialActions:
             enemy_followers = self._scan_enemy_followers(screenshot)
             # 只保留HP为数字且<=5的随从
             valid_targets = [f for f in enemy_followers if f[3].isdigit() and int(f[3]) <= 5]
+            # 划出该手牌后点击目标，一次提交
+            script = self.device_state.gesture_script()
+            drag_params = human_like_drag_params(center_x, center_y, target_x, 400)
             
             if valid_targets:
-                # 划出该手牌
-                human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-                time.sleep(0.2)
+                script.drag(*drag_params).wait(0.2)
                 
                 # 选择血量最大的
                 target = max(valid_targets, key=lambda f: int(f[3]))
                 self.device_state.logger.info(f"[划出{card_name}]，点击血量最大敌方随从: ({target[0]}, {target[1]}) HP={target[3]}")
-                self.device_state.u2_device.click(int(target[0]), int(target[1]))
-                time.sleep(0.2)
+                script.tap(int(target[0]), int(target[1])).wait(0.2)
             else:
                 # 没有血量小于5的随从，检查是否有其他敌方随从
                 if enemy_followers:
                     # 有敌方随从，选择血量最大的
                     self.device_state.logger.info(f"划出[{card_name}]，未检测到血量小于5的敌方随从，选择血量最大的敌方随从")
-                    # 划出该手牌
-                    human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-                    time.sleep(0.3)
+                    script.drag(*drag_params).wait(0.3)
                     
                     # 选择血量最大的敌方随从
                     try:
@@ -331,25 +331,23 @@ class CardPlaySpecialActions:
                         enemy_x, enemy_y, _, hp = max_hp_follower
                         enemy_x = int(enemy_x)
                         enemy_y = int(enemy_y)
-                        self.device_state.u2_device.click(enemy_x, enemy_y)
+                        script.tap(enemy_x, enemy_y)
                         self.device_state.logger.info(f"划出[{card_name}]，点击血量最大的敌方随从: ({enemy_x}, {enemy_y}) HP={hp}")
                     except Exception as e:
                         self.device_state.logger.warning(f"划出[{card_name}]，选择敌方随从时出错: {str(e)}")
-                    time.sleep(0.2)
+                    script.wait(0.2)
                 else:
                     # 一个敌方随从都没有，点击指定位置
                     self.device_state.logger.info(f"划出[{card_name}]，未检测到任何敌方随从")
-                    # 划出该手牌
-                    human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-                    time.sleep(0.2)
+                    script.drag(*drag_params).wait(0.2)
                     
                     # 点击指定位置 (611, 227)
-                    self.device_state.u2_device.click(611+random.randint(-3, 3), 227+random.randint(-2, 2))
-                    time.sleep(0.2)
+                    script.tap(611+random.randint(-3, 3), 227+random.randint(-2, 2)).wait(0.2)
+            script.run()
     
     def _default_card_play(self, center_x, center_y, target_x):
         """默认卡牌打出"""
-        human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
+        human_like_drag(self.device_state.input, center_x, center_y, target_x, 400)
     
 
     
@@ -371,13 +369,8 @@ class CardPlaySpecialActions:
         """处理扫描我方随从数量选择选项（王断的威光）"""
         self.device_state.logger.info(f"检测到{card_name}，扫描我方随从数量")
         
-        # 扫描我方随从
+        # 扫描我方随从（划出卡牌前完成识别，划出和选择选项可以一次提交）
         screenshot = self.device_state.take_screenshot()
-        time.sleep(0.2)  # 等待
-
-        # 划出卡牌
-        human_like_drag(self.device_state.u2_device, center_x, center_y, target_x, 400)
-        time.sleep(0.2)  # 等待
         if screenshot:
             our_followers = self._scan_our_followers(screenshot)
             follower_count = len(our_followers)
@@ -394,9 +387,11 @@ class CardPlaySpecialActions:
                 click_x, click_y = 724, 429
                 self.device_state.logger.info(f"随从数量>3，强化随从")
             
-            # 执行点击
-            self.device_state.u2_device.click(click_x+random.randint(-15, 15), click_y+random.randint(-2, 2))
-            time.sleep(0.5)  # 等待点击响应
+            # 划出卡牌 -> 等待选项出现 -> 点击选项 -> 等待点击响应
+            script = self.device_state.gesture_script()
+            script.drag(*human_like_drag_params(center_x, center_y, target_x, 400)).wait(0.4)
+            script.tap(click_x+random.randint(-15, 15), click_y+random.randint(-2, 2)).wait(0.5)
+            script.run()
         else:
             self.device_state.logger.warning("无法获取截图，使用默认处理")
             # 如果无法获取截图，使用默认处理
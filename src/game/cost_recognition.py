@@ -3,8 +3,13 @@
 实现卡牌费用数字的识别功能
 """
 
+import cv2
+import numpy as np
+import os
+import re
 import logging
-from typing import Tuple
+import threading
+from typing import Dict, List, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -39,4 +44,115 @@ class CostRecognition:
     
     def get_confidence_threshold(self) -> float:
         """获取置信度阈值"""
-        return self.cost_confidence_threshold 
\ No newline at end of file
+        return self.cost_confidence_threshold
+
+
+class CostDigitTemplateBank:
+    """
+    费用数字模板库
+    模板只从磁盘读取和二值化一次，按目标尺寸缓存为堆叠数组，SSIM对所有模板一次向量化计算
+    """
+
+    _shared_banks: Dict[str, "CostDigitTemplateBank"] = {}
+    _shared_lock = threading.Lock()
+
+    # SSIM参数（与全局SSIM实现保持一致）
+    C1 = (0.01 * 255) ** 2
+    C2 = (0.03 * 255) ** 2
+
+    @classmethod
+    def get_shared(cls, template_dir: str) -> "CostDigitTemplateBank":
+        """获取指定模板目录的共享模板库（进程内每个目录只加载一次）"""
+        with cls._shared_lock:
+            if template_dir not in cls._shared_banks:
+                cls._shared_banks[template_dir] = cls(template_dir)
+            return cls._shared_banks[template_dir]
+
+    def __init__(self, template_dir: str, binary_threshold: int = 170, cost_range: Tuple[int, int] = (0, 9)):
+        self.template_dir = template_dir
+        self.binary_threshold = binary_threshold
+        self.costs: List[int] = []
+        self.paths: List[str] = []
+        self._binary_templates: List[np.ndarray] = []
+        self._resized_banks: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self._load_templates(cost_range)
+
+    def _load_templates(self, cost_range: Tuple[int, int]):
+        """读取并二值化所有费用数字模板（文件名格式: 费用_序号.png）"""
+        if not os.path.isdir(self.template_dir):
+            logger.warning(f"未找到费用数字模板目录: {self.template_dir}")
+            return
+        cost_min, cost_max = cost_range
+        for filename in sorted(os.listdir(self.template_dir)):
+            match = re.match(r'^(\d+)_.*\.png$', filename)
+            if not match:
+                continue
+            cost = int(match.group(1))
+            if cost < cost_min or cost > cost_max:
+                continue
+            path = os.path.join(self.template_dir, filename)
+            template = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if template is None:
+                logger.warning(f"无法读取费用模板: {path}")
+                continue
+            _, template_binary = cv2.threshold(template, self.binary_threshold, 255, cv2.THRESH_BINARY)
+            self.costs.append(cost)
+            self.paths.append(path)
+            self._binary_templates.append(template_binary)
+        logger.info(f"已加载 {len(self.costs)} 个费用数字模板: {self.template_dir}")
+
+    def _get_bank(self, shape: Tuple[int, int]):
+        """获取指定尺寸的模板堆叠数组及其均值/方差（按尺寸缓存）"""
+        bank = self._resized_banks.get(shape)
+        if bank is None:
+            with self._lock:
+                bank = self._resized_banks.get(shape)
+                if bank is None:
+                    h, w = shape
+                    resized = np.stack([cv2.resize(t, (w, h)) for t in self._binary_templates])
+                    flat = resized.reshape(len(resized), -1).astype(np.float64)
+                    bank = (resized, flat, flat.mean(axis=1), flat.var(axis=1))
+                    self._resized_banks[shape] = bank
+        return bank
+
+    def get_resized_template(self, index: int, shape: Tuple[int, int]) -> np.ndarray:
+        """获取调整到指定尺寸后的二值化模板（用于调试对比图）"""
+        return self._get_bank(shape)[0][index]
+
+    def score(self, digit_roi: np.ndarray) -> np.ndarray:
+        """
+        计算数字区域与所有模板的全局SSIM
+
+        Returns:
+            np.ndarray: 与self.costs一一对应的SSIM分数，范围[0,1]
+        """
+        if not self._binary_templates:
+            return np.zeros(0, dtype=np.float64)
+        _, flat, mu_t, var_t = self._get_bank(digit_roi.shape[:2])
+        x = digit_roi.astype(np.uint8).reshape(-1).astype(np.float64)
+        mu_x = x.mean()
+        var_x = x.var()
+        cov = (flat - mu_t[:, None]) @ (x - mu_x) / x.size
+
+        numerator = (2 * mu_t * mu_x + self.C1) * (2 * cov + self.C2)
+        denominator = (mu_t ** 2 + mu_x ** 2 + self.C1) * (var_t + var_x + self.C2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ssim = np.where(denominator != 0, numerator / denominator, 0.0)
+        return np.clip(ssim, 0.0, 1.0)
+
+    def match(self, digit_roi: np.ndarray) -> Tuple[int, float, np.ndarray]:
+        """
+        匹配费用数字
+
+        Returns:
+            Tuple[int, float, np.ndarray]: (最佳费用, 最佳SSIM, 全部模板的SSIM分数)
+        """
+        scores = self.score(digit_roi)
+        if scores.size == 0:
+            return 0, 0.0, scores
+        best_index = int(np.argmax(scores))
+        best_ssim = float(scores[best_index])
+        if best_ssim <= 0:
+            return 0, 0.0, scores
+        return self.costs[best_index], best_ssim, scores
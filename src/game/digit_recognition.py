@@ -0,0 +1,185 @@
+"""
+随从数字识别模块
+将血量/攻击力数字模板堆叠为矩阵，一次矩阵乘法完成全部模板打分，
+只有模板结果不明确时才交给OCR
+"""
+
+import cv2
+import numpy as np
+import os
+import re
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 数字归一化后的统一尺寸 (宽, 高)
+DIGIT_CANONICAL_SIZE = (20, 24)
+
+
+def _foreground_box(binary: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """
+    获取数字前景的外接框 (x1, y1, x2, y2)
+    只保留高度不低于最高连通域一半的连通域，去掉裁剪边缘的零碎噪点
+    """
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if count <= 1:
+        return None
+    components = stats[1:]
+    max_height = components[:, cv2.CC_STAT_HEIGHT].max()
+    components = components[components[:, cv2.CC_STAT_HEIGHT] >= max_height * 0.5]
+    x1 = int(components[:, cv2.CC_STAT_LEFT].min())
+    y1 = int(components[:, cv2.CC_STAT_TOP].min())
+    x2 = int((components[:, cv2.CC_STAT_LEFT] + components[:, cv2.CC_STAT_WIDTH]).max())
+    y2 = int((components[:, cv2.CC_STAT_TOP] + components[:, cv2.CC_STAT_HEIGHT]).max())
+    return x1, y1, x2, y2
+
+
+def normalize_digit(image: np.ndarray, size: Tuple[int, int] = DIGIT_CANONICAL_SIZE) -> Optional[np.ndarray]:
+    """
+    将数字图像裁剪到前景外接框并缩放到统一尺寸，返回零均值单位范数的特征向量
+
+    Args:
+        image: 单通道数字图像(二值化轮廓图)
+        size: 统一尺寸 (宽, 高)
+
+    Returns:
+        Optional[np.ndarray]: 特征向量，图像无前景时返回None
+    """
+    _, binary = cv2.threshold(image, 127, 255, cv2.THRESH_BINARY)
+    box = _foreground_box(binary)
+    if box is None:
+        return None
+    x1, y1, x2, y2 = box
+    digit = cv2.resize(binary[y1:y2, x1:x2], size, interpolation=cv2.INTER_AREA)
+    vector = digit.reshape(-1).astype(np.float32)
+    vector -= vector.mean()
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return None
+    return vector / norm
+
+
+class DigitTemplateBank:
+    """
+    数字模板库
+    模板文件名格式: 数值_序号.png，所有模板归一化后堆叠为 (模板数, 像素数) 的矩阵
+    """
+
+    _shared_banks: Dict[str, "DigitTemplateBank"] = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def get_shared(cls, template_dir: str) -> "DigitTemplateBank":
+        """获取指定模板目录的共享模板库（进程内每个目录只加载一次）"""
+        with cls._shared_lock:
+            if template_dir not in cls._shared_banks:
+                cls._shared_banks[template_dir] = cls(template_dir)
+            return cls._shared_banks[template_dir]
+
+    def __init__(self, template_dir: str, size: Tuple[int, int] = DIGIT_CANONICAL_SIZE):
+        self.template_dir = template_dir
+        self.size = size
+        self.values: List[str] = []
+        self._matrix = np.zeros((0, size[0] * size[1]), dtype=np.float32)
+        self._load_templates()
+
+    def _load_templates(self):
+        """读取全部数字模板并构建归一化矩阵"""
+        if not os.path.isdir(self.template_dir):
+            logger.warning(f"未找到数字模板目录: {self.template_dir}")
+            return
+        vectors = []
+        for filename in sorted(os.listdir(self.template_dir)):
+            if not filename.lower().endswith(".png"):
+                continue
+            match = re.match(r"(\d+)", filename)
+            if not match:
+                continue
+            template = cv2.imread(os.path.join(self.template_dir, filename), cv2.IMREAD_GRAYSCALE)
+            if template is None:
+                logger.warning(f"无法读取数字模板: {filename}")
+                continue
+            vector = normalize_digit(template, self.size)
+            if vector is None:
+                logger.warning(f"数字模板没有前景像素: {filename}")
+                continue
+            self.values.append(match.group(1))
+            vectors.append(vector)
+        if vectors:
+            self._matrix = np.stack(vectors)
+        logger.info(f"已构建数字模板库: {self.template_dir} ({len(self.values)} 个模板)")
+
+    def __len__(self):
+        return len(self.values)
+
+    def match(self, image: np.ndarray) -> Tuple[Optional[str], float, float]:
+        """
+        匹配一个数字图像
+
+        Returns:
+            Tuple[Optional[str], float, float]: (最佳数值, 最佳相关系数, 与其他数值最佳相关系数的差距)
+        """
+        if not self.values:
+            return None, 0.0, 0.0
+        vector = normalize_digit(image, self.size)
+        if vector is None:
+            return None, 0.0, 0.0
+        scores = self._matrix @ vector
+        best_index = int(np.argmax(scores))
+        best_value = self.values[best_index]
+        best_score = float(scores[best_index])
+        # 差距只和“其他数值”的模板比较，同一数值的多个模板不算歧义
+        other_scores = [float(score) for value, score in zip(self.values, scores) if value != best_value]
+        runner_up = max(other_scores) if other_scores else -1.0
+        return best_value, best_score, best_score - runner_up
+
+
+class DigitRecognizer:
+    """
+    随从数字识别引擎：模板库为主路径，结果不明确的数字交给OCR
+
+    使用方式：先对全场数字调用 match_templates，再把返回None的数字批量OCR
+    """
+
+    def __init__(self, template_dir: str, min_score: float = 0.75, min_margin: float = 0.08):
+        """
+        Args:
+            template_dir: 数字模板目录
+            min_score: 最佳模板相关系数的下限
+            min_margin: 最佳数值与次佳数值相关系数差距的下限
+        """
+        self.bank = DigitTemplateBank.get_shared(template_dir)
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.template_hits = 0
+        self.ambiguous = 0
+
+    def match_templates(self, crops: List[np.ndarray]) -> List[Optional[str]]:
+        """
+        用模板库识别一组数字图像
+
+        Returns:
+            List[Optional[str]]: 与crops一一对应的数值，结果不明确时为None
+        """
+        results = []
+        for crop in crops:
+            value, score, margin = self.bank.match(crop)
+            if value is not None and score >= self.min_score and margin >= self.min_margin:
+                self.template_hits += 1
+                results.append(value)
+            else:
+                self.ambiguous += 1
+                logger.debug(f"数字模板结果不明确: 最佳={value} 相关系数={score:.3f} 差距={margin:.3f}")
+                results.append(None)
+        return results
+
+    def get_stats(self) -> Dict:
+        """获取识别统计信息"""
+        total = self.template_hits + self.ambiguous
+        return {
+            'template_hits': self.template_hits,
+            'ambiguous': self.ambiguous,
+            'template_hit_rate': self.template_hits / total if total else 0.0,
+        }
@@ -80,10 +80,12 @@ class EvolutionSpecialActions:
                 sorted_targets = sorted(valid_targets, key=lambda f: int(f[3]), reverse=True)
                 targets_to_click = sorted_targets[:2]
                 
+                # 依次点击目标，一次提交
+                script = self.device_state.gesture_script()
                 for i, target in enumerate(targets_to_click):
                     self.device_state.logger.info(f"[{follower_name}]{evolution_type}后点击第{i+1}个敌方HP<=3随从: ({target[0]}, {target[1]}) HP={target[3]}")
-                    self.device_state.u2_device.click(int(target[0]), int(target[1]))
-                    time.sleep(0.5)
+                    script.tap(int(target[0]), int(target[1])).wait(0.5)
+                script.run()
             else:
                 self.device_state.logger.info(f"[{follower_name}]{evolution_type}后未找到HP<=3随从")
     
@@ -98,7 +100,7 @@ class EvolutionSpecialActions:
                 # 选择血量最大的
                 target = max(valid_targets, key=lambda f: int(f[3]))
                 self.device_state.logger.info(f"[{follower_name}]{evolution_type}后点击血量最大敌方随从: ({target[0]}, {target[1]}) HP={target[3]}")
-                self.device_state.u2_device.click(int(target[0]), int(target[1]))
+                self.device_state.input.click(int(target[0]), int(target[1]))
                 time.sleep(0.5)
             else:
                 self.device_state.logger.info(f"[{follower_name}]{evolution_type}后未找到有效敌方随从")
@@ -147,7 +149,7 @@ class EvolutionSpecialActions:
                 else:
                     self.device_state.logger.info(f"[{follower_name}]{evolution_type}后选择我方未进化随从: {target_name}")
                 
-                self.device_state.u2_device.click(int(target_x), int(target_y))
+                self.device_state.input.click(int(target_x), int(target_y))
                 time.sleep(0.5)
                 
                 # # 检查选择的随从是否也有进化/超进化特殊操作
@@ -163,7 +165,7 @@ class EvolutionSpecialActions:
                     target_x, target_y, target_type, target_name = target
                     
                     self.device_state.logger.info(f"[{follower_name}]{evolution_type}后选择我方随从")
-                    self.device_state.u2_device.click(int(target_x), int(target_y))
+                    self.device_state.input.click(int(target_x), int(target_y))
                     time.sleep(0.5)
                     
                     # 注意：无名字随从无法检查是否有特殊操作，因为不知道其名称
@@ -183,7 +185,7 @@ class EvolutionSpecialActions:
                 # 选择血量最大的
                 target = max(valid_targets, key=lambda f: int(f[3]))
                 self.device_state.logger.info(f"[{follower_name}]进化后点击敌方HP<=3且最大随从: ({target[0]}, {target[1]}) HP={target[3]}")
-                self.device_state.u2_device.click(int(target[0]), int(target[1]))
+                self.device_state.input.click(int(target[0]), int(target[1]))
                 time.sleep(0.5)
             else:
                 self.device_state.logger.info(f"[{follower_name}]进化后未找到HP<=3随从")
@@ -16,17 +16,33 @@ from src.config import settings
 from src.config.game_constants import (
     DEFAULT_ATTACK_TARGET, DEFAULT_ATTACK_RANDOM,
     POSITION_RANDOM_RANGE, SHOW_CARDS_BUTTON, SHOW_CARDS_RANDOM_X, SHOW_CARDS_RANDOM_Y,
-    BLANK_CLICK_POSITION, BLANK_CLICK_RANDOM
+    BLANK_CLICK_POSITION, BLANK_CLICK_RANDOM, ENEMY_BOARD_REGION, SPECULATIVE_SIMILARITY_THRESHOLD,
+    HAND_CARDS_REGION
 )
 import math
 from src.config.card_priorities import get_card_priority, is_evolve_priority_card, get_evolve_priority_cards, is_evolve_special_action_card, get_evolve_special_actions
 from src.config.config_manager import ConfigManager
-import glob
+from src.game.cost_recognition import CostDigitTemplateBank
 from src.utils.follower_utils import get_follower_attack, get_follower_hp
+from src.utils.frame import Frame
+from src.utils.utils import make_thumbnail, thumbnail_similarity, RoiStable, TemplateVisible
+from src.utils.vision_pool import VisionWorkerPool, PRIORITY_CRITICAL
 
 logger = logging.getLogger(__name__)
 
 
+class SpeculativeTask:
+    """推测执行的扫描任务：记录扫描所用的帧和关注区域，取结果时据此判断结果是否过期"""
+
+    def __init__(self, label, scan_fn, frame, region, future):
+        self.label = label
+        self.scan_fn = scan_fn
+        self.frame = frame
+        self.region = region
+        self.future = future
+        self.start_time = time.time()
+
+
 class GameActions:
     """游戏操作类"""
     
@@ -35,6 +51,9 @@ class GameActions:
         # 初始化手牌管理器，只创建一次
         from .hand_card_manager import HandCardManager
         self.hand_manager = HandCardManager(device_state)
+        # 推测扫描统计
+        self.speculative_hits = 0
+        self.speculative_misses = 0
     
     @property
     def follower_manager(self):
@@ -116,9 +135,9 @@ class GameActions:
                         self.device_state.logger.info(f"使用{type_name}随从[{fname}](攻击力:{f_atk})攻击护盾(血量:{shield_hp})")
                     else:
                         self.device_state.logger.info(f"使用{type_name}随从攻击护盾")
-                    human_like_drag(self.device_state.u2_device, fx, fy, shield_x, shield_y, duration=random.uniform(*settings.get_human_like_drag_duration_range()))
+                    human_like_drag(self.device_state.input, fx, fy, shield_x, shield_y, duration=random.uniform(*settings.get_human_like_drag_duration_range()))
                     from src.utils.utils import wait_for_screen_stable
-                    wait_for_screen_stable(self.device_state)
+                    wait_for_screen_stable(self.device_state, label="攻击护盾")
                 else:
                     # 如果没有找到任何可以攻击的随从
                     self.device_state.logger.info("没有可用的突进/疾驰随从攻击护盾")
@@ -153,7 +172,7 @@ class GameActions:
                 else:
                     self.device_state.logger.info("使用疾驰随从攻击敌方玩家")
                 target_x, target_y = default_target
-                human_like_drag(self.device_state.u2_device, x, y, target_x, target_y, duration=random.uniform(*settings.get_human_like_drag_duration_range()))
+                human_like_drag(self.device_state.input, x, y, target_x, target_y, duration=random.uniform(*settings.get_human_like_drag_duration_range()))
                 extra_attack_times_map = {
                     '雷维翁之斧杰诺': 1,
                     '雷维翁的迅雷阿尔贝尔': 1,
@@ -168,7 +187,7 @@ class GameActions:
                         for i in range(extra_attack_times_map[name]):
                             time.sleep(0.4)
                             human_like_drag(
-                                self.device_state.u2_device,
+                                self.device_state.input,
                                 x, y, target_x, target_y,
                                 duration=random.uniform(*settings.get_human_like_drag_duration_range())
                             )
@@ -188,7 +207,7 @@ class GameActions:
 
             # 等待画面稳定
             from src.utils.utils import wait_for_screen_stable
-            wait_for_screen_stable(self.device_state)
+            wait_for_screen_stable(self.device_state, label="攻击")
             # 每轮攻击前都扫描敌方随从
             enemy_screenshot = self.device_state.take_screenshot()
             if not enemy_screenshot:
@@ -278,14 +297,14 @@ class GameActions:
                     self.device_state.logger.info(f"使用突进随从攻击敌方随从,第{now_count}/{max_attack_count}次")
                 
                 human_like_drag(
-                    self.device_state.u2_device,
+                    self.device_state.input,
                     best_yellow_follower[0], best_yellow_follower[1],
                     enemy_x, enemy_y,
                     duration=random.uniform(*settings.get_human_like_drag_duration_range())
                 )
                 # 等待画面稳定
                 from src.utils.utils import wait_for_screen_stable
-                wait_for_screen_stable(self.device_state)
+                wait_for_screen_stable(self.device_state, label="攻击")
             else:
                 # 如果没有找到合适的攻击目标，检查是否所有随从攻击力都小于敌方血量
                 # 如果是，则按攻击力降序使用随从攻击血量最高的敌方随从
@@ -334,14 +353,14 @@ class GameActions:
                             self.device_state.logger.info(f"使用随从攻击敌方随从(血量:{max_hp}),第{now_count}/{max_attack_count}次")
                         
                         human_like_drag(
-                            self.device_state.u2_device,
+                            self.device_state.input,
                             best_fx, best_fy,
                             enemy_x, enemy_y,
                             duration=random.uniform(*settings.get_human_like_drag_duration_range())
                         )
                         # 等待画面稳定
                         from src.utils.utils import wait_for_screen_stable
-                        wait_for_screen_stable(self.device_state)
+                        wait_for_screen_stable(self.device_state, label="突进攻击")
                     else:
                         self.device_state.logger.info("没有合适的突进随从攻击敌方随从")
                         break
@@ -415,19 +434,22 @@ class GameActions:
                     follower_name = f[3] if len(f) > 3 else None
                     break
             # 点击该位置
-            self.device_state.u2_device.click(x, y)
-            time.sleep(0.5)  # 等待进化按钮出现
+            self.device_state.input.click(x, y)
+            # 等待进化按钮出现（随从无法进化时最多等待原来的0.5秒）
+            wait_result = self.device_state.wait_until(
+                TemplateVisible(self._load_super_evolution_template(), self._load_evolution_template(), threshold=0.80),
+                timeout=0.5, min_wait=0.1, legacy_delay=0.5, label="进化按钮"
+            )
 
-            # 获取新截图检测进化按钮
-            new_screenshot = self.device_state.take_screenshot()
+            # 获取新截图检测进化按钮（条件满足时直接复用该帧）
+            new_screenshot = wait_result.frame or self.device_state.take_screenshot()
             if new_screenshot is None:
                 self.device_state.logger.warning(f"位置 {pos} 无法获取截图，跳过检测")
                 time.sleep(0.1)
                 continue
 
             # 转换为OpenCV格式
-            new_screenshot_np = np.array(new_screenshot)
-            new_screenshot_cv = cv2.cvtColor(new_screenshot_np, cv2.COLOR_RGB2BGR)
+            new_screenshot_cv = new_screenshot.bgr
 
             # 同时检查两个检测函数
             max_loc, max_val = self._detect_super_evolution_button(new_screenshot_cv)
@@ -436,7 +458,7 @@ class GameActions:
                 if template_info:
                     center_x = max_loc[0] + template_info['w'] // 2
                     center_y = max_loc[1] + template_info['h'] // 2
-                    self.device_state.u2_device.click(center_x, center_y)
+                    self.device_state.input.click(center_x, center_y)
                     self.device_state.super_evolution_point -= 1
                     if follower_name:
                         if is_evolve_priority_card(follower_name):
@@ -445,13 +467,13 @@ class GameActions:
                     else:
                         self.device_state.logger.info(f"检测到超进化按钮并点击，剩余超进化次数：{self.device_state.super_evolution_point}")
                     # 等待画面稳定
-                    wait_for_screen_stable(self.device_state)
+                    wait_for_screen_stable(self.device_state, label="超进化")
 
                     # 超进化后的特殊操作（如铁拳神父）
                     if follower_name and is_evolve_special_action_card(follower_name):
                         self._handle_evolve_special_action( clear_screenshot, follower_name, pos, is_super_evolution=True, existing_followers=all_followers)
                         # 等待画面稳定
-                        wait_for_screen_stable(self.device_state)
+                        wait_for_screen_stable(self.device_state, label="超进化特殊操作")
                     # 如果超进化到突进或者普通随从，则再检查无护盾后攻击敌方随从
                     if follower_type in ["yellow", "normal"]:
                         # 检查敌方护盾
@@ -477,7 +499,7 @@ class GameActions:
 
                                     enemy_x, enemy_y, _, hp_value = max_hp_follower
                                     # 使用原来的随从位置作为起始点
-                                    human_like_drag(self.device_state.u2_device, pos[0], pos[1], enemy_x, enemy_y, duration=random.uniform(*settings.get_human_like_drag_duration_range()))
+                                    human_like_drag(self.device_state.input, pos[0], pos[1], enemy_x, enemy_y, duration=random.uniform(*settings.get_human_like_drag_duration_range()))
                                     time.sleep(0.4)
                                     if follower_name:
                                         self.device_state.logger.info(f"超进化了[{follower_name}]并攻击了敌方较高血量随从")
@@ -491,7 +513,7 @@ class GameActions:
                 if template_info:
                     center_x = max_loc1[0] + template_info['w'] // 2
                     center_y = max_loc1[1] + template_info['h'] // 2
-                    self.device_state.u2_device.click(center_x, center_y)
+                    self.device_state.input.click(center_x, center_y)
                     self.device_state.evolution_point -= 1
                     if follower_name:
                         if is_evolve_priority_card(follower_name):
@@ -518,58 +540,118 @@ class GameActions:
         evolution_actions = EvolutionSpecialActions(self.device_state)
         evolution_actions.handle_evolve_special_action(screenshot ,follower_name, pos, is_super_evolution, existing_followers)
 
+    def start_speculative_scan(self, label, scan_fn, frame=None, region=ENEMY_BOARD_REGION):
+        """
+        在后台推测执行一次场面扫描，调用方可以继续执行点击等操作
+
+        Args:
+            label: 任务名称（日志用）
+            scan_fn: 扫描函数，参数为截图帧
+            frame: 扫描使用的帧，默认立即截图
+            region: 扫描结果所依赖的画面区域，取结果时比较该区域判断结果是否过期
+
+        Returns:
+            Optional[SpeculativeTask]: 无法截图时返回None
+        """
+        frame = Frame.from_any(frame if frame is not None else self.device_state.take_screenshot())
+        if frame is None:
+            return None
+        future = VisionWorkerPool.get_shared().submit(
+            scan_fn, frame, device=self.device_state.serial, priority=PRIORITY_CRITICAL
+        )
+        return SpeculativeTask(label, scan_fn, frame, region, future)
+
+    def collect_speculative(self, task, fresh_frame=None, default=None):
+        """
+        获取推测扫描结果：关注区域与最新画面一致时直接使用，否则丢弃并在最新画面上重新扫描
+
+        Args:
+            task: start_speculative_scan 返回的任务
+            fresh_frame: 最新截图帧，默认立即截图
+            default: 扫描失败时的返回值
+        """
+        if task is None:
+            return default
+        fresh_frame = Frame.from_any(fresh_frame if fresh_frame is not None else self.device_state.take_screenshot())
+
+        valid = False
+        if fresh_frame is not None:
+            similarity = thumbnail_similarity(make_thumbnail(task.frame, task.region, scale=0.25),
+                                              make_thumbnail(fresh_frame, task.region, scale=0.25))
+            valid = similarity >= SPECULATIVE_SIMILARITY_THRESHOLD
+        else:
+            # 无法获取新画面时只能使用推测结果
+            similarity = 0.0
+            valid = True
+
+        if valid:
+            try:
+                result = task.future.result()
+                self.speculative_hits += 1
+                self.device_state.logger.debug(f"推测扫描[{task.label}]结果有效 (画面一致度 {similarity:.3f})")
+                return result
+            except Exception as e:
+                self.device_state.logger.warning(f"推测扫描[{task.label}]失败，重新扫描: {str(e)}")
+        else:
+            task.future.cancel()
+            self.device_state.logger.info(f"场面已变化 (一致度 {similarity:.3f})，丢弃推测扫描[{task.label}]结果并重新扫描")
+
+        self.speculative_misses += 1
+        if fresh_frame is None:
+            return default
+        try:
+            return task.scan_fn(fresh_frame)
+        except Exception as e:
+            self.device_state.logger.warning(f"{task.label}失败: {str(e)}")
+            return default
+
     def perform_full_actions(self):
         """720P分辨率下的出牌攻击操作"""
-        from concurrent.futures import ThreadPoolExecutor
-        # 并发调用scan_enemy_ATK
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            enemy_future = executor.submit(self._scan_enemy_ATK, self.device_state.take_screenshot())
+        # 后台推测扫描敌方随从，与收牌/展牌/出牌操作重叠
+        enemy_task = self.start_speculative_scan("敌方随从检测", self._scan_enemy_ATK)
 
         #点击空白处收牌
         time.sleep(0.1)
-        self.device_state.u2_device.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
+        self.device_state.input.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
 
         
         # 展牌一次
         time.sleep(0.1)
-        self.device_state.u2_device.click(
+        self.device_state.input.click(
             SHOW_CARDS_BUTTON[0] + random.randint(SHOW_CARDS_RANDOM_X[0], SHOW_CARDS_RANDOM_X[1]),
             SHOW_CARDS_BUTTON[1] + random.randint(SHOW_CARDS_RANDOM_Y[0], SHOW_CARDS_RANDOM_Y[1])
         )
         
         #移除手牌光标提高识别率
-        self.device_state.u2_device.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
-        time.sleep(0.5)
+        self.device_state.input.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
+        # 等待手牌展开
+        self.device_state.wait_until(RoiStable(HAND_CARDS_REGION), timeout=0.5, min_wait=0.2,
+                                     legacy_delay=0.5, label="展牌")
         
         # 获取截图
         screenshot = self.device_state.take_screenshot()
-        image = np.array(screenshot)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        image = screenshot.bgr
         
         # 执行出牌逻辑
         self._play_cards(image)
         # 等待画面稳定
         from src.utils.utils import wait_for_screen_stable
-        wait_for_screen_stable(self.device_state)
+        wait_for_screen_stable(self.device_state, label="出牌")
 
         # 点击绝对无遮挡处关闭可能扰乱识别的面板
         from src.config.game_constants import BLANK_CLICK_POSITION, BLANK_CLICK_RANDOM
-        self.device_state.u2_device.click(
+        self.device_state.input.click(
             BLANK_CLICK_POSITION[0] + random.randint(-BLANK_CLICK_RANDOM, BLANK_CLICK_RANDOM),
             BLANK_CLICK_POSITION[1] + random.randint(-BLANK_CLICK_RANDOM, BLANK_CLICK_RANDOM)
         )
         time.sleep(0.1)
 
-        # 获取并发调用的敌方检测结果
-        try:
-            enemy_check = enemy_future.result()
-            # self.device_state.logger.info(f"出牌前有 {len(enemy_check)} 个敌方随从")
-        except Exception as e:
-            self.device_state.logger.warning(f"敌方随从检测失败: {str(e)}")
-            enemy_check = []
-
         # 获取随从位置
         screenshot = self.device_state.take_screenshot()
+
+        # 获取推测扫描的敌方检测结果（出牌改变了敌方场面时在最新画面上重新扫描）
+        enemy_check = self.collect_speculative(enemy_task, screenshot, default=[])
+
         if screenshot:
             blue_positions = self._scan_our_followers(screenshot)
             self.follower_manager.update_positions(blue_positions)
@@ -586,24 +668,23 @@ class GameActions:
 
     def perform_fullPlus_actions(self):
         """执行进化/超进化与攻击操作"""
-        from concurrent.futures import ThreadPoolExecutor
-
-        # 并发调用scan_enemy_ATK
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            enemy_future = executor.submit(self._scan_enemy_ATK, self.device_state.take_screenshot())
+        # 后台推测扫描敌方随从，与收牌/展牌/出牌操作重叠
+        enemy_task = self.start_speculative_scan("敌方随从检测", self._scan_enemy_ATK)
         #点击空白处收牌
         time.sleep(0.1)
-        self.device_state.u2_device.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
+        self.device_state.input.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
 
         # 展牌
         time.sleep(0.1)
-        self.device_state.u2_device.click(
+        self.device_state.input.click(
             SHOW_CARDS_BUTTON[0] + random.randint(SHOW_CARDS_RANDOM_X[0], SHOW_CARDS_RANDOM_X[1]),
             SHOW_CARDS_BUTTON[1] + random.randint(SHOW_CARDS_RANDOM_Y[0], SHOW_CARDS_RANDOM_Y[1])
         )
         time.sleep(0.1)
-        self.device_state.u2_device.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
-        time.sleep(0.5)
+        self.device_state.input.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
+        # 等待手牌展开
+        self.device_state.wait_until(RoiStable(HAND_CARDS_REGION), timeout=0.5, min_wait=0.2,
+                                     legacy_delay=0.5, label="展牌")
         
 
         # 获取截图
@@ -613,34 +694,30 @@ class GameActions:
             return
 
         # 转换为OpenCV格式
-        image = np.array(screenshot)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        image = screenshot.bgr
 
         # 执行出牌逻辑
         self._play_cards(image)
 
         # 等待画面稳定
         from src.utils.utils import wait_for_screen_stable
-        wait_for_screen_stable(self.device_state)
+        wait_for_screen_stable(self.device_state, label="出牌")
 
         # # 点击绝对无遮挡处关闭可能扰乱识别的面板
         from src.config.game_constants import BLANK_CLICK_POSITION, BLANK_CLICK_RANDOM
-        self.device_state.u2_device.click(
+        self.device_state.input.click(
             BLANK_CLICK_POSITION[0] + random.randint(-BLANK_CLICK_RANDOM, BLANK_CLICK_RANDOM),
             BLANK_CLICK_POSITION[1] + random.randint(-BLANK_CLICK_RANDOM, BLANK_CLICK_RANDOM)
         )
-        time.sleep(1)
-
-        #获取并发调用的敌方检测结果
-        try:
-            enemy_check = enemy_future.result()
-            # self.device_state.logger.info(f"出牌前有 {len(enemy_check)} 个敌方随从")
-        except Exception as e:
-            self.device_state.logger.warning(f"敌方随从检测失败: {str(e)}")
-            enemy_check = []
+        # 等待面板关闭
+        self.device_state.wait_until(RoiStable(), timeout=1.0, min_wait=0.2, legacy_delay=1.0, label="关闭面板")
 
         # 获取我方随从位置和类型
         screenshot = self.device_state.take_screenshot()
+
+        # 获取推测扫描的敌方检测结果（出牌改变了敌方场面时在最新画面上重新扫描）
+        enemy_check = self.collect_speculative(enemy_task, screenshot, default=[])
+
         if screenshot:
             our_followers_positions = self._scan_our_followers(screenshot)
             self.follower_manager.update_positions(our_followers_positions)
@@ -679,10 +756,10 @@ class GameActions:
             self.perform_evolution_actions()
             # 等待画面稳定
             from src.utils.utils import wait_for_screen_stable
-            wait_for_screen_stable(self.device_state)
+            wait_for_screen_stable(self.device_state, label="进化")
             # 点击空白处关闭面板
             from src.config.game_constants import BLANK_CLICK_POSITION, BLANK_CLICK_RANDOM
-            self.device_state.u2_device.click(
+            self.device_state.input.click(
                 BLANK_CLICK_POSITION[0] + random.randint(-BLANK_CLICK_RANDOM, BLANK_CLICK_RANDOM),
                 BLANK_CLICK_POSITION[1] + random.randint(-BLANK_CLICK_RANDOM, BLANK_CLICK_RANDOM)
             )
@@ -747,7 +824,7 @@ class GameActions:
                         if extra_point:
                             x, y, confidence = extra_point
                             self.device_state.logger.info(f"点击额外费用点按钮")
-                            self.device_state.u2_device.click(x, y)
+                            self.device_state.input.click(x, y)
                             time.sleep(0.2)
                             available_cost += 1  # 增加1点费用
                             self.device_state.extra_cost_remaining_uses -= 1
@@ -763,7 +840,7 @@ class GameActions:
                     if extra_point:
                         x, y, confidence = extra_point
                         self.device_state.logger.info(f"点击额外费用点按钮")
-                        self.device_state.u2_device.click(x, y)
+                        self.device_state.input.click(x, y)
                         time.sleep(0.1)
                         available_cost += 1  # 增加1点费用
                         self.device_state.extra_cost_remaining_uses -= 1
@@ -787,7 +864,7 @@ class GameActions:
                     if extra_point:
                         x, y, confidence = extra_point
                         self.device_state.logger.info(f"点击额外费用点按钮")
-                        self.device_state.u2_device.click(x, y)
+                        self.device_state.input.click(x, y)
                         time.sleep(0.1)
                         available_cost += 1  # 增加1点费用
                         
@@ -922,14 +999,15 @@ class GameActions:
             if planned_cards and (remain_cost > 0 or any(c.get('cost', 0) == 0 for c in planned_cards)):
                 #点击空白处收牌
                 time.sleep(0.1)
-                self.device_state.u2_device.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
+                self.device_state.input.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
                 time.sleep(0.1)
                 #点击展牌位置
-                self.device_state.u2_device.click(SHOW_CARDS_BUTTON[0] + random.randint(-2,2), SHOW_CARDS_BUTTON[1] + random.randint(-2,2))
+                self.device_state.input.click(SHOW_CARDS_BUTTON[0] + random.randint(-2,2), SHOW_CARDS_BUTTON[1] + random.randint(-2,2))
                 time.sleep(0.2)
                 #移除手牌光标提高识别率
-                self.device_state.u2_device.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
-                time.sleep(1)
+                self.device_state.input.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
+                self.device_state.wait_until(RoiStable(HAND_CARDS_REGION), timeout=1.0, min_wait=0.3,
+                                             legacy_delay=1.0, label="展牌")
                 new_cards = hand_manager.get_hand_cards_with_retry(max_retries=2, silent=True)
                 if new_cards:
                     card_info = []
@@ -982,14 +1060,15 @@ class GameActions:
         self.device_state.logger.info(f"检测到打出{last_played_card}用完费用，额外扫描一次手牌")
         #点击空白处收牌
         time.sleep(0.1)
-        self.device_state.u2_device.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
+        self.device_state.input.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
         # 点击展牌位置
         time.sleep(0.1)
-        self.device_state.u2_device.click(SHOW_CARDS_BUTTON[0] + random.randint(-2,2), SHOW_CARDS_BUTTON[1] + random.randint(-2,2))
+        self.device_state.input.click(SHOW_CARDS_BUTTON[0] + random.randint(-2,2), SHOW_CARDS_BUTTON[1] + random.randint(-2,2))
         time.sleep(0.2)
         #移除手牌光标提高识别率
-        self.device_state.u2_device.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
-        time.sleep(1)
+        self.device_state.input.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
+        self.device_state.wait_until(RoiStable(HAND_CARDS_REGION), timeout=1.0, min_wait=0.3,
+                                     legacy_delay=1.0, label="展牌")
         
         new_cards = hand_manager.get_hand_cards_with_retry(max_retries=2, silent=True)
         if new_cards:
@@ -1030,14 +1109,15 @@ class GameActions:
                 time.sleep(0.3)
                 #点击空白处收牌
                 time.sleep(0.1)
-                self.device_state.u2_device.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
+                self.device_state.input.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
                 time.sleep(0.1)
                 # 再次点击展牌位置
-                self.device_state.u2_device.click(SHOW_CARDS_BUTTON[0] + random.randint(-2,2), SHOW_CARDS_BUTTON[1] + random.randint(-2,2))
+                self.device_state.input.click(SHOW_CARDS_BUTTON[0] + random.randint(-2,2), SHOW_CARDS_BUTTON[1] + random.randint(-2,2))
                 time.sleep(0.1)
                 #移除手牌光标提高识别率
-                self.device_state.u2_device.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
-                time.sleep(1)
+                self.device_state.input.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
+                self.device_state.wait_until(RoiStable(HAND_CARDS_REGION), timeout=1.0, min_wait=0.3,
+                                             legacy_delay=1.0, label="展牌")
                 
                 new_cards = hand_manager.get_hand_cards_with_retry(max_retries=3, silent=True)
                 if new_cards:
@@ -1082,14 +1162,15 @@ class GameActions:
             # 第二次扫描
             time.sleep(0.1)
             #点击空白处收牌
-            self.device_state.u2_device.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
+            self.device_state.input.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
             time.sleep(0.1)
             # 再次点击展牌位置
-            self.device_state.u2_device.click(SHOW_CARDS_BUTTON[0] + random.randint(-2,2), SHOW_CARDS_BUTTON[1] + random.randint(-2,2))
+            self.device_state.input.click(SHOW_CARDS_BUTTON[0] + random.randint(-2,2), SHOW_CARDS_BUTTON[1] + random.randint(-2,2))
             time.sleep(0.2)
             #移除手牌光标提高识别率
-            self.device_state.u2_device.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
-            time.sleep(1.5)
+            self.device_state.input.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
+            self.device_state.wait_until(RoiStable(HAND_CARDS_REGION), timeout=1.5, min_wait=0.3,
+                                         legacy_delay=1.5, label="展牌")
             
             new_cards = hand_manager.get_hand_cards_with_retry(max_retries=3, silent=True)
             if new_cards:
@@ -1205,8 +1286,7 @@ class GameActions:
             if screenshot is None:
                 self.device_state.logger.warning("无法获取截图")
                 return False
-            image = np.array(screenshot)
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            image = screenshot.bgr
             # 换牌区
             roi_x1, roi_y1, roi_x2, roi_y2 = 173, 404, 838, 452
             change_area = image[roi_y1:roi_y2, roi_x1:roi_x2]
@@ -1214,7 +1294,7 @@ class GameActions:
             # 创建用于绘制的换牌区副本
             change_area_draw = change_area.copy()
             
-            hsv = cv2.cvtColor(change_area, cv2.COLOR_BGR2HSV)
+            hsv = screenshot.region_hsv((roi_x1, roi_y1, roi_x2, roi_y2))
             lower_green = np.array([43, 85, 70])
             upper_green = np.array([54, 255, 255])
             mask = cv2.inRange(hsv, lower_green, upper_green)
@@ -1276,7 +1356,7 @@ class GameActions:
                 
                 if cost > change_card_cost_threshold:
                     self.device_state.logger.info(f"检测到费用{cost}的卡牌，换牌")
-                    human_like_drag(self.device_state.u2_device, center_x+66, 516, center_x+66,208, duration=random.uniform(*settings.get_human_like_drag_duration_range()))
+                    human_like_drag(self.device_state.input, center_x+66, 516, center_x+66,208, duration=random.uniform(*settings.get_human_like_drag_duration_range()))
             
             # 保存带有所有绿点的原图
             if debug_flag:
@@ -1376,90 +1456,53 @@ class GameActions:
             return 0, 0.0
 
     def _ssim_match_digit(self, digit_roi, device_state=None, debug_flag=False, digit_index=1):
-        """使用SSIM相似度匹配单个数字"""
+        """使用SSIM相似度匹配单个数字（模板库常驻内存，所有模板一次向量化打分）"""
         try:
             # 使用template_manager中已经设置好的模板目录
             templates_dir = self.device_state.game_manager.template_manager.templates_dir
-            template_dir = f"{templates_dir}/cost_numbers"
-            best_cost = 0
-            best_ssim = 0.0
-            best_template_path = ""
-            
-            for cost in range(10):  # 0-9
-                # 加载该数字的模板
-                template_paths = glob.glob(os.path.join(template_dir, f"{cost}_*.png"))
-                if not template_paths:
-                    continue
-                
-                for template_path in template_paths:
-                    template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
-                    if template is None:
-                        continue
-                    
-                    # 二值化模板
-                    _, template_binary = cv2.threshold(template, 170, 255, cv2.THRESH_BINARY)
-                    
-                    # 调整模板大小以匹配目标
-                    h, w = digit_roi.shape
-                    template_resized = cv2.resize(template_binary, (w, h))
-                    
-                    # 计算SSIM相似度
-                    ssim_score = self._calculate_ssim(digit_roi, template_resized)
-                    
-                    if ssim_score > best_ssim:
-                        best_ssim = ssim_score
-                        best_cost = cost
-                        best_template_path = template_path
-                    
-                    # 保存匹配过程（用于调试）
-                    if debug_flag and device_state and device_state.logger and ssim_score > 0.5:
-                        debug_cost_dir = "debug_cost"
-                        if not os.path.exists(debug_cost_dir):
-                            os.makedirs(debug_cost_dir)
-                        
-                        # 保存模板匹配对比图
-                        template_name = os.path.basename(template_path).split('.')[0]
-                        comparison_filename = f"comparison_digit{digit_index}_cost{cost}_{template_name}_ssim{ssim_score:.3f}_{int(time.time()*1000)}.png"
-                        comparison_path = os.path.join(debug_cost_dir, comparison_filename)
-                        
-                        # 创建对比图：原数字 | 模板 | 差异
-                        h_roi, w_roi = digit_roi.shape
-                        h_tpl, w_tpl = template_resized.shape
-                        max_h = max(h_roi, h_tpl)
-                        comparison_img = np.zeros((max_h, w_roi + w_tpl + 10), dtype=np.uint8)
-                        
-                        # 放置原数字
-                        comparison_img[:h_roi, :w_roi] = digit_roi
-                        # 放置模板
-                        comparison_img[:h_tpl, w_roi+10:w_roi+10+w_tpl] = template_resized
-                        
-                        cv2.imwrite(comparison_path, comparison_img)
-                        device_state.logger.debug(f"已保存匹配对比图: {comparison_filename}")
-            
-            # 保存最佳匹配结果
-            if debug_flag and device_state and device_state.logger and best_ssim > 0:
+            template_bank = CostDigitTemplateBank.get_shared(f"{templates_dir}/cost_numbers")
+            best_cost, best_ssim, scores = template_bank.match(digit_roi)
+
+            if device_state and device_state.logger and scores.size:
+                score_text = ", ".join(f"{cost}:{score:.3f}" for cost, score in zip(template_bank.costs, scores))
+                device_state.logger.debug(f"费用模板SSIM分数: [{score_text}]")
+
+            if debug_flag and device_state and device_state.logger:
                 debug_cost_dir = "debug_cost"
                 if not os.path.exists(debug_cost_dir):
                     os.makedirs(debug_cost_dir)
-                
-                best_template_name = os.path.basename(best_template_path).split('.')[0]
-                best_match_filename = f"best_match_digit{digit_index}_cost{best_cost}_{best_template_name}_ssim{best_ssim:.3f}_{int(time.time()*1000)}.png"
-                best_match_path = os.path.join(debug_cost_dir, best_match_filename)
-                
-                # 创建最佳匹配对比图
                 h_roi, w_roi = digit_roi.shape
-                best_template = cv2.imread(best_template_path, cv2.IMREAD_GRAYSCALE)
-                _, best_template_binary = cv2.threshold(best_template, 170, 255, cv2.THRESH_BINARY)
-                best_template_resized = cv2.resize(best_template_binary, (w_roi, h_roi))
-                
-                max_h = max(h_roi, best_template_resized.shape[0])
-                best_comparison_img = np.zeros((max_h, w_roi + w_roi + 10), dtype=np.uint8)
-                best_comparison_img[:h_roi, :w_roi] = digit_roi
-                best_comparison_img[:h_roi, w_roi+10:w_roi*2+10] = best_template_resized
-                
-                cv2.imwrite(best_match_path, best_comparison_img)
-                device_state.logger.info(f"已保存最佳匹配结果: {best_match_filename}")
-            
+
+                # 保存匹配过程（用于调试）
+                for index, ssim_score in enumerate(scores):
+                    if ssim_score <= 0.5:
+                        continue
+                    cost = template_bank.costs[index]
+                    template_resized = template_bank.get_resized_template(index, (h_roi, w_roi))
+                    template_name = os.path.basename(template_bank.paths[index]).split('.')[0]
+                    comparison_filename = f"comparison_digit{digit_index}_cost{cost}_{template_name}_ssim{ssim_score:.3f}_{int(time.time()*1000)}.png"
+                    comparison_path = os.path.join(debug_cost_dir, comparison_filename)
+
+                    # 创建对比图：原数字 | 模板
+                    comparison_img = np.zeros((h_roi, w_roi * 2 + 10), dtype=np.uint8)
+                    comparison_img[:, :w_roi] = digit_roi
+                    comparison_img[:, w_roi+10:] = template_resized
+                    cv2.imwrite(comparison_path, comparison_img)
+                    device_state.logger.debug(f"已保存匹配对比图: {comparison_filename}")
+
+                # 保存最佳匹配结果
+                if best_ssim > 0:
+                    best_index = int(np.argmax(scores))
+                    best_template_name = os.path.basename(template_bank.paths[best_index]).split('.')[0]
+                    best_match_filename = f"best_match_digit{digit_index}_cost{best_cost}_{best_template_name}_ssim{best_ssim:.3f}_{int(time.time()*1000)}.png"
+                    best_match_path = os.path.join(debug_cost_dir, best_match_filename)
+
+                    best_comparison_img = np.zeros((h_roi, w_roi * 2 + 10), dtype=np.uint8)
+                    best_comparison_img[:, :w_roi] = digit_roi
+                    best_comparison_img[:, w_roi+10:] = template_bank.get_resized_template(best_index, (h_roi, w_roi))
+                    cv2.imwrite(best_match_path, best_comparison_img)
+                    device_state.logger.info(f"已保存最佳匹配结果: {best_match_filename}")
+
             return best_cost, best_ssim
             
         except Exception as e:
@@ -1556,8 +1599,8 @@ class GameActions:
             return self.device_state.game_manager.template_manager.load_super_evolution_template()
         return None 
 
-def human_like_drag(u2_device, x1, y1, x2, y2, duration=None):
-    """用一次swipe实现拟人拖动，兼容 uiautomator2 设备，强制参数合法"""
+def human_like_drag_params(x1, y1, x2, y2, duration=None):
+    """计算拟人拖动的实际参数（起终点微小扰动、限制在屏幕内），返回 (sx, sy, ex, ey, duration)"""
     import random
     # 屏幕分辨率范围（如有需要可根据实际设备动态获取）
     SCREEN_WIDTH = 1280
@@ -1588,4 +1631,9 @@ def human_like_drag(u2_device, x1, y1, x2, y2, duration=None):
         except Exception:
             duration = 0.02
         duration = max(0.05, min(1.0, duration))  # 限制拖动时长在0.05~1秒
-    u2_device.swipe(sx, sy, ex, ey, duration) 
\ No newline at end of file
+    return sx, sy, ex, ey, duration
+
+
+def human_like_drag(input_device, x1, y1, x2, y2, duration=None):
+    """用一次swipe实现拟人拖动，input_device 为 device_state.input 或 uiautomator2 设备，强制参数合法"""
+    input_device.swipe(*human_like_drag_params(x1, y1, x2, y2, duration)) 
\ No newline at end of file
@@ -14,13 +14,19 @@ from src.game.follower_manager import FollowerManager
 from src.game.cost_recognition import CostRecognition
 from src.game.template_manager import TemplateManager
 from src.game.game_actions import GameActions
-from src.utils.gpu_utils import get_easyocr_reader
+from src.game.sift_feature_cache import SiftFeatureStore
+from src.game.scene_classifier import SceneClassifier
+from src.game.digit_recognition import DigitRecognizer
+from src.utils.ocr_service import get_ocr_service
+from src.utils.frame import Frame
+from src.utils.vision_pool import VisionWorkerPool, PRIORITY_CRITICAL
 from src.config.game_constants import (
     ENEMY_HP_REGION, ENEMY_HP_HSV, ENEMY_FOLLOWER_Y_ADJUST, ENEMY_FOLLOWER_Y_RANDOM,
     OUR_FOLLOWER_REGION, OUR_ATK_REGION, OUR_FOLLOWER_HSV,
     ENEMY_HP_REGION_OFFSET_X, ENEMY_HP_REGION_OFFSET_Y,
     ENEMY_FOLLOWER_OFFSET_X, ENEMY_FOLLOWER_OFFSET_Y,
-    ENEMY_ATK_REGION, OCR_CROP_HALF_SIZE, ENEMY_SHIELD_REGION,ENEMY_ATK_HSV,OUR_ATKHP_REGION
+    ENEMY_ATK_REGION, OCR_CROP_HALF_SIZE, ENEMY_SHIELD_REGION,ENEMY_ATK_HSV,OUR_ATKHP_REGION,
+    DIGIT_TEMPLATE_MIN_SCORE, DIGIT_TEMPLATE_MIN_MARGIN
 )
 
 logger = logging.getLogger(__name__)
@@ -36,7 +42,10 @@ class GameManager:
         # 传递设备配置给模板管理器
         self.template_manager = TemplateManager(device_state.device_config)
         self.game_actions = GameActions(device_state)
-        self.reader = get_easyocr_reader()
+        # 场景分类器：决定主循环每轮优先检测哪些按钮模板
+        self.scene_classifier = SceneClassifier(device_state)
+        # OCR由进程内共享的OCR服务合批识别（进程模式下由主进程提供）
+        self.ocr_service = get_ocr_service()
         
         # 设置设备状态中的随从管理器
         device_state.follower_manager = self.follower_manager
@@ -44,6 +53,14 @@ class GameManager:
         self.is_cn_server = self.device_state.device_config.get('is_cn_server', False)
         self.hp_templates = self.load_hp_templates()
         self.atk_templates = self.load_atk_templates()
+        # 数字识别引擎：模板库为主路径，结果不明确时才使用OCR
+        template_root = "templates" if self.is_cn_server else "templates_global"
+        self.hp_recognizer = DigitRecognizer(os.path.join(template_root, "hp_count"),
+                                             DIGIT_TEMPLATE_MIN_SCORE, DIGIT_TEMPLATE_MIN_MARGIN)
+        self.atk_recognizer = DigitRecognizer(os.path.join(template_root, "atk_count"),
+                                              DIGIT_TEMPLATE_MIN_SCORE, DIGIT_TEMPLATE_MIN_MARGIN)
+        # 预热随从识别的SIFT特征库（进程内只构建一次，优先读取磁盘缓存）
+        SiftFeatureStore.get_shared("shadowverse_cards_cost").get_templates()
 
     def load_hp_templates(self):
         """加载血量模板图片"""
@@ -131,10 +148,9 @@ class GameManager:
         if debug_flag:
             os.makedirs("debug", exist_ok=True)
 
-        region_blue = screenshot.crop(ENEMY_ATK_REGION)
-        region_blue_np = np.array(region_blue)
-        region_blue_cv = cv2.cvtColor(region_blue_np, cv2.COLOR_RGB2BGR)
-        hsv_blue = cv2.cvtColor(region_blue_cv, cv2.COLOR_BGR2HSV)
+        frame = Frame.from_any(screenshot)
+        region_blue_cv = frame.region_bgr(ENEMY_ATK_REGION)
+        hsv_blue = frame.region_hsv(ENEMY_ATK_REGION)
         settings = ENEMY_ATK_HSV
         lower_blue = np.array(settings["blue"][:3])
         upper_blue = np.array(settings["blue"][3:])
@@ -188,29 +204,222 @@ class GameManager:
         return enemy_atk_positions 
 
     
+    def _extract_digit_crop(self, screenshot_cv, center_x_in_screenshot, top, bottom):
+        """裁剪数字区域并二值化，返回只保留外轮廓填充的数字图像"""
+        left = int(center_x_in_screenshot - 14)
+        right = int(center_x_in_screenshot + 14)
+
+        # 从原始截图中裁剪
+        ocr_rect = screenshot_cv[top:bottom, left:right]
+
+        # 二值化
+        gray_rect = cv2.cvtColor(ocr_rect, cv2.COLOR_BGR2GRAY)
+        _, binary_rect = cv2.threshold(gray_rect, 125, 255, cv2.THRESH_BINARY)
+
+        # 提取轮廓
+        contours, _ = cv2.findContours(binary_rect, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        # 创建一个空白图像用于绘制轮廓
+        contour_img = np.zeros_like(binary_rect)
+        cv2.drawContours(contour_img, contours, -1, (255, 255, 255), -1)
+        return contour_img
+
+    def _batch_ocr_digits(self, crops):
+        """
+        批量OCR识别数字图像（交给OCR服务，与其他设备的请求合并识别）
+
+        Args:
+            crops: 数字图像列表(单通道)
+
+        Returns:
+            list: 与crops一一对应的 (文本, 置信度)，未识别到为None
+        """
+        return self.ocr_service.recognize_digits(crops)
+
+    def _match_digit_templates(self, target_img, templates):
+        """对数字图像做模板匹配，返回 (最佳数值, 最高匹配度)"""
+        best_match_value = None
+        max_val = -1.0
+        for value, template_list in templates.items():
+            for template in template_list:
+                if template.shape[0] > target_img.shape[0] or template.shape[1] > target_img.shape[1]:
+                    continue
+
+                res = cv2.matchTemplate(target_img, template, cv2.TM_CCOEFF_NORMED)
+                _, current_max_val, _, _ = cv2.minMaxLoc(res)
+
+                if current_max_val > max_val:
+                    max_val = current_max_val
+                    best_match_value = value
+        return best_match_value, max_val
+
+    def _resolve_digit(self, ocr_result, contour_img, templates, fallback_below, template_threshold,
+                       label, debug_flag=False):
+        """
+        根据OCR结果确定数字，OCR失败或置信度低时使用模板匹配
+
+        Args:
+            ocr_result: _batch_ocr_digits 返回的 (文本, 置信度) 或 None
+            contour_img: 数字图像
+            templates: 数字模板 {数值: [模板图像]}
+            fallback_below: OCR置信度低于该值时使用模板匹配
+            template_threshold: 模板匹配阈值
+            label: 日志中的数值名称(HP/ATK)
+        """
+        value = "99"
+        confidence = 0.0
+
+        if ocr_result is not None:
+            text, prob = ocr_result
+            if prob >= 0.6:
+                value = text
+                confidence = prob
+
+        # 如果OCR失败或置信度低，则使用模板匹配
+        if confidence < fallback_below:
+            value = "99"  # 重置为默认值
+            best_match_value, max_val = self._match_digit_templates(contour_img, templates)
+
+            # 模板匹配阈值
+            if best_match_value is not None and max_val > template_threshold:
+                value = best_match_value
+                if debug_flag:
+                    logger.info(f"OCR置信度低于 ({confidence:.2f}), 使用模板匹配结果: {label}={value} 置信度： {max_val:.2f}")
+        return value
+
+    def _recognize_digit_groups(self, groups, debug_flag=False):
+        """
+        识别多组数字：先用模板库识别全部数字，结果不明确的数字合并做一次批量OCR，
+        OCR置信度仍然不足时使用原有的模板匹配兜底
+
+        Args:
+            groups: [(候选列表, DigitRecognizer, 兜底模板, OCR回退阈值, 兜底模板阈值, 数值名称)]
+
+        Returns:
+            list: 每组一个数值列表，与候选列表一一对应
+        """
+        group_values = []
+        pending = []  # (组序号, 候选序号)
+        for group_index, (candidates, recognizer, *_rest) in enumerate(groups):
+            values = recognizer.match_templates([c['crop'] for c in candidates])
+            for candidate_index, value in enumerate(values):
+                if value is None:
+                    pending.append((group_index, candidate_index))
+            group_values.append(values)
+
+        if pending:
+            crops = [groups[g][0][c]['crop'] for g, c in pending]
+            ocr_results = self._batch_ocr_digits(crops)
+            for (g, c), ocr_result in zip(pending, ocr_results):
+                candidates, _, templates, fallback_below, template_threshold, label = groups[g]
+                group_values[g][c] = self._resolve_digit(ocr_result, candidates[c]['crop'], templates,
+                                                         fallback_below, template_threshold,
+                                                         label, debug_flag)
+        if debug_flag:
+            total = sum(len(values) for values in group_values)
+            logger.info(f"数字识别: 共 {total} 个, 模板直接识别 {total - len(pending)} 个, OCR {len(pending)} 个")
+        return group_values
+
+    def _draw_digit_debug(self, contour_debug, margin, candidate, text):
+        """在调试图上绘制一个数字区域的轮廓、外接矩形和识别结果"""
+        draw_y_offset = margin
+        cnt = candidate['cnt']
+        rect = candidate['rect']
+        (_, _), (w, h), _ = rect
+        center_x, center_y = rect[0]
+
+        # 绘制轮廓
+        cnt_shifted = cnt.copy()
+        cnt_shifted[:, :, 1] += draw_y_offset
+        cv2.drawContours(contour_debug, [cnt_shifted], 0, (0, 255, 0), 2)
+
+        # 绘制最小外接矩形
+        box = cv2.boxPoints(rect)
+        box[:, 1] += draw_y_offset
+        box = box.astype(int)
+        cv2.drawContours(contour_debug, [box], 0, (0, 0, 255), 2)
+
+        # 绘制中心点
+        draw_center_x = int(center_x)
+        draw_center_y = int(center_y + draw_y_offset)
+        cv2.circle(contour_debug, (draw_center_x, draw_center_y), 5, (0, 255, 255), -1)
+
+        # 绘制文本信息
+        cv2.putText(contour_debug, text, (draw_center_x - 20, draw_center_y - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+        cv2.putText(contour_debug, f"W:{w:.1f} H:{h:.1f}", (draw_center_x - 40, draw_center_y + 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+        cv2.putText(contour_debug, f"Area:{candidate['area']:.0f}", (draw_center_x - 40, draw_center_y + 35),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+
+    def _collect_digit_candidates(self, contours, region, screenshot_cv, top, bottom, offset_x, offset_y,
+                                  debug_prefix=None):
+        """
+        从HSV轮廓中筛选数字区域并裁剪数字图像（不做识别）
+
+        Args:
+            contours: 颜色掩膜的轮廓
+            region: 掩膜所在区域 (x1, y1, x2, y2)
+            screenshot_cv: 整帧BGR图像
+            top / bottom: 数字裁剪的纵向范围
+            offset_x / offset_y: 数字中心到随从中心的偏移
+            debug_prefix: 非空时保存数字图像到debug目录
+
+        Returns:
+            list: [{'x', 'y', 'crop', 'cnt', 'rect', 'area'}]
+        """
+        candidates = []
+        for i, cnt in enumerate(contours):
+            # 获取最小外接矩形
+            rect = cv2.minAreaRect(cnt)
+            (x, y), (w, h), angle = rect
+
+            # 检查尺寸是否在合理范围内
+            min_dim = min(w, h)
+            if not 15 > min_dim > 1:
+                continue
+
+            # 原始中心点 (偏移前)
+            center_x, center_y = rect[0]
+
+            # 数字中心点的全局坐标
+            center_x_full = int(center_x + region[0])
+            center_y_full = int(center_y + region[1])
+
+            # 将区域内的中心点x坐标转换到全屏坐标后截取区域用于OCR识别
+            contour_img = self._extract_digit_crop(screenshot_cv, center_x + region[0], top, bottom)
+
+            if debug_prefix:
+                timestamp = int(time.time() * 1000)
+                cv2.imwrite(f"debug/{debug_prefix}_{i}_{timestamp}.png", contour_img)
+
+            candidates.append({
+                'x': center_x_full + offset_x,
+                'y': center_y_full + offset_y,
+                'crop': contour_img,
+                'cnt': cnt,
+                'rect': rect,
+                'area': cv2.contourArea(cnt),
+            })
+        return candidates
+
     def scan_enemy_followers(self, screenshot, debug_flag=False):
         """检测场上的敌方随从位置与血量"""
         enemy_follower_positions = []
+        frame = Frame.from_any(screenshot)
 
         # 确保debug目录存在
         if debug_flag:
             os.makedirs("debug", exist_ok=True)
             # 保存原始screenshot用于调试
             timestamp = int(time.time() * 1000)
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(f"debug/screenshot_{timestamp}.png", screenshot_cv)
+            cv2.imwrite(f"debug/screenshot_{timestamp}.png", frame.bgr)
 
         # 定义敌方普通随从的血量区域
-        region_red = screenshot.crop(ENEMY_HP_REGION)
-        region_red_np = np.array(region_red)
-        region_red_cv = cv2.cvtColor(region_red_np, cv2.COLOR_RGB2BGR)
-
-        del region_red
-        del region_red_np
+        region_red_cv = frame.region_bgr(ENEMY_HP_REGION)
 
         # 转换为HSV颜色空间
-        hsv_red = cv2.cvtColor(region_red_cv, cv2.COLOR_BGR2HSV)
+        hsv_red = frame.region_hsv(ENEMY_HP_REGION)
 
         # HSV范围设置
         settings = ENEMY_HP_HSV
@@ -247,133 +456,26 @@ class GameManager:
 
         del region_red_cv
 
-        # 从原始截图中裁剪
-        screenshot_np = np.array(screenshot)
-        screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-
-        for i, cnt in enumerate(red_contours):
-            # 获取最小外接矩形
-            rect = cv2.minAreaRect(cnt)
-            (x, y), (w, h), angle = rect
-            area = cv2.contourArea(cnt)
-
-            # 检查尺寸是否在合理范围内
-            min_dim = min(w, h)
-
-            if 15 > min_dim > 1 :
-                # 原始中心点 (偏移前)
-                center_x, center_y = rect[0]
-
-                # 红色血量中心点的全局坐标
-                center_x_full = int(center_x + ENEMY_HP_REGION_OFFSET_X)
-                center_y_full = int(center_y + ENEMY_HP_REGION_OFFSET_Y)
-
-                # 敌方随从的全图坐标
-                enemy_x = center_x_full + ENEMY_FOLLOWER_OFFSET_X
-                enemy_y = center_y_full + ENEMY_FOLLOWER_OFFSET_Y
-
-                # 截取区域用于OCR识别
-                # 从HSV中心点创建矩形
-                # 将区域内的中心点x坐标转换到全屏坐标
-                center_x_in_screenshot = center_x + ENEMY_HP_REGION[0]
-                
-                left = int(center_x_in_screenshot - 14)
-                right = int(center_x_in_screenshot + 14)
-                top = 263
-                bottom = 301
-
-                # 从原始截图中裁剪
-                ocr_rect = screenshot_cv[top:bottom, left:right]
-
-                # 二值化
-                gray_rect = cv2.cvtColor(ocr_rect, cv2.COLOR_BGR2GRAY)
-                _, binary_rect = cv2.threshold(gray_rect, 125, 255, cv2.THRESH_BINARY)
-
-                # 提取轮廓
-                contours, _ = cv2.findContours(binary_rect, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                
-                # 创建一个空白图像用于绘制轮廓
-                contour_img = np.zeros_like(binary_rect)
-                cv2.drawContours(contour_img, contours, -1, (255, 255, 255), -1)
-
-                if debug_flag:
-                    timestamp = int(time.time() * 1000)
-                    cv2.imwrite(f"debug/ocr_contour_{i}_{timestamp}.png", contour_img)
-
-                # 使用轮廓图进行OCR
-                if self.reader:
-                    results = self.reader.readtext(contour_img, allowlist='0123456789', detail=1)
-                else:
-                    results = []
-                
-                hp_value = "99"
-                confidence = 0.0
-
-                if results and isinstance(results, list) and len(results) > 0:
-                    # 找到置信度最高的结果
-                    best_result = max(results, key=lambda item: item[2])
-                    text, prob = best_result[1], best_result[2]
-                    if prob >= 0.6:
-                        hp_value = text
-                        confidence = prob
-
-                # 如果OCR失败或置信度低，则使用模板匹配
-                if confidence < 0.4:
-                    hp_value = "99" # 重置为默认值
-                    best_match_hp = None
-                    max_val = -1.0
-                    
-                    # 使用轮廓图进行匹配
-                    target_img = contour_img
-
-                    for hp, template_list in self.hp_templates.items():
-                        for template in template_list:
-                            if template.shape[0] > target_img.shape[0] or template.shape[1] > target_img.shape[1]:
-                                continue
-                            
-                            res = cv2.matchTemplate(target_img, template, cv2.TM_CCOEFF_NORMED)
-                            _, current_max_val, _, _ = cv2.minMaxLoc(res)
-                            
-                            if current_max_val > max_val:
-                                max_val = current_max_val
-                                best_match_hp = hp
-                    
-                    # 模板匹配阈值
-                    if best_match_hp is not None and max_val > 0.2:
-                        hp_value = best_match_hp
-                        if debug_flag:
-                            logger.info(f"OCR置信度低于 ({confidence:.2f}), 使用模板匹配结果: HP={hp_value} 置信度： {max_val:.2f}")
+        # 第一步：收集全场血量数字图像
+        candidates = self._collect_digit_candidates(
+            red_contours, ENEMY_HP_REGION, frame.bgr, 263, 301,
+            ENEMY_HP_REGION_OFFSET_X - ENEMY_HP_REGION[0] + ENEMY_FOLLOWER_OFFSET_X,
+            ENEMY_HP_REGION_OFFSET_Y - ENEMY_HP_REGION[1] + ENEMY_FOLLOWER_OFFSET_Y,
+            debug_prefix="ocr_contour" if debug_flag else None
+        )
 
-                # 添加到结果列表
-                enemy_follower_positions.append((enemy_x, enemy_y, "normal", hp_value))
+        # 第二步：模板库识别全部数字，结果不明确的再批量OCR
+        hp_values, = self._recognize_digit_groups(
+            [(candidates, self.hp_recognizer, self.hp_templates, 0.4, 0.2, "HP")], debug_flag
+        )
 
-                # 在调试图上绘制信息
-                if debug_flag and contour_debug is not None:
-                    draw_y_offset = margin
-                    
-                    # 绘制轮廓
-                    cnt_shifted = cnt.copy()
-                    cnt_shifted[:, :, 1] += draw_y_offset
-                    cv2.drawContours(contour_debug, [cnt_shifted], 0, (0, 255, 0), 2)
+        for candidate, hp_value in zip(candidates, hp_values):
+            # 添加到结果列表
+            enemy_follower_positions.append((candidate['x'], candidate['y'], "normal", hp_value))
 
-                    # 绘制最小外接矩形
-                    box = cv2.boxPoints(rect)
-                    box[:, 1] += draw_y_offset
-                    box = box.astype(int)
-                    cv2.drawContours(contour_debug, [box], 0, (0, 0, 255), 2)
-
-                    # 绘制中心点
-                    draw_center_x = int(center_x)
-                    draw_center_y = int(center_y + draw_y_offset)
-                    cv2.circle(contour_debug, (draw_center_x, draw_center_y), 5, (0, 255, 255), -1)
-                    
-                    # 绘制文本信息
-                    cv2.putText(contour_debug, f"HP: {hp_value}", (draw_center_x - 20, draw_center_y - 20),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
-                    cv2.putText(contour_debug, f"W:{w:.1f} H:{h:.1f}", (draw_center_x - 40, draw_center_y + 20),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-                    cv2.putText(contour_debug, f"Area:{area:.0f}", (draw_center_x - 40, draw_center_y + 35),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+            # 在调试图上绘制信息
+            if debug_flag and contour_debug is not None:
+                self._draw_digit_debug(contour_debug, margin, candidate, f"HP: {hp_value}")
 
         if debug_flag and contour_debug is not None:
             timestamp1 = int(time.time() * 1000)
@@ -393,26 +495,20 @@ class GameManager:
         """检测场上的我方随从攻击力与血量"""
         our_follower_hp = []
         our_follower_atk = []
+        frame = Frame.from_any(screenshot)
 
         # 确保debug目录存在
         if debug_flag:
             os.makedirs("debug", exist_ok=True)
             # 保存原始screenshot用于调试
             timestamp = int(time.time() * 1000)
-            screenshot_np = np.array(screenshot)
-            screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(f"debug/screenshot_{timestamp}.png", screenshot_cv)
+            cv2.imwrite(f"debug/screenshot_{timestamp}.png", frame.bgr)
 
         # 定义我方普通随从的血量区域
-        region_all = screenshot.crop(OUR_ATKHP_REGION)
-        region_all_np = np.array(region_all)
-        region_all_cv = cv2.cvtColor(region_all_np, cv2.COLOR_RGB2BGR)
-
-        del region_all
-        del region_all_np
+        region_all_cv = frame.region_bgr(OUR_ATKHP_REGION)
 
         # 转换为HSV颜色空间
-        hsv_all = cv2.cvtColor(region_all_cv, cv2.COLOR_BGR2HSV)
+        hsv_all = frame.region_hsv(OUR_ATKHP_REGION)
 
         # HSV范围设置
         settings = OUR_FOLLOWER_HSV
@@ -457,257 +553,40 @@ class GameManager:
 
         del region_all_cv
 
-        # 从原始截图中裁剪
-        screenshot_np = np.array(screenshot)
-        screenshot_cv = cv2.cvtColor(screenshot_np, cv2.COLOR_RGB2BGR)
-
-        for i, cnt in enumerate(red_contours):
-            # 获取最小外接矩形
-            rect = cv2.minAreaRect(cnt)
-            (x, y), (w, h), angle = rect
-            area = cv2.contourArea(cnt)
-
-            # 检查尺寸是否在合理范围内
-            min_dim = min(w, h)
-
-            if 15 > min_dim > 1 :
-                # 原始中心点 (偏移前)
-                center_x, center_y = rect[0]
-
-                # 红色血量中心点的全局坐标
-                center_x_full = int(center_x + OUR_ATKHP_REGION[0])
-                center_y_full = int(center_y + OUR_ATKHP_REGION[1])
-
-                #我方随从的全图坐标
-                our_x = center_x_full + ENEMY_FOLLOWER_OFFSET_X
-                our_y = center_y_full + ENEMY_FOLLOWER_OFFSET_Y
-
-                # 截取区域用于OCR识别
-                # 从HSV中心点创建矩形
-                # 将区域内的中心点x坐标转换到全屏坐标
-                center_x_in_screenshot = center_x + OUR_ATKHP_REGION[0]
-                
-                left = int(center_x_in_screenshot - 14)
-                right = int(center_x_in_screenshot + 14)
-                top = 432
-                bottom = 468
-
-                # 从原始截图中裁剪
-                ocr_rect = screenshot_cv[top:bottom, left:right]
-
-                # 二值化
-                gray_rect = cv2.cvtColor(ocr_rect, cv2.COLOR_BGR2GRAY)
-                _, binary_rect = cv2.threshold(gray_rect, 125, 255, cv2.THRESH_BINARY)
-
-                # 提取轮廓
-                contours, _ = cv2.findContours(binary_rect, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                
-                # 创建一个空白图像用于绘制轮廓
-                contour_img = np.zeros_like(binary_rect)
-                cv2.drawContours(contour_img, contours, -1, (255, 255, 255), -1)
-
-                if debug_flag:
-                    timestamp = int(time.time() * 1000)
-                    cv2.imwrite(f"debug/our_ocr_contour_{i}_{timestamp}.png", contour_img)
-
-                # 使用轮廓图进行OCR
-                if self.reader:
-                    results = self.reader.readtext(contour_img, allowlist='0123456789', detail=1)
-                else:
-                    results = []
-                
-                hp_value = "99"
-                confidence = 0.0
-
-                if results and isinstance(results, list) and len(results) > 0:
-                    # 找到置信度最高的结果
-                    best_result = max(results, key=lambda item: item[2])
-                    text, prob = best_result[1], best_result[2]
-                    if prob >= 0.6:
-                        hp_value = text
-                        confidence = prob
-
-                # 如果OCR失败或置信度低，则使用模板匹配
-                if confidence < 0.6:
-                    hp_value = "99" # 重置为默认值
-                    best_match_hp = None
-                    max_val = -1.0
-                    
-                    # 使用轮廓图进行匹配
-                    target_img = contour_img
-
-                    for hp, template_list in self.hp_templates.items():
-                        for template in template_list:
-                            if template.shape[0] > target_img.shape[0] or template.shape[1] > target_img.shape[1]:
-                                continue
-                            
-                            res = cv2.matchTemplate(target_img, template, cv2.TM_CCOEFF_NORMED)
-                            _, current_max_val, _, _ = cv2.minMaxLoc(res)
-                            
-                            if current_max_val > max_val:
-                                max_val = current_max_val
-                                best_match_hp = hp
-                    
-                    # 模板匹配阈值
-                    if best_match_hp is not None and max_val > 0.001:
-                        hp_value = best_match_hp
-                        if debug_flag:
-                            logger.info(f"OCR置信度低于 ({confidence:.2f}), 使用模板匹配结果: HP={hp_value} 置信度： {max_val:.2f}")
-
-                # 添加到结果列表
-                our_follower_hp.append((our_x, our_y, hp_value))
-
-                # 在调试图上绘制信息
-                if debug_flag and contour_debug is not None:
-                    draw_y_offset = margin
-                    
-                    # 绘制轮廓
-                    cnt_shifted = cnt.copy()
-                    cnt_shifted[:, :, 1] += draw_y_offset
-                    cv2.drawContours(contour_debug, [cnt_shifted], 0, (0, 255, 0), 2)
-
-                    # 绘制最小外接矩形
-                    box = cv2.boxPoints(rect)
-                    box[:, 1] += draw_y_offset
-                    box = box.astype(int)
-                    cv2.drawContours(contour_debug, [box], 0, (0, 0, 255), 2)
-
-                    # 绘制中心点
-                    draw_center_x = int(center_x)
-                    draw_center_y = int(center_y + draw_y_offset)
-                    cv2.circle(contour_debug, (draw_center_x, draw_center_y), 5, (0, 255, 255), -1)
-                    
-                    # 绘制文本信息
-                    cv2.putText(contour_debug, f"HP: {hp_value}", (draw_center_x - 20, draw_center_y - 20),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
-                    cv2.putText(contour_debug, f"W:{w:.1f} H:{h:.1f}", (draw_center_x - 40, draw_center_y + 20),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-                    cv2.putText(contour_debug, f"Area:{area:.0f}", (draw_center_x - 40, draw_center_y + 35),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-
-        for i, cnt in enumerate(blue_contours):
-            # 获取最小外接矩形
-            rect = cv2.minAreaRect(cnt)
-            (x, y), (w, h), angle = rect
-            area = cv2.contourArea(cnt)
-
-            # 检查尺寸是否在合理范围内
-            min_dim = min(w, h)
-
-            if 15 > min_dim > 1 :
-                # 原始中心点 (偏移前)
-                center_x, center_y = rect[0]
-
-                # 蓝色攻击力中心点的全局坐标
-                center_x_full = int(center_x + OUR_ATKHP_REGION[0])
-                center_y_full = int(center_y + OUR_ATKHP_REGION[1])
-
-                # 我方随从的全图坐标
-                our_x = center_x_full - ENEMY_FOLLOWER_OFFSET_X
-                our_y = center_y_full + ENEMY_FOLLOWER_OFFSET_Y
-
-                # 截取区域用于OCR识别
-                # 从HSV中心点创建矩形
-                # 将区域内的中心点x坐标转换到全屏坐标
-                center_x_in_screenshot = center_x + OUR_ATKHP_REGION[0]
-                
-                left = int(center_x_in_screenshot - 14)
-                right = int(center_x_in_screenshot + 14)
-                top = 432
-                bottom = 468
-
-                # 从原始截图中裁剪
-                ocr_rect = screenshot_cv[top:bottom, left:right]
-
-                # 二值化
-                gray_rect = cv2.cvtColor(ocr_rect, cv2.COLOR_BGR2GRAY)
-                _, binary_rect = cv2.threshold(gray_rect, 125, 255, cv2.THRESH_BINARY)
-
-                # 提取轮廓
-                contours, _ = cv2.findContours(binary_rect, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                
-                # 创建一个空白图像用于绘制轮廓
-                contour_img = np.zeros_like(binary_rect)
-                cv2.drawContours(contour_img, contours, -1, (255, 255, 255), -1)
-
-                if debug_flag:
-                    timestamp = int(time.time() * 1000)
-                    cv2.imwrite(f"debug/our_ATK_ocr_contour_{i}_{timestamp}.png", contour_img)
-
-                # 使用轮廓图进行OCR
-                if self.reader:
-                    results = self.reader.readtext(contour_img, allowlist='0123456789', detail=1)
-                else:
-                    results = []
-                
-                atk_value = "99"
-                confidence = 0.0
-
-                if results and isinstance(results, list) and len(results) > 0:
-                    # 找到置信度最高的结果
-                    best_result = max(results, key=lambda item: item[2])
-                    text, prob = best_result[1], best_result[2]
-                    if prob >= 0.6:
-                        atk_value = text
-                        confidence = prob
-
-                # 如果OCR失败或置信度低，则使用模板匹配
-                if confidence < 0.6:
-                    atk_value = "99" # 重置为默认值
-                    best_match_atk = None
-                    max_val = -1.0
-                    
-                    # 使用轮廓图进行匹配
-                    target_img = contour_img
-
-                    for atk, template_list in self.atk_templates.items():
-                        for template in template_list:
-                            if template.shape[0] > target_img.shape[0] or template.shape[1] > target_img.shape[1]:
-                                continue
-                            
-                            res = cv2.matchTemplate(target_img, template, cv2.TM_CCOEFF_NORMED)
-                            _, current_max_val, _, _ = cv2.minMaxLoc(res)
-                            
-                            if current_max_val > max_val:
-                                max_val = current_max_val
-                                best_match_atk = atk
-                    
-                    # 模板匹配阈值
-                    if best_match_atk is not None and max_val > 0.001:
-                        atk_value = best_match_atk
-                        if debug_flag:
-                            logger.info(f"OCR置信度低于 ({confidence:.2f}), 使用模板匹配结果: ATK={atk_value} 置信度： {max_val:.2f}")
-
-                # 添加到结果列表
-                our_follower_atk.append((our_x, our_y, atk_value))
-
-                # 在调试图上绘制信息
-                if debug_flag and contour_debug is not None:
-                    draw_y_offset = margin
-                    
-                    # 绘制轮廓
-                    cnt_shifted = cnt.copy()
-                    cnt_shifted[:, :, 1] += draw_y_offset
-                    cv2.drawContours(contour_debug, [cnt_shifted], 0, (0, 255, 0), 2)
-
-                    # 绘制最小外接矩形
-                    box = cv2.boxPoints(rect)
-                    box[:, 1] += draw_y_offset
-                    box = box.astype(int)
-                    cv2.drawContours(contour_debug, [box], 0, (0, 0, 255), 2)
-
-                    # 绘制中心点
-                    draw_center_x = int(center_x)
-                    draw_center_y = int(center_y + draw_y_offset)
-                    cv2.circle(contour_debug, (draw_center_x, draw_center_y), 5, (0, 255, 255), -1)
-                    
-                    # 绘制文本信息
-                    cv2.putText(contour_debug, f"ATK: {atk_value}", (draw_center_x - 20, draw_center_y - 20),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
-                    cv2.putText(contour_debug, f"W:{w:.1f} H:{h:.1f}", (draw_center_x - 40, draw_center_y + 20),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-                    cv2.putText(contour_debug, f"Area:{area:.0f}", (draw_center_x - 40, draw_center_y + 35),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+        # 第一步：收集全场血量(红色)和攻击力(蓝色)数字图像
+        screenshot_cv = frame.bgr
+        hp_candidates = self._collect_digit_candidates(
+            red_contours, OUR_ATKHP_REGION, screenshot_cv, 432, 468,
+            ENEMY_FOLLOWER_OFFSET_X, ENEMY_FOLLOWER_OFFSET_Y,
+            debug_prefix="our_ocr_contour" if debug_flag else None
+        )
+        atk_candidates = self._collect_digit_candidates(
+            blue_contours, OUR_ATKHP_REGION, screenshot_cv, 432, 468,
+            -ENEMY_FOLLOWER_OFFSET_X, ENEMY_FOLLOWER_OFFSET_Y,
+            debug_prefix="our_ATK_ocr_contour" if debug_flag else None
+        )
+
+        # 第二步：模板库识别全部数字，血量和攻击力中结果不明确的一起批量OCR
+        hp_values, atk_values = self._recognize_digit_groups([
+            (hp_candidates, self.hp_recognizer, self.hp_templates, 0.6, 0.001, "HP"),
+            (atk_candidates, self.atk_recognizer, self.atk_templates, 0.6, 0.001, "ATK"),
+        ], debug_flag)
+
+        for candidate, hp_value in zip(hp_candidates, hp_values):
+            # 添加到结果列表
+            our_follower_hp.append((candidate['x'], candidate['y'], hp_value))
+
+            # 在调试图上绘制信息
+            if debug_flag and contour_debug is not None:
+                self._draw_digit_debug(contour_debug, margin, candidate, f"HP: {hp_value}")
+
+        for candidate, atk_value in zip(atk_candidates, atk_values):
+            # 添加到结果列表
+            our_follower_atk.append((candidate['x'], candidate['y'], atk_value))
+
+            # 在调试图上绘制信息
+            if debug_flag and contour_debug is not None:
+                self._draw_digit_debug(contour_debug, margin, candidate, f"ATK: {atk_value}")
         
         # 先按X坐标排序，方便匹配
         our_follower_hp.sort(key=lambda p: p[0])   # (x, y, hp_value)
@@ -753,23 +632,19 @@ class GameManager:
 
     def scan_our_followers(self, screenshot, debug_flag=False):
         """检测场上的我方随从位置和状态，扫描结果合并去重结果（并发优化）"""
-        import time
         import random
         from math import hypot
         import numpy as np
         import cv2
         from PIL import Image
         import os
-        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from concurrent.futures import as_completed
 
         all_follower_positions = []
+        pool = VisionWorkerPool.get_shared()
+        serial = self.device_state.serial
 
-        screenshots = [screenshot]
-        # 再截图几次识别，每次间隔一段时间
-        if hasattr(self.device_state, 'take_screenshot'):
-            for _ in range(2):
-                time.sleep(0.5)
-                screenshots.append(self.device_state.take_screenshot())
+        screenshots = [Frame.from_any(screenshot)]
 
         # 修正：提前定义recognize_followers，确保作用域正确
         def recognize_followers(shot, debug_flag):
@@ -779,30 +654,21 @@ class GameManager:
             # 创建debug文件夹
             if debug_flag:
                 os.makedirs("debug", exist_ok=True)
-            region_color = shot.crop(OUR_FOLLOWER_REGION)
-            region_color_np = np.array(region_color)
-            region_color_cv = cv2.cvtColor(region_color_np, cv2.COLOR_RGB2BGR)
-            region_blue = shot.crop(OUR_ATK_REGION)
-            region_blue_np = np.array(region_blue)
-            region_blue_cv = cv2.cvtColor(region_blue_np, cv2.COLOR_RGB2BGR)
+            region_color_cv = shot.region_bgr(OUR_FOLLOWER_REGION)
             if debug_flag:
                 # 为debug创建更大的区域，包含文字空间
                 debug_region_color = (OUR_FOLLOWER_REGION[0], OUR_FOLLOWER_REGION[1] - 30, 
                                      OUR_FOLLOWER_REGION[2], OUR_FOLLOWER_REGION[3] + 30)
-                debug_color = shot.crop(debug_region_color)
-                debug_color_np = np.array(debug_color)
-                debug_img_color = cv2.cvtColor(debug_color_np, cv2.COLOR_RGB2BGR)
+                debug_img_color = shot.region_bgr(debug_region_color).copy()
                 
                 debug_region_blue = (OUR_ATK_REGION[0], OUR_ATK_REGION[1] - 30,
                                     OUR_ATK_REGION[2], OUR_ATK_REGION[3] + 30)
-                debug_blue = shot.crop(debug_region_blue)
-                debug_blue_np = np.array(debug_blue)
-                debug_img_blue = cv2.cvtColor(debug_blue_np, cv2.COLOR_RGB2BGR)
+                debug_img_blue = shot.region_bgr(debug_region_blue).copy()
             else:
                 debug_img_color = None
                 debug_img_blue = None
-            hsv_color = cv2.cvtColor(region_color_cv, cv2.COLOR_BGR2HSV)
-            hsv_blue = cv2.cvtColor(region_blue_cv, cv2.COLOR_BGR2HSV)
+            hsv_color = shot.region_hsv(OUR_FOLLOWER_REGION)
+            hsv_blue = shot.region_hsv(OUR_ATK_REGION)
             settings = OUR_FOLLOWER_HSV
             lower_green = np.array(settings["green"][:3])
             upper_green = np.array(settings["green"][3:])
@@ -826,20 +692,19 @@ class GameManager:
             yellow2_eroded = cv2.erode(cv2.dilate(yellow2_mask, kernel, iterations=3), kernel, iterations=0)
             blue_eroded = cv2.erode(cv2.dilate(blue_mask, kernel, iterations=3), kernel, iterations=0)
 
-            from concurrent.futures import ThreadPoolExecutor
             def find_contours(mask):
                 return cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                future_green = executor.submit(find_contours, green_eroded)
-                future_green2 = executor.submit(find_contours, green2_eroded)
-                future_yellow1 = executor.submit(find_contours, yellow1_eroded)
-                future_yellow2 = executor.submit(find_contours, yellow2_eroded)
-                future_blue = executor.submit(find_contours, blue_eroded)
-                green_contours = future_green.result()
-                green2_contours = future_green2.result()
-                yellow1_contours = future_yellow1.result()
-                yellow2_contours = future_yellow2.result()
-                blue_contours = future_blue.result()
+            # 在视觉线程池内执行时嵌套任务会直接在当前线程完成
+            future_green = pool.submit(find_contours, green_eroded, device=serial, priority=PRIORITY_CRITICAL)
+            future_green2 = pool.submit(find_contours, green2_eroded, device=serial, priority=PRIORITY_CRITICAL)
+            future_yellow1 = pool.submit(find_contours, yellow1_eroded, device=serial, priority=PRIORITY_CRITICAL)
+            future_yellow2 = pool.submit(find_contours, yellow2_eroded, device=serial, priority=PRIORITY_CRITICAL)
+            future_blue = pool.submit(find_contours, blue_eroded, device=serial, priority=PRIORITY_CRITICAL)
+            green_contours = future_green.result()
+            green2_contours = future_green2.result()
+            yellow1_contours = future_yellow1.result()
+            yellow2_contours = future_yellow2.result()
+            blue_contours = future_blue.result()
             follower_positions = []
             green_rects = []
             green_centers = []
@@ -1256,22 +1121,28 @@ class GameManager:
         recognize_count = 0
         success_count = 0
         
-        with ThreadPoolExecutor(max_workers=len(screenshots)) as executor:
-            # 提交HSV识别任务
-            hsv_futures = [executor.submit(recognize_followers, shot, debug_flag) for shot in screenshots if shot is not None]
-            recognize_count = len(hsv_futures)
-            import logging
-            
-            # 等待HSV识别结果
-            for future in as_completed(hsv_futures):
-                try:
-                    result = future.result()
-                    all_positions.extend(result)
-                    success_count += 1
-                except Exception as e:
-                    logging.error(f"recognize_followers线程异常: {e}")
-            if not hsv_futures:
-                return []
+        # 提交HSV识别任务：第1帧立即开始识别，同时继续截取后2帧（间隔0.5秒覆盖随从框的闪烁阶段）
+        hsv_futures = [pool.submit(recognize_followers, shot, debug_flag, device=serial, priority=PRIORITY_CRITICAL)
+                       for shot in screenshots if shot is not None]
+        if hasattr(self.device_state, 'iter_capture_burst'):
+            since = screenshots[0].timestamp if screenshots[0] is not None else None
+            for shot in self.device_state.iter_capture_burst(2, min_interval=0.5, since=since):
+                screenshots.append(shot)
+                hsv_futures.append(pool.submit(recognize_followers, shot, debug_flag,
+                                               device=serial, priority=PRIORITY_CRITICAL))
+        recognize_count = len(hsv_futures)
+        import logging
+
+        # 等待HSV识别结果
+        for future in as_completed(hsv_futures):
+            try:
+                result = future.result()
+                all_positions.extend(result)
+                success_count += 1
+            except Exception as e:
+                logging.error(f"recognize_followers线程异常: {e}")
+        if not hsv_futures:
+            return []
         
         # HSV结果去重（x轴在54像素内的点视为同一个随从点）
         hsv_positions = []
@@ -1306,82 +1177,17 @@ class GameManager:
         # 新的SIFT识别逻辑：基于去重后的all_follower_positions矩形区域
         def perform_sift_recognition_on_rectangles():
             """对去重后的all_follower_positions中的每个矩形区域进行SIFT识别"""
-            import os
-            from PIL import Image
-            
             # 准备截图数据
-            if hasattr(screenshot, 'shape'):
-                cv_img = screenshot
-            else:
-                cv_img = np.array(screenshot)
-                cv_img = cv2.cvtColor(cv_img, cv2.COLOR_RGB2BGR)
-            
-            # 加载模板图片
-            def load_template_features(filename):
-                """加载单个模板的特征"""
-                if not filename.endswith('.png'):
-                    return None
-                template_path = os.path.join("shadowverse_cards_cost", filename)
-                tname = os.path.splitext(filename)[0]
-                try:
-                    pil_img = Image.open(template_path)
-                    template_img = np.array(pil_img)
-                    if len(template_img.shape) == 3 and template_img.shape[2] == 4:
-                        template_img = cv2.cvtColor(template_img, cv2.COLOR_RGBA2BGR)
-                    elif len(template_img.shape) == 3 and template_img.shape[2] == 3:
-                        template_img = cv2.cvtColor(template_img, cv2.COLOR_RGB2BGR)
-                except Exception as e:
-                    return None
-
-                TEMPLATE_SCALE_FACTOR = 0.4
-                
-                # 截取模板图片中的指定区域
-                TEMPLATE_RECT = (101, 151, 442, 568)
-                tx1, ty1, tx2, ty2 = TEMPLATE_RECT
-                template = template_img[ty1:ty2, tx1:tx2]
-
-                # 仅对模板应用缩放（关键修改）
-                if TEMPLATE_SCALE_FACTOR != 1.0:
-                    new_width = int(template.shape[1] * TEMPLATE_SCALE_FACTOR)
-                    new_height = int(template.shape[0] * TEMPLATE_SCALE_FACTOR)
-                    template = cv2.resize(template, (new_width, new_height), 
-                                         interpolation=cv2.INTER_AREA)
-                
-                # 图像预处理
-                template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-                template_gray = cv2.equalizeHist(template_gray)
-                template_gray = cv2.GaussianBlur(template_gray, (3, 3), 0.5)
-                
-                # SIFT特征提取
-                sift = cv2.SIFT_create(
-                    nfeatures=0,
-                    contrastThreshold=0.02,
-                    edgeThreshold=15,
-                    sigma=1.6
-                )
-                tkp, tdes = sift.detectAndCompute(template_gray, None)
-                if tdes is not None:
-                    return tname, {'template': template, 'keypoints': tkp, 'descriptors': tdes}
-                return None
-
-            # 加载所有模板
-            template_dir = "shadowverse_cards_cost"
-            template_files = [f for f in os.listdir(template_dir) if f.endswith('.png')]
-            card_templates = {}
-
+            cv_img = screenshots[0].bgr
             
-            with ThreadPoolExecutor(max_workers=min(8, len(template_files))) as executor:
-                futures = [executor.submit(load_template_features, filename) for filename in template_files]
-                for future in as_completed(futures):
-                    try:
-                        result = future.result()
-                        if result is not None:
-                            tname, template_info = result
-                            card_templates[tname] = template_info
-                    except Exception as e:
-                        import logging
-                        logging.error(f"模板加载异常: {e}")
-                        continue
+            # 从进程级特征库获取模板特征（首次使用时构建，之后复用磁盘缓存）
+            card_templates = SiftFeatureStore.get_shared("shadowverse_cards_cost").get_templates()
+            sift = cv2.SIFT_create(
+                nfeatures=0,
+                contrastThreshold=0.02,
+                edgeThreshold=15,
+                sigma=1.2
+            )
             
             # 对每个矩形区域进行SIFT识别
             results = []
@@ -1402,12 +1208,6 @@ class GameManager:
                 rect_gray = cv2.GaussianBlur(rect_gray, (3, 3), 0.5)
                 
                 # SIFT特征提取
-                sift = cv2.SIFT_create(
-                    nfeatures=0,
-                    contrastThreshold=0.02,
-                    edgeThreshold=15,
-                    sigma=1.2
-                )
                 rkp, rdes = sift.detectAndCompute(rect_gray, None)
                 
                 if rdes is None:
@@ -1515,58 +1315,51 @@ class GameManager:
 
     def scan_shield_targets(self,debug_flag=False):
         """扫描护盾（多线程并发处理）"""
-        from concurrent.futures import ThreadPoolExecutor, as_completed
+        from concurrent.futures import as_completed
         shield_targets = []
-        images = []
         last_screenshot = None
+        pool = VisionWorkerPool.get_shared()
+        serial = self.device_state.serial
+            
+        # 使用视觉线程池并行处理攻击力检测和护盾检测
+        # 连续截取多张截图用于护盾检测，每截到一张立即提交护盾检测任务
+        shield_futures = []
+        for screenshot in self.device_state.iter_capture_burst(4, min_interval=0.2, since=time.time()):
+            shield_futures.append(pool.submit(self._process_shield_image,
+                                              screenshot.region_bgr(ENEMY_SHIELD_REGION), debug_flag,
+                                              device=serial, priority=PRIORITY_CRITICAL))
+            last_screenshot = screenshot
+
+        # 用最后一张截图做敌方随从有无检测
+        if last_screenshot is None:
+            return []
+        atk_future = pool.submit(self.scan_enemy_ATK, last_screenshot, debug_flag,
+                                 device=serial, priority=PRIORITY_CRITICAL)
         
-        # 获取多张截图用于护盾检测
-        for _ in range(4):
-            time.sleep(0.2)
-            screenshot = self.device_state.take_screenshot()
-            if screenshot is None:
-                continue
-            region = screenshot.crop(ENEMY_SHIELD_REGION)
-            bgr_image = cv2.cvtColor(np.array(region), cv2.COLOR_RGB2BGR)
-            images.append(bgr_image)
-        
-        # 获取最后一张截图用于敌方随从有无检测
-        if images:
-            last_screenshot = self.device_state.take_screenshot()
+        # 收集攻击力检测结果
+        try:
+            enemy_atk_positions = atk_future.result()
+            if not enemy_atk_positions:
+                return []  # 如果无敌方随从，直接返回空列表（就算护盾处理检测到护盾，没有随从的话也是误识别，比如护符之类）
+        except Exception as e:
+            import logging
+            logging.error(f"敌方随从位置检测异常: {str(e)}")
+            return []
         
-            
-        # 使用线程池并行处理攻击力检测和护盾检测
-        with ThreadPoolExecutor(max_workers=6) as executor:
-            # 提交攻击力检测任务
-            atk_future = executor.submit(self.scan_enemy_ATK, last_screenshot, debug_flag)
-            
-            # 提交护盾检测任务
-            shield_futures = [executor.submit(self._process_shield_image, img, debug_flag) for img in images]
-            
-            # 收集攻击力检测结果
+        # 收集护盾检测结果
+        all_positions = []
+        for future in as_completed(shield_futures):
             try:
-                enemy_atk_positions = atk_future.result()
-                if not enemy_atk_positions:
-                    return []  # 如果无敌方随从，直接返回空列表（就算护盾处理检测到护盾，没有随从的话也是误识别，比如护符之类）
+                all_positions.extend(future.result())
             except Exception as e:
                 import logging
-                logging.error(f"敌方随从位置检测异常: {str(e)}")
-                return []
-            
-            # 收集护盾检测结果
-            all_positions = []
-            for future in as_completed(shield_futures):
-                try:
-                    all_positions.extend(future.result())
-                except Exception as e:
-                    import logging
-                    logging.error(f"护盾检测并发任务异常: {str(e)}")
-            
-            # 合并去重（中心点距离小于40像素视为同一护盾）
-            final_shields = []
-            for pos in all_positions:
-                if not any(abs(pos[0]-p[0])<40 and abs(pos[1]-p[1])<40 for p in final_shields):
-                    final_shields.append(pos)
+                logging.error(f"护盾检测并发任务异常: {str(e)}")
+        
+        # 合并去重（中心点距离小于40像素视为同一护盾）
+        final_shields = []
+        for pos in all_positions:
+            if not any(abs(pos[0]-p[0])<40 and abs(pos[1]-p[1])<40 for p in final_shields):
+                final_shields.append(pos)
 
         
         shield_targets=[]
@@ -1676,9 +1469,7 @@ class GameManager:
         if screenshot is None:
             return []
         can_choose_region = (160,302,1068,315)
-        region = screenshot.crop(can_choose_region)
-        bgr_image = cv2.cvtColor(np.array(region), cv2.COLOR_RGB2BGR)
-        hsv = cv2.cvtColor(bgr_image, cv2.COLOR_BGR2HSV)
+        hsv = screenshot.region_hsv(can_choose_region)
         lower_bound = np.array([4, 151, 28])
         upper_bound = np.array([89, 255, 255])
         mask = cv2.inRange(hsv, lower_bound, upper_bound)
@@ -1709,7 +1500,7 @@ class GameManager:
                 os.makedirs("debug", exist_ok=True)
                 timestamp = int(time.time() * 1000)
                 # 画出轮廓和中心点
-                debug_img = bgr_image.copy()
+                debug_img = screenshot.region_bgr(can_choose_region).copy()
                 cv2.drawContours(debug_img, [cnt], 0, (0, 0, 255), 2)
                 cv2.circle(debug_img, (x, y), 10, (0, 0, 255), -1)
                 filename = f"debug/can_choose_target_{timestamp}_{x}_{y}.png"
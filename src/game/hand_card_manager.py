@@ -122,6 +122,7 @@ class HandCardManager:
             List[Dict]: 识别到的卡牌列表
         """
         for attempt in range(max_retries):
+            hand_revealed = False
             try:
                 # 获取截图
                 screenshot = self.device_state.take_screenshot()
@@ -144,23 +145,31 @@ class HandCardManager:
                     import random, time
                     #点击空白处收牌
                     time.sleep(0.1)
-                    self.device_state.u2_device.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
+                    self.device_state.input.click(33 + random.randint(-2,2), 566 + random.randint(-2,2))
                     time.sleep(0.1)
-                    self.device_state.u2_device.click(
+                    self.device_state.input.click(
                         SHOW_CARDS_BUTTON[0] + random.randint(SHOW_CARDS_RANDOM_X[0], SHOW_CARDS_RANDOM_X[1]),
                         SHOW_CARDS_BUTTON[1] + random.randint(SHOW_CARDS_RANDOM_Y[0], SHOW_CARDS_RANDOM_Y[1])
                     )
                     time.sleep(0.1)
                     #移除手牌光标提高识别率
                     from src.config.game_constants import DEFAULT_ATTACK_TARGET
-                    self.device_state.u2_device.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
-                    time.sleep(0.2)
+                    self.device_state.input.click(DEFAULT_ATTACK_TARGET[0] + random.randint(-2,2), DEFAULT_ATTACK_TARGET[1] + random.randint(-2,2))
+                    # 等待手牌展开后重试（原为固定等待0.2秒 + 重试前0.5秒）
+                    if attempt < max_retries - 1:
+                        from src.config.game_constants import HAND_CARDS_REGION
+                        from src.utils.utils import RoiStable
+                        self.device_state.wait_until(RoiStable(HAND_CARDS_REGION), timeout=0.7, min_wait=0.2,
+                                                     legacy_delay=0.7, label="展牌重试")
+                        hand_revealed = True
+                    else:
+                        time.sleep(0.2)
             
             except Exception as e:
                 logger.error(f"第{attempt + 1}次手牌识别尝试出错: {str(e)}")
             
             # 等待一段时间后重试
-            if attempt < max_retries - 1:
+            if attempt < max_retries - 1 and not hand_revealed:
                 time.sleep(0.5)
         
         if not silent:
@@ -0,0 +1,175 @@
+"""
+场景分类器
+根据最近检测到的按钮和对战状态推断当前游戏场景，决定每轮优先检测哪些模板
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 场景定义
+SCENE_UNKNOWN = "unknown"
+SCENE_LOBBY = "lobby"              # 大厅/登录/主页面
+SCENE_MATCHMAKING = "matchmaking"  # 点击决斗后排队匹配中
+SCENE_MULLIGAN = "mulligan"        # 换牌阶段
+SCENE_MY_TURN = "my_turn"          # 我方回合
+SCENE_ENEMY_TURN = "enemy_turn"    # 敌方回合
+SCENE_RESULT = "result"            # 对战结算界面
+
+SCENE_NAMES = {
+    SCENE_UNKNOWN: "未知",
+    SCENE_LOBBY: "大厅",
+    SCENE_MATCHMAKING: "匹配中",
+    SCENE_MULLIGAN: "换牌",
+    SCENE_MY_TURN: "我方回合",
+    SCENE_ENEMY_TURN: "敌方回合",
+    SCENE_RESULT: "结算",
+}
+
+# 检测到某个按钮后进入的场景（未列出的按钮如Ok/error_retry不改变场景）
+BUTTON_SCENES = {
+    'MuMuPage': SCENE_LOBBY,
+    'LoginPage': SCENE_LOBBY,
+    'enterGame': SCENE_LOBBY,
+    'mainPage': SCENE_LOBBY,
+    'dailyCard': SCENE_LOBBY,
+    'backTitle': SCENE_LOBBY,
+    'war': SCENE_MATCHMAKING,
+    'decision': SCENE_MULLIGAN,
+    'end_round': SCENE_MY_TURN,
+    'enemy_round': SCENE_ENEMY_TURN,
+    'end': SCENE_RESULT,
+    'rank': SCENE_RESULT,
+    'missionCompleted': SCENE_RESULT,
+    'rankUp': SCENE_RESULT,
+    'groupUp': SCENE_RESULT,
+    'Yes': SCENE_RESULT,
+}
+
+# 各场景下可能出现的按钮（按默认优先级排列），不在列表中的内置按钮视为不可能出现
+SCENE_CANDIDATES = {
+    SCENE_LOBBY: ['war', 'mainPage', 'LoginPage', 'enterGame', 'dailyCard', 'MuMuPage',
+                  'backTitle', 'missionCompleted', 'Yes', 'Ok', 'error_retry'],
+    SCENE_MATCHMAKING: ['decision', 'war', 'enterGame', 'Ok', 'error_retry'],
+    SCENE_MULLIGAN: ['end_round', 'enemy_round', 'decision', 'Ok', 'error_retry'],
+    SCENE_MY_TURN: ['enemy_round', 'end_round', 'end', 'Ok', 'error_retry'],
+    SCENE_ENEMY_TURN: ['end_round', 'enemy_round', 'end', 'Ok', 'error_retry'],
+    SCENE_RESULT: ['rank', 'missionCompleted', 'rankUp', 'groupUp', 'Yes', 'Ok', 'end',
+                   'backTitle', 'war', 'decision', 'mainPage', 'error_retry'],
+}
+
+# 对战中的场景
+IN_MATCH_SCENES = (SCENE_MULLIGAN, SCENE_MY_TURN, SCENE_ENEMY_TURN)
+
+
+class SceneClassifier:
+    """场景状态机：按当前场景对模板排序并跳过不可能出现的模板，命中统计用于自适应排序"""
+
+    def __init__(self, device_state, full_scan_interval: int = 5):
+        """
+        Args:
+            device_state: 设备状态对象
+            full_scan_interval: 连续多少轮未命中任何按钮后做一次全模板扫描（防止场景判断错误时漏检）
+        """
+        self.device_state = device_state
+        self.full_scan_interval = full_scan_interval
+        self.scene = SCENE_UNKNOWN
+        self.idle_ticks = 0
+        # 每个场景下各按钮的命中次数 {场景: {按钮: 次数}}
+        self.scene_hits: Dict[str, Dict[str, int]] = {}
+        self.total_ticks = 0
+        self.total_matches = 0
+        self.full_scans = 0
+
+    def get_candidate_keys(self, templates: Dict[str, Dict]) -> List[str]:
+        """
+        获取本轮需要检测的模板键（按命中概率从高到低）
+
+        Args:
+            templates: TemplateManager.templates
+        """
+        scene = self._infer_scene()
+        # 额外模板(用户自定义)无法判断所属场景，始终检测
+        extra_keys = [k for k in templates if k not in BUTTON_SCENES and k not in ('Ok', 'error_retry')]
+
+        if scene == SCENE_UNKNOWN or self.idle_ticks >= self.full_scan_interval:
+            self.full_scans += 1
+            self.idle_ticks = 0
+            keys = list(templates.keys())
+            if scene != SCENE_UNKNOWN:
+                # 全扫描时仍让当前场景的候选排在前面
+                candidates = self._ordered_candidates(scene)
+                keys.sort(key=lambda k: candidates.index(k) if k in candidates else len(candidates))
+            elif self.device_state.in_match:
+                keys.sort(key=lambda k: 0 if BUTTON_SCENES.get(k) in IN_MATCH_SCENES else 1)
+            return keys
+
+        keys = [k for k in self._ordered_candidates(scene) if k in templates]
+        return keys + [k for k in extra_keys if k not in keys]
+
+    def _infer_scene(self) -> str:
+        """根据上次检测到的按钮和对战状态推断当前场景"""
+        if self.scene == SCENE_UNKNOWN:
+            last_scene = BUTTON_SCENES.get(self.device_state.last_detected_button)
+            if last_scene:
+                self.scene = last_scene
+            elif self.device_state.in_match:
+                self.scene = SCENE_ENEMY_TURN
+        return self.scene
+
+    def _ordered_candidates(self, scene: str) -> List[str]:
+        """候选按钮按该场景下的历史命中次数排序（次数相同保持默认顺序）"""
+        candidates = SCENE_CANDIDATES.get(scene, [])
+        hits = self.scene_hits.get(scene, {})
+        return sorted(candidates, key=lambda k: -hits.get(k, 0))
+
+    def record_hit(self, key: str):
+        """记录一次按钮命中并切换场景"""
+        scene = self.scene
+        scene_stats = self.scene_hits.setdefault(scene, {})
+        scene_stats[key] = scene_stats.get(key, 0) + 1
+
+        new_scene = BUTTON_SCENES.get(key)
+        if new_scene and new_scene != scene:
+            self.device_state.logger.debug(f"场景切换: {SCENE_NAMES[scene]} -> {SCENE_NAMES[new_scene]} (按钮: {key})")
+            self.scene = new_scene
+
+    def end_tick(self, matches: int, hit: bool):
+        """
+        记录一轮检测结束
+
+        Args:
+            matches: 本轮执行的模板匹配次数
+            hit: 本轮是否命中任何按钮
+        """
+        self.total_ticks += 1
+        self.total_matches += matches
+        self.idle_ticks = 0 if hit else self.idle_ticks + 1
+
+    def reset(self):
+        """重置场景（如重启模拟器后）"""
+        self.scene = SCENE_UNKNOWN
+        self.idle_ticks = 0
+
+    def get_stats(self) -> Dict:
+        """获取场景统计信息"""
+        avg_matches = self.total_matches / self.total_ticks if self.total_ticks else 0.0
+        return {
+            'scene': self.scene,
+            'total_ticks': self.total_ticks,
+            'avg_matches_per_tick': avg_matches,
+            'full_scans': self.full_scans,
+            'scene_hits': {scene: dict(hits) for scene, hits in self.scene_hits.items()},
+        }
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出场景统计信息"""
+        log = target_logger or logger
+        stats = self.get_stats()
+        log.info(f"当前场景: {SCENE_NAMES.get(stats['scene'], stats['scene'])}, "
+                 f"平均每轮模板匹配次数: {stats['avg_matches_per_tick']:.2f} "
+                 f"(共 {stats['total_ticks']} 轮, 全扫描 {stats['full_scans']} 次)")
+        for scene, hits in stats['scene_hits'].items():
+            hits_text = ", ".join(f"{k}:{v}" for k, v in sorted(hits.items(), key=lambda item: -item[1]))
+            log.info(f"  [{SCENE_NAMES.get(scene, scene)}] {hits_text}")
@@ -10,7 +10,10 @@ import glob
 import logging
 from typing import List, Tuple, Dict, Optional
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from src.utils.frame import Frame
+from concurrent.futures import as_completed
+from src.utils.vision_pool import VisionWorkerPool, PRIORITY_CRITICAL
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +21,14 @@ logger = logging.getLogger(__name__)
 class SiftCardRecognition:
     """SIFT卡牌识别类"""
     
-    def __init__(self, card_images_dir: str = "shadowverse_cards_cost"):
+    def __init__(self, card_images_dir: str = "shadowverse_cards_cost", use_merged_index: bool = True):
         """
         初始化SIFT卡牌识别器
         
         Args:
             card_images_dir: 卡牌图片目录路径
+            use_merged_index: 是否使用合并的FLANN索引（所有模板描述子只建一次索引），
+                False时回退为每个模板单独建匹配器
         """
         self.card_images_dir = card_images_dir
         self.card_templates = {}  # 缓存卡牌模板
@@ -32,9 +37,20 @@ class SiftCardRecognition:
         self.hand_area = (229, 539, 1130, 710)  # 手牌区域 (x1, y1, x2, y2) - 更新为新坐标
         self.min_matches = 4  # 最小匹配点数
         self.match_threshold = 0.01  # 匹配阈值
+        self.use_merged_index = use_merged_index
+        self.merged_knn = 8  # 合并索引中每个手牌特征点查询的近邻数（用于模板内比率测试）
+        
+        # 合并索引相关数据
+        self._merged_matcher = None
+        self._merged_lock = threading.Lock()
+        self._row_template = None  # 合并描述子行 -> 模板序号
+        self._row_local = None     # 合并描述子行 -> 模板内关键点序号
+        self._template_names = []
         
         # 加载卡牌模板
         self._load_card_templates()
+        if self.use_merged_index:
+            self._build_merged_index()
     
     def _load_card_templates(self):
         """加载所有卡牌模板"""
@@ -112,17 +128,152 @@ class SiftCardRecognition:
         except Exception as e:
             logger.error(f"加载卡牌模板时出错: {str(e)}")
     
+    def _build_merged_index(self):
+        """将所有模板描述子堆叠为一个预训练的FLANN索引，并记录行到模板的映射"""
+        try:
+            if not self.card_templates:
+                return
+            self._template_names = list(self.card_templates.keys())
+            descriptor_list = []
+            row_template = []
+            row_local = []
+            for template_idx, template_name in enumerate(self._template_names):
+                descriptors = self.card_templates[template_name]['descriptors']
+                descriptor_list.append(descriptors.astype(np.float32))
+                row_template.append(np.full(len(descriptors), template_idx, dtype=np.int32))
+                row_local.append(np.arange(len(descriptors), dtype=np.int32))
+            self._row_template = np.concatenate(row_template)
+            self._row_local = np.concatenate(row_local)
+
+            FLANN_INDEX_KDTREE = 1
+            index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
+            search_params = dict(checks=50)
+            matcher = cv2.FlannBasedMatcher(index_params, search_params)
+            matcher.add([np.vstack(descriptor_list)])
+            matcher.train()
+            self._merged_matcher = matcher
+            logger.info(f"已构建合并FLANN索引: {len(self._template_names)} 个模板, {len(self._row_template)} 个描述子")
+        except Exception as e:
+            logger.error(f"构建合并FLANN索引失败，回退为逐模板匹配: {str(e)}")
+            self._merged_matcher = None
+
+    def _match_merged(self, hand_descriptors) -> Dict[int, List[Tuple[int, int, float]]]:
+        """
+        在合并索引上一次性查询手牌描述子，并按模板汇总投票
+
+        与逐模板匹配保持相同的筛选口径：
+        - 比率测试只在同一模板的近邻之间进行，相似或重复的模板不会互相抵消；
+          近邻中该模板不足2个时无法做比率测试，不计入投票
+        - 每个模板关键点只保留距离最近的一个手牌匹配，match_ratio 仍按模板关键点计数
+
+        Returns:
+            Dict[int, List[Tuple[int, int, float]]]: 模板序号 -> [(模板关键点序号, 手牌关键点序号, 距离)]
+        """
+        # 近邻数不能超过索引中的描述子总数
+        k = min(self.merged_knn, len(self._row_template))
+        if k < 2:
+            return {}
+        with self._merged_lock:
+            matches = self._merged_matcher.knnMatch(hand_descriptors.astype(np.float32), k=k)
+        best = {}  # (模板序号, 模板关键点序号) -> (手牌关键点序号, 距离)
+        for neighbors in matches:
+            if len(neighbors) < 2:
+                continue
+            # 每个模板在近邻中的最近和次近距离
+            nearest = {}
+            second = {}
+            for m in neighbors:
+                template_idx = int(self._row_template[m.trainIdx])
+                if template_idx not in nearest:
+                    nearest[template_idx] = m
+                elif template_idx not in second:
+                    second[template_idx] = m.distance
+            for template_idx, m in nearest.items():
+                if template_idx not in second:
+                    continue
+                if m.distance < 0.7 * second[template_idx]:
+                    key = (template_idx, int(self._row_local[m.trainIdx]))
+                    if key not in best or m.distance < best[key][1]:
+                        best[key] = (m.queryIdx, m.distance)
+        votes = {}
+        for (template_idx, local_idx), (hand_idx, distance) in best.items():
+            votes.setdefault(template_idx, []).append((local_idx, hand_idx, distance))
+        return votes
+
+    def _cluster_and_locate(self, template_name, template_info, good_matches, hand_keypoints) -> List[Dict]:
+        """
+        对单个模板的匹配点聚类并通过单应性矩阵定位卡牌中心
+
+        Args:
+            good_matches: [(模板关键点序号, 手牌关键点序号, 距离)]
+            hand_keypoints: 手牌区域关键点
+        """
+        recognized_cards = []
+        if len(good_matches) < self.min_matches:
+            return recognized_cards
+        x1, y1 = self.hand_area[:2]
+        template_descriptors = template_info['descriptors']
+        dst_pts = np.float32([hand_keypoints[hand_idx].pt for _, hand_idx, _ in good_matches])
+        clusters = []
+        cluster_indices = []
+        distance_thresh = 80  # 像素距离阈值
+        for i, pt in enumerate(dst_pts):
+            found = False
+            for cidx, c in enumerate(clusters):
+                if np.linalg.norm(pt - c) < distance_thresh:
+                    cluster_indices[cidx].append(i)
+                    clusters[cidx] = (clusters[cidx] * (len(cluster_indices[cidx])-1) + pt) / len(cluster_indices[cidx])
+                    found = True
+                    break
+            if not found:
+                clusters.append(pt.copy())
+                cluster_indices.append([i])
+        for idx_list in cluster_indices:
+            if len(idx_list) < self.min_matches:
+                continue
+            cluster_good_matches = [good_matches[i] for i in idx_list]
+            src_pts = np.float32([template_info['keypoints'][t_idx].pt for t_idx, _, _ in cluster_good_matches]).reshape(-1, 1, 2)
+            dst_pts_c = np.float32([hand_keypoints[h_idx].pt for _, h_idx, _ in cluster_good_matches]).reshape(-1, 1, 2)
+            M, mask = cv2.findHomography(src_pts, dst_pts_c, cv2.RANSAC, 5.0)
+            if M is not None:
+                h, w = template_info['template'].shape[:2]
+                template_center = np.array([[w/2, h/2, 1]], dtype=np.float32)
+                target_center = M.dot(template_center.T)
+                # 检查除零和无效值
+                if target_center[2] == 0 or np.isnan(target_center[0]) or np.isnan(target_center[1]) or np.isnan(target_center[2]):
+                    continue  # 跳过异常结果
+                target_center = target_center / target_center[2]
+                if np.isnan(target_center[0]) or np.isnan(target_center[1]):
+                     continue  # 跳过异常结果
+                global_x = int(target_center[0]) + x1
+                global_y = int(target_center[1]) + y1
+                avg_distance = np.mean([distance for _, _, distance in cluster_good_matches])
+                if avg_distance <= 100:
+                    distance_score = 1.0
+                elif avg_distance <= 200:
+                    distance_score = 1.0 - (avg_distance - 100) / 100
+                else:
+                    distance_score = max(0, 1.0 - (avg_distance - 200) / 100)
+                match_ratio = len(cluster_good_matches) / len(template_descriptors)
+                confidence = distance_score * match_ratio
+                if confidence >= self.match_threshold:
+                    recognized_cards.append({
+                        'center': (global_x, global_y),
+                        'cost': template_info['cost'],
+                        'name': template_info['name'],
+                        'confidence': confidence,
+                        'template_name': template_name
+                    })
+                    logger.debug(f"识别到卡牌: {template_name} (费用: {template_info['cost']}, 置信度: {confidence:.3f})")
+        return recognized_cards
+
     def recognize_hand_cards(self, screenshot) -> List[Dict]:
         """
-        识别手牌区域中的卡牌（支持同名卡牌多张识别，支持多模板并发SIFT加速）
+        识别手牌区域中的卡牌（支持同名卡牌多张识别，默认使用合并FLANN索引一次查询所有模板）
         """
         try:
-            # 转换为OpenCV格式
-            if hasattr(screenshot, 'shape'):
-                image = screenshot
-            else:
-                image = np.array(screenshot)
-                image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            # 转换为OpenCV格式（Frame复用已缓存的BGR，数组视为BGR）
+            image = Frame.from_any(screenshot).bgr
             x1, y1, x2, y2 = self.hand_area
             hand_region = image[y1:y2, x1:x2]
             
@@ -134,89 +285,40 @@ class SiftCardRecognition:
                 return []
             logger.debug(f"手牌区域SIFT特征点数: {len(hand_keypoints)}")
 
-            def match_and_cluster(template_name, template_info):
-                recognized_cards = []
-                template_descriptors = template_info['descriptors']
-                FLANN_INDEX_KDTREE = 1
-                index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
-                search_params = dict(checks=50)
-                flann = cv2.FlannBasedMatcher(index_params, search_params)
-                try:
-                    matches = flann.knnMatch(template_descriptors, hand_descriptors, k=2)
-                except Exception as e:
-                    logger.debug(f"模板 {template_name} 匹配失败: {str(e)}")
-                    return []
-                good_matches = []
-                for match_pair in matches:
-                    if len(match_pair) == 2:
-                        m, n = match_pair
-                        if m.distance < 0.7 * n.distance:
-                            good_matches.append(m)
-                if len(good_matches) >= self.min_matches:
-                    dst_pts = np.float32([hand_keypoints[m.trainIdx].pt for m in good_matches])
-                    clusters = []
-                    cluster_indices = []
-                    distance_thresh = 80  # 像素距离阈值
-                    for i, pt in enumerate(dst_pts):
-                        found = False
-                        for cidx, c in enumerate(clusters):
-                            if np.linalg.norm(pt - c) < distance_thresh:
-                                cluster_indices[cidx].append(i)
-                                clusters[cidx] = (clusters[cidx] * (len(cluster_indices[cidx])-1) + pt) / len(cluster_indices[cidx])
-                                found = True
-                                break
-                        if not found:
-                            clusters.append(pt.copy())
-                            cluster_indices.append([i])
-                    for idx_list in cluster_indices:
-                        if len(idx_list) < self.min_matches:
-                            continue
-                        cluster_good_matches = [good_matches[i] for i in idx_list]
-                        src_pts = np.float32([template_info['keypoints'][m.queryIdx].pt for m in cluster_good_matches]).reshape(-1, 1, 2)
-                        dst_pts_c = np.float32([hand_keypoints[m.trainIdx].pt for m in cluster_good_matches]).reshape(-1, 1, 2)
-                        M, mask = cv2.findHomography(src_pts, dst_pts_c, cv2.RANSAC, 5.0)
-                        if M is not None:
-                            h, w = template_info['template'].shape[:2]
-                            template_center = np.array([[w/2, h/2, 1]], dtype=np.float32)
-                            target_center = M.dot(template_center.T)
-                            # 检查除零和无效值
-                            if target_center[2] == 0 or np.isnan(target_center[0]) or np.isnan(target_center[1]) or np.isnan(target_center[2]):
-                                continue  # 跳过异常结果
-                            target_center = target_center / target_center[2]
-                            if np.isnan(target_center[0]) or np.isnan(target_center[1]):
-                                 continue  # 跳过异常结果
-                            global_x = int(target_center[0]) + x1
-                            global_y = int(target_center[1]) + y1
-                            avg_distance = np.mean([m.distance for m in cluster_good_matches])
-                            if avg_distance <= 100:
-                                distance_score = 1.0
-                            elif avg_distance <= 200:
-                                distance_score = 1.0 - (avg_distance - 100) / 100
-                            else:
-                                distance_score = max(0, 1.0 - (avg_distance - 200) / 100)
-                            match_ratio = len(cluster_good_matches) / len(template_descriptors)
-                            confidence = distance_score * match_ratio
-                            if confidence >= self.match_threshold:
-                                recognized_cards.append({
-                                    'center': (global_x, global_y),
-                                    'cost': template_info['cost'],
-                                    'name': template_info['name'],
-                                    'confidence': confidence,
-                                    'template_name': template_name
-                                })
-                                logger.debug(f"识别到卡牌: {template_name} (费用: {template_info['cost']}, 置信度: {confidence:.3f})")
-                return recognized_cards
-
-            # 动态获取可用核心数，优先8核
-            try:
-                max_workers = min(8, os.cpu_count() or 4)
-            except Exception:
-                max_workers = 4
             recognized_cards = []
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            if self._merged_matcher is not None:
+                # 合并索引：手牌描述子只查询一次，按模板汇总投票后再聚类定位
+                votes = self._match_merged(hand_descriptors)
+                for template_idx, good_matches in votes.items():
+                    template_name = self._template_names[template_idx]
+                    recognized_cards.extend(self._cluster_and_locate(
+                        template_name, self.card_templates[template_name], good_matches, hand_keypoints))
+            else:
+                def match_and_cluster(template_name, template_info):
+                    template_descriptors = template_info['descriptors']
+                    FLANN_INDEX_KDTREE = 1
+                    index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
+                    search_params = dict(checks=50)
+                    flann = cv2.FlannBasedMatcher(index_params, search_params)
+                    try:
+                        matches = flann.knnMatch(template_descriptors, hand_descriptors, k=2)
+                    except Exception as e:
+                        logger.debug(f"模板 {template_name} 匹配失败: {str(e)}")
+                        return []
+                    good_matches = []
+                    for match_pair in matches:
+                        if len(match_pair) == 2:
+                            m, n = match_pair
+                            if m.distance < 0.7 * n.distance:
+                                good_matches.append((m.queryIdx, m.trainIdx, m.distance))
+                    return self._cluster_and_locate(template_name, template_info, good_matches, hand_keypoints)
+
+                # 在共享视觉线程池中并发匹配（全局并发数由线程池统一限制）
+                pool = VisionWorkerPool.get_shared()
                 futures = []
                 for template_name, template_info in self.card_templates.items():
-                    futures.append(executor.submit(match_and_cluster, template_name, template_info))
+                    futures.append(pool.submit(match_and_cluster, template_name, template_info,
+                                               priority=PRIORITY_CRITICAL))
                 for future in as_completed(futures):
                     try:
                         recognized_cards.extend(future.result())
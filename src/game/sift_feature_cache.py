@@ -0,0 +1,240 @@
+"""
+SIFT特征缓存模块
+进程级共享的卡牌模板SIFT特征库，并将关键点和描述子持久化到磁盘(.npz)
+卡组变化后只重新计算发生变化的卡牌
+"""
+
+import cv2
+import numpy as np
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, Optional
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# 特征缓存目录
+SIFT_CACHE_DIR = os.path.join("cache", "sift_features")
+
+# 我方随从名称识别使用的模板预处理参数（与scan_our_followers保持一致）
+FOLLOWER_SIFT_PROFILE = {
+    'crop_rect': (101, 151, 442, 568),
+    'scale_factor': 0.4,
+    'interpolation': 'area',
+    'equalize_hist': True,
+    'blur_sigma': 0.5,
+    'sift_params': {
+        'nfeatures': 0,
+        'contrastThreshold': 0.02,
+        'edgeThreshold': 15,
+        'sigma': 1.6,
+    },
+}
+
+_INTERPOLATIONS = {
+    'area': cv2.INTER_AREA,
+    'linear': cv2.INTER_LINEAR,
+}
+
+
+def _keypoints_to_array(keypoints) -> np.ndarray:
+    """将cv2.KeyPoint列表序列化为float32数组"""
+    return np.array(
+        [[kp.pt[0], kp.pt[1], kp.size, kp.angle, kp.response, kp.octave, kp.class_id] for kp in keypoints],
+        dtype=np.float32
+    ).reshape(-1, 7)
+
+
+def _array_to_keypoints(array: np.ndarray):
+    """从float32数组还原cv2.KeyPoint列表"""
+    return [
+        cv2.KeyPoint(float(x), float(y), float(size), float(angle), float(response), int(octave), int(class_id))
+        for x, y, size, angle, response, octave, class_id in array
+    ]
+
+
+class SiftFeatureStore:
+    """卡牌模板SIFT特征库（按卡牌目录和预处理参数进程内共享）"""
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def get_shared(cls, card_images_dir: str = "shadowverse_cards_cost", profile: Optional[Dict] = None):
+        """
+        获取共享的特征库实例，同一目录和参数在进程内只构建一次
+
+        Args:
+            card_images_dir: 卡牌图片目录
+            profile: 预处理和SIFT参数，默认使用随从识别参数
+        """
+        profile = profile or FOLLOWER_SIFT_PROFILE
+        key = (os.path.abspath(card_images_dir), json.dumps(profile, sort_keys=True))
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(card_images_dir, profile)
+            return cls._instances[key]
+
+    def __init__(self, card_images_dir: str, profile: Dict):
+        self.card_images_dir = card_images_dir
+        self.profile = profile
+        # 参数指纹：缩放因子、裁剪区域、SIFT参数和OpenCV版本任一变化都会使缓存失效
+        fingerprint = json.dumps({'profile': profile, 'cv2': cv2.__version__}, sort_keys=True)
+        self.profile_hash = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:16]
+        self.cache_file = os.path.join(SIFT_CACHE_DIR, f"{self.profile_hash}.npz")
+
+        self._lock = threading.Lock()
+        self._sift = None
+        self._dir_signature = None
+        self._templates = {}       # 模板名 -> {'keypoints', 'descriptors', 'file_hash'}
+        self._disk_entries = None  # 文件哈希 -> (关键点数组, 描述子)
+
+    def get_templates(self) -> Dict[str, Dict]:
+        """
+        获取全部卡牌模板特征，目录内容变化时自动增量刷新
+
+        Returns:
+            Dict[str, Dict]: 模板名(不含扩展名) -> {'keypoints', 'descriptors'}
+        """
+        with self._lock:
+            try:
+                signature = self._scan_directory()
+                if signature != self._dir_signature:
+                    self._refresh(signature)
+            except Exception as e:
+                logger.error(f"刷新SIFT特征库时出错: {str(e)}")
+            return self._templates
+
+    def _scan_directory(self):
+        """获取卡牌目录的轻量签名(文件名、大小、修改时间)"""
+        if not os.path.isdir(self.card_images_dir):
+            return ()
+        signature = []
+        for filename in sorted(os.listdir(self.card_images_dir)):
+            if not filename.endswith('.png'):
+                continue
+            stat = os.stat(os.path.join(self.card_images_dir, filename))
+            signature.append((filename, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def _refresh(self, signature):
+        """按文件哈希增量重建特征库，仅重新计算新增或修改过的卡牌"""
+        if self._disk_entries is None:
+            self._disk_entries = self._load_cache_file()
+
+        templates = {}
+        computed = 0
+        for filename, _, _ in signature:
+            path = os.path.join(self.card_images_dir, filename)
+            tname = os.path.splitext(filename)[0]
+            try:
+                with open(path, 'rb') as f:
+                    file_hash = hashlib.sha1(f.read()).hexdigest()
+                entry = self._disk_entries.get(file_hash)
+                if entry is None:
+                    entry = self._compute_features(path)
+                    if entry is None:
+                        continue
+                    self._disk_entries[file_hash] = entry
+                    computed += 1
+                kp_array, descriptors = entry
+                templates[tname] = {
+                    'keypoints': _array_to_keypoints(kp_array),
+                    'descriptors': descriptors,
+                    'file_hash': file_hash,
+                }
+            except Exception as e:
+                logger.error(f"处理卡牌模板 {filename} 时出错: {str(e)}")
+
+        # 清理已从卡组中移除的卡牌
+        live_hashes = {info['file_hash'] for info in templates.values()}
+        removed = len(self._disk_entries) - len(live_hashes)
+        self._disk_entries = {h: e for h, e in self._disk_entries.items() if h in live_hashes}
+
+        if computed or removed:
+            self._save_cache_file()
+
+        self._templates = templates
+        self._dir_signature = signature
+        logger.info(f"SIFT特征库已就绪: {len(templates)} 张卡牌 (新计算 {computed} 张, 缓存命中 {len(templates) - computed} 张)")
+
+    def _compute_features(self, path: str):
+        """按预处理参数计算单张卡牌的SIFT特征"""
+        try:
+            template_img = np.array(Image.open(path))
+        except Exception as e:
+            logger.warning(f"无法读取图片: {path} ({e})")
+            return None
+        if len(template_img.shape) == 3 and template_img.shape[2] == 4:
+            template_img = cv2.cvtColor(template_img, cv2.COLOR_RGBA2BGR)
+        elif len(template_img.shape) == 3 and template_img.shape[2] == 3:
+            template_img = cv2.cvtColor(template_img, cv2.COLOR_RGB2BGR)
+
+        profile = self.profile
+        crop_rect = profile.get('crop_rect')
+        if crop_rect:
+            tx1, ty1, tx2, ty2 = crop_rect
+            template_img = template_img[ty1:ty2, tx1:tx2]
+
+        scale_factor = profile.get('scale_factor', 1.0)
+        if scale_factor != 1.0:
+            new_width = int(template_img.shape[1] * scale_factor)
+            new_height = int(template_img.shape[0] * scale_factor)
+            interpolation = _INTERPOLATIONS.get(profile.get('interpolation', 'linear'), cv2.INTER_LINEAR)
+            template_img = cv2.resize(template_img, (new_width, new_height), interpolation=interpolation)
+
+        gray = template_img if len(template_img.shape) == 2 else cv2.cvtColor(template_img, cv2.COLOR_BGR2GRAY)
+        if profile.get('equalize_hist'):
+            gray = cv2.equalizeHist(gray)
+        if profile.get('blur_sigma'):
+            gray = cv2.GaussianBlur(gray, (3, 3), profile['blur_sigma'])
+
+        if self._sift is None:
+            self._sift = cv2.SIFT_create(**profile.get('sift_params', {}))
+        keypoints, descriptors = self._sift.detectAndCompute(gray, None)
+        if descriptors is None:
+            return None
+        return _keypoints_to_array(keypoints), descriptors
+
+    def _load_cache_file(self) -> Dict:
+        """读取磁盘缓存，文件不存在或损坏时返回空缓存"""
+        entries = {}
+        if not os.path.exists(self.cache_file):
+            return entries
+        try:
+            with np.load(self.cache_file, allow_pickle=False) as data:
+                for i, file_hash in enumerate(data['hashes']):
+                    entries[str(file_hash)] = (data[f'kp_{i}'], data[f'des_{i}'])
+            logger.info(f"已读取SIFT特征缓存: {self.cache_file} ({len(entries)} 张)")
+        except Exception as e:
+            logger.warning(f"SIFT特征缓存读取失败，将重新计算: {e}")
+            entries = {}
+        return entries
+
+    def _save_cache_file(self):
+        """将当前特征写入磁盘缓存(先写临时文件再替换，避免写入中断导致缓存损坏)"""
+        tmp_file = None
+        try:
+            os.makedirs(SIFT_CACHE_DIR, exist_ok=True)
+            arrays = {'hashes': np.array(list(self._disk_entries.keys()))}
+            for i, (kp_array, descriptors) in enumerate(self._disk_entries.values()):
+                arrays[f'kp_{i}'] = kp_array
+                arrays[f'des_{i}'] = descriptors
+            # 每个进程使用不同的临时文件，多个设备进程同时写缓存时不会互相覆盖
+            with tempfile.NamedTemporaryFile(dir=SIFT_CACHE_DIR, suffix=".tmp.npz", delete=False) as tmp:
+                tmp_file = tmp.name
+                np.savez(tmp, **arrays)
+            os.replace(tmp_file, self.cache_file)
+            tmp_file = None
+        except Exception as e:
+            logger.warning(f"写入SIFT特征缓存失败: {e}")
+        finally:
+            if tmp_file is not None:
+                try:
+                    os.remove(tmp_file)
+                except OSError:
+                    pass
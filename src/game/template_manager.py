@@ -6,9 +6,14 @@
 import cv2
 import os
 import logging
+import threading
 import numpy as np
 from typing import Dict, Any, Optional, Tuple, Union
 from src.utils.resource_utils import get_resource_path
+from src.config.game_constants import (
+    TEMPLATE_ROI_MARGIN, TEMPLATE_ROI_FALLBACK_MISSES, PYRAMID_LEVELS,
+    PYRAMID_MIN_TEMPLATE_SIZE, PYRAMID_MIN_SEARCH_POSITIONS, PYRAMID_REJECT_MARGIN
+)
 
 logger = logging.getLogger(__name__)
 
@@ -25,12 +30,25 @@ class TemplateManager:
         self.templates: Dict[str, Dict[str, Any]] = {}
         self.evolution_template = None
         self.super_evolution_template = None
+        # 搜索区域参数（可在load_templates时由配置覆盖）
+        self.roi_margin = TEMPLATE_ROI_MARGIN
+        self.roi_fallback_misses = TEMPLATE_ROI_FALLBACK_MISSES
+        # 金字塔层数（含原图层，1表示不使用金字塔）
+        self.pyramid_levels = PYRAMID_LEVELS
+        # 最近一次截图的金字塔缓存 (图像, [各层图像])，同一帧匹配多个模板时只降采样一次
+        self._image_pyramid = (None, [])
+        self._pyramid_lock = threading.Lock()
         
         # 记录模板目录选择
         logger.info(f"模板管理器初始化: 使用目录 '{self.templates_dir}'")
     
     def load_templates(self, config: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
         """加载所有模板"""
+        template_config = config.get("templates", {})
+        self.roi_margin = template_config.get("roi_margin", TEMPLATE_ROI_MARGIN)
+        self.roi_fallback_misses = template_config.get("roi_fallback_misses", TEMPLATE_ROI_FALLBACK_MISSES)
+        self.pyramid_levels = max(1, int(template_config.get("pyramid_levels", PYRAMID_LEVELS)))
+
         templates = {
             'rank': self._create_template_info('rank.png', "阶级积分"),
             'missionCompleted': self._create_template_info('missionCompleted.png', "任务完成"),
@@ -62,6 +80,11 @@ class TemplateManager:
                 if v is not None:
                     templates[k] = v
 
+        # 配置中指定的固定搜索区域 {模板名: [x1, y1, x2, y2]}
+        for key, region in template_config.get("search_regions", {}).items():
+            if templates.get(key) is not None and region and len(region) == 4:
+                templates[key]['search_region'] = tuple(int(v) for v in region)
+
         self.templates = {k: v for k, v in templates.items() if v is not None}
         logger.info("模板加载完成")
         return self.templates
@@ -114,15 +137,17 @@ class TemplateManager:
             logger.error(f"无法加载模板: {path}")
         return template
 
-    def _create_template_info(self, filename: str, name: str, threshold: float = 0.85, hsv_range: dict = None) -> Optional[Dict[str, Any]]:
+    def _create_template_info(self, filename: str, name: str, threshold: float = 0.85, hsv_range: dict = None,
+                              search_region: Optional[Tuple[int, int, int, int]] = None) -> Optional[Dict[str, Any]]:
         """创建模板信息字典"""
         template_img = self._load_template(self.templates_dir, filename)
         if template_img is None:
             return None
 
-        return self._create_template_info_from_image(template_img, name, threshold, hsv_range)
+        return self._create_template_info_from_image(template_img, name, threshold, hsv_range, search_region)
 
-    def _create_template_info_from_image(self, template: np.ndarray, name: str, threshold: float = 0.85, hsv_range: dict = None) -> Dict[str, Any]:
+    def _create_template_info_from_image(self, template: np.ndarray, name: str, threshold: float = 0.85, hsv_range: dict = None,
+                                         search_region: Optional[Tuple[int, int, int, int]] = None) -> Dict[str, Any]:
         """从图像创建模板信息字典，支持灰度和三通道"""
         if len(template.shape) == 2:
             h, w = template.shape
@@ -134,9 +159,84 @@ class TemplateManager:
             'w': w,
             'h': h,
             'threshold': threshold,
-            'hsv_range': hsv_range  # 可选颜色判定区间
+            'hsv_range': hsv_range,  # 可选颜色判定区间
+            'search_region': search_region,  # 可选固定搜索区域 (x1, y1, x2, y2)
+            'learned_region': None,  # 根据历史命中位置自动学习的搜索区域
+            'roi_misses': 0,  # 区域内连续未命中次数
+            'pyramid': self._build_template_pyramid(template)  # 降采样模板 [第1层, 第2层, ...]
         }
 
+    def _build_template_pyramid(self, template: np.ndarray) -> list:
+        """预先计算模板的降采样金字塔，模板过小的层不再生成"""
+        pyramid = []
+        level_img = template
+        for _ in range(1, self.pyramid_levels):
+            level_img = cv2.pyrDown(level_img)
+            if min(level_img.shape[:2]) < PYRAMID_MIN_TEMPLATE_SIZE:
+                break
+            pyramid.append(level_img)
+        return pyramid
+
+    def _get_image_level(self, image: np.ndarray, level: int) -> np.ndarray:
+        """获取截图第level层的降采样图像（同一帧缓存复用）"""
+        with self._pyramid_lock:
+            cached_image, levels = self._image_pyramid
+            if cached_image is not image:
+                levels = []
+            while len(levels) < level:
+                levels.append(cv2.pyrDown(levels[-1] if levels else image))
+            self._image_pyramid = (image, levels)
+            return levels[level - 1]
+
+    def _correlate(self, image: np.ndarray, template_info: Dict[str, Any]) -> Tuple[Optional[Tuple[int, int]], float]:
+        """
+        由粗到细的模板匹配：先在降采样图像上搜索，再在原图的小窗口内精确定位。
+        粗匹配得分远低于阈值时直接判定未命中；精确定位未达阈值但粗匹配接近阈值时回退原图全搜索，
+        保证与原图直接匹配的结果一致。
+        """
+        tpl = template_info['template']
+        h, w = tpl.shape[:2]
+        img_h, img_w = image.shape[:2]
+        pyramid = template_info.get('pyramid') or []
+        level = min(len(pyramid), self.pyramid_levels - 1)
+
+        # 搜索范围小（如ROI区域内匹配）时直接原图匹配
+        if level <= 0 or (img_w - w + 1) * (img_h - h + 1) < PYRAMID_MIN_SEARCH_POSITIONS:
+            return self._correlate_full(image, tpl)
+
+        level_tpl = pyramid[level - 1]
+        level_img = self._get_image_level(image, level)
+        if level_img.shape[0] < level_tpl.shape[0] or level_img.shape[1] < level_tpl.shape[1]:
+            return self._correlate_full(image, tpl)
+
+        result = cv2.matchTemplate(level_img, level_tpl, cv2.TM_CCOEFF_NORMED)
+        _, coarse_val, _, coarse_loc = cv2.minMaxLoc(result)
+        scale = 2 ** level
+        if coarse_val < template_info['threshold'] - PYRAMID_REJECT_MARGIN:
+            return (int(coarse_loc[0] * scale), int(coarse_loc[1] * scale)), float(coarse_val)
+
+        # 在原图中粗匹配位置附近的小窗口内精确定位
+        margin = scale * 2 + 2
+        x1 = max(0, coarse_loc[0] * scale - margin)
+        y1 = max(0, coarse_loc[1] * scale - margin)
+        x2 = min(img_w, coarse_loc[0] * scale + w + margin)
+        y2 = min(img_h, coarse_loc[1] * scale + h + margin)
+        if x2 - x1 >= w and y2 - y1 >= h:
+            refine_loc, refine_val = self._correlate_full(image[y1:y2, x1:x2], tpl)
+            if refine_loc is not None and refine_val >= template_info['threshold']:
+                return (refine_loc[0] + x1, refine_loc[1] + y1), refine_val
+
+        return self._correlate_full(image, tpl)
+
+    @staticmethod
+    def _correlate_full(image: np.ndarray, tpl: np.ndarray) -> Tuple[Optional[Tuple[int, int]], float]:
+        """原图分辨率下的模板匹配"""
+        result = cv2.matchTemplate(image, tpl, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_loc is not None and isinstance(max_loc, tuple) and len(max_loc) == 2:
+            return (int(max_loc[0]), int(max_loc[1])), float(max_val)
+        return None, float(max_val)
+
     def match_template(self, image: np.ndarray, template_info: Dict[str, Any]) -> Tuple[Optional[Tuple[int, int]], float]:
         """执行模板匹配并返回结果，支持灰度和三通道。若模板注册了hsv_range，则匹配后自动做颜色判定。"""
         if not template_info:
@@ -145,19 +245,13 @@ class TemplateManager:
         hsv_range = template_info.get('hsv_range', None)
         # 灰度模板
         if len(tpl.shape) == 2:
-            result = cv2.matchTemplate(image, tpl, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(result)
-            if max_loc is not None and isinstance(max_loc, tuple) and len(max_loc) == 2:
-                return (int(max_loc[0]), int(max_loc[1])), float(max_val)
-            else:
-                return None, float(max_val)
+            return self._correlate(image, template_info)
         # 彩色模板
         else:
-            result = cv2.matchTemplate(image, tpl, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(result)
-            if max_loc is not None and isinstance(max_loc, tuple) and len(max_loc) == 2:
+            max_loc, max_val = self._correlate(image, template_info)
+            if max_loc is not None:
                 h, w, _ = tpl.shape
-                x, y = int(max_loc[0]), int(max_loc[1])
+                x, y = max_loc
                 roi = image[y:y+h, x:x+w]
                 if roi.shape[0] != h or roi.shape[1] != w:
                     return None, float(max_val)
@@ -193,6 +287,62 @@ class TemplateManager:
             else:
                 return None, float(max_val)
 
+    def match_template_roi(self, image: np.ndarray, template_info: Dict[str, Any]) -> Tuple[Optional[Tuple[int, int]], float]:
+        """
+        只在模板的搜索区域内匹配（固定区域或根据历史命中位置学习的区域），
+        区域内连续未命中roi_fallback_misses次后回退全图搜索一次。返回值与match_template相同（全图坐标）。
+        """
+        if not template_info:
+            return None, 0
+        region = template_info.get('search_region') or template_info.get('learned_region')
+        full_frame = region is None or template_info.get('roi_misses', 0) >= self.roi_fallback_misses
+
+        if not full_frame:
+            img_h, img_w = image.shape[:2]
+            x1, y1, x2, y2 = region
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(img_w, x2), min(img_h, y2)
+            if x2 - x1 < template_info['w'] or y2 - y1 < template_info['h']:
+                full_frame = True
+
+        if full_frame:
+            max_loc, max_val = self.match_template(image, template_info)
+            template_info['roi_misses'] = 0
+        else:
+            max_loc, max_val = self.match_template(image[y1:y2, x1:x2], template_info)
+            if max_loc is not None:
+                max_loc = (max_loc[0] + x1, max_loc[1] + y1)
+
+        if max_loc is not None and max_val >= template_info['threshold']:
+            template_info['roi_misses'] = 0
+            self._learn_search_region(image, template_info, max_loc)
+        elif not full_frame:
+            template_info['roi_misses'] = template_info.get('roi_misses', 0) + 1
+        return max_loc, max_val
+
+    def _learn_search_region(self, image: np.ndarray, template_info: Dict[str, Any], loc: Tuple[int, int]):
+        """将本次命中位置并入模板的学习搜索区域"""
+        img_h, img_w = image.shape[:2]
+        margin = self.roi_margin
+        hit_region = (
+            max(0, loc[0] - margin),
+            max(0, loc[1] - margin),
+            min(img_w, loc[0] + template_info['w'] + margin),
+            min(img_h, loc[1] + template_info['h'] + margin),
+        )
+        learned = template_info.get('learned_region')
+        if learned is None:
+            template_info['learned_region'] = hit_region
+        else:
+            template_info['learned_region'] = (
+                min(learned[0], hit_region[0]),
+                min(learned[1], hit_region[1]),
+                max(learned[2], hit_region[2]),
+                max(learned[3], hit_region[3]),
+            )
+        if template_info['learned_region'] != learned:
+            logger.debug(f"模板 {template_info['name']} 搜索区域更新为: {template_info['learned_region']}")
+
     def load_evolution_template(self) -> Optional[Dict[str, Any]]:
         """加载进化按钮模板，完整HSV区间判定"""
         if self.evolution_template is None:
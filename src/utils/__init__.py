@@ -6,11 +6,18 @@
 from src.utils.resource_utils import resource_path
 from src.utils.gpu_utils import setup_gpu
 from src.utils.consent_utils import check_consent_file, save_consent, display_disclaimer_and_get_consent
+from src.utils.frame import Frame
+from src.utils.vision_pool import VisionWorkerPool
+from src.utils.ocr_service import OcrService, get_ocr_service
 
 __all__ = [
     'resource_path',
     'setup_gpu', 
     'check_consent_file',
     'save_consent',
-    'display_disclaimer_and_get_consent'
+    'display_disclaimer_and_get_consent',
+    'Frame',
+    'VisionWorkerPool',
+    'OcrService',
+    'get_ocr_service'
 ] 
\ No newline at end of file
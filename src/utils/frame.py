@@ -0,0 +1,185 @@
+"""
+截图帧对象
+封装一次截图的像素数据，按需计算并缓存BGR/灰度/HSV及区域裁剪，避免同一帧被多个识别模块重复转换
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+Box = Tuple[int, int, int, int]
+
+
+class Frame:
+    """
+    截图帧
+
+    可由PIL图像、RGB/RGBA/BGR数组构造。兼容原有PIL截图的常用接口（crop/save/size/np.array），
+    因此旧代码无需修改即可接收Frame。注意：Frame刻意不提供shape属性，
+    以免被 hasattr(screenshot, 'shape') 的判断误认为BGR数组。
+    """
+
+    def __init__(self, image: Optional[Image.Image] = None, rgb: Optional[np.ndarray] = None,
+                 bgr: Optional[np.ndarray] = None, rgba: Optional[np.ndarray] = None,
+                 timestamp: Optional[float] = None, seq: int = 0):
+        """
+        Args:
+            image: PIL图像
+            rgb / bgr / rgba: 像素数组（任选其一）
+            timestamp: 截图开始时间
+            seq: 帧序号
+        """
+        if image is None and rgb is None and bgr is None and rgba is None:
+            raise ValueError("Frame需要至少一种像素数据")
+        self._image = image
+        self._rgb = rgb
+        self._bgr = bgr
+        self._rgba = rgba
+        self._gray = None
+        self._hsv = None
+        self._regions: Dict[Tuple[str, Box], np.ndarray] = {}
+        self._lock = threading.RLock()
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.seq = seq
+
+    @classmethod
+    def from_any(cls, screenshot: Any, timestamp: Optional[float] = None) -> Optional["Frame"]:
+        """将PIL图像或BGR数组包装为Frame，已是Frame则原样返回"""
+        if screenshot is None or isinstance(screenshot, Frame):
+            return screenshot
+        if isinstance(screenshot, np.ndarray):
+            # 项目约定：直接传入的数组为OpenCV的BGR格式
+            return cls(bgr=screenshot, timestamp=timestamp)
+        return cls(image=screenshot, timestamp=timestamp)
+
+    # ------------------------------------------------------------------ 整帧数据
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """RGB数组"""
+        if self._rgb is None:
+            with self._lock:
+                if self._rgb is None:
+                    if self._rgba is not None:
+                        self._rgb = cv2.cvtColor(self._rgba, cv2.COLOR_RGBA2RGB)
+                    elif self._image is not None:
+                        self._rgb = np.asarray(self._image.convert('RGB'))
+                    else:
+                        self._rgb = cv2.cvtColor(self._bgr, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    @property
+    def bgr(self) -> np.ndarray:
+        """BGR数组（OpenCV格式）"""
+        if self._bgr is None:
+            with self._lock:
+                if self._bgr is None:
+                    if self._rgba is not None:
+                        self._bgr = cv2.cvtColor(self._rgba, cv2.COLOR_RGBA2BGR)
+                    else:
+                        self._bgr = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2BGR)
+        return self._bgr
+
+    @property
+    def gray(self) -> np.ndarray:
+        """灰度图"""
+        if self._gray is None:
+            with self._lock:
+                if self._gray is None:
+                    self._gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def hsv(self) -> np.ndarray:
+        """整帧HSV"""
+        if self._hsv is None:
+            with self._lock:
+                if self._hsv is None:
+                    self._hsv = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV)
+        return self._hsv
+
+    @property
+    def image(self) -> Image.Image:
+        """PIL图像"""
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    self._image = Image.fromarray(self.rgb)
+        return self._image
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(宽, 高)，与PIL一致"""
+        if self._image is not None:
+            return self._image.size
+        for array in (self._bgr, self._rgb, self._rgba):
+            if array is not None:
+                return array.shape[1], array.shape[0]
+        return 0, 0
+
+    # ------------------------------------------------------------------ 区域数据
+
+    def _region(self, kind: str, box: Box) -> np.ndarray:
+        key = (kind, tuple(int(v) for v in box))
+        region = self._regions.get(key)
+        if region is None:
+            x1, y1, x2, y2 = key[1]
+            if kind == 'bgr':
+                region = self.bgr[y1:y2, x1:x2]
+            elif kind == 'gray':
+                region = self._gray[y1:y2, x1:x2] if self._gray is not None else cv2.cvtColor(self.region_bgr(box), cv2.COLOR_BGR2GRAY)
+            else:
+                region = self._hsv[y1:y2, x1:x2] if self._hsv is not None else cv2.cvtColor(self.region_bgr(box), cv2.COLOR_BGR2HSV)
+            self._regions[key] = region
+        return region
+
+    def region_bgr(self, box: Box) -> np.ndarray:
+        """区域BGR图像（整帧BGR的视图，请勿原地修改）"""
+        return self._region('bgr', box)
+
+    def region_gray(self, box: Box) -> np.ndarray:
+        """区域灰度图"""
+        return self._region('gray', box)
+
+    def region_hsv(self, box: Box) -> np.ndarray:
+        """区域HSV图像"""
+        return self._region('hsv', box)
+
+    def subframe(self, box: Box) -> "Frame":
+        """裁剪出一个新的Frame（保留时间戳和序号）"""
+        x1, y1, x2, y2 = box
+        return Frame(bgr=self.bgr[y1:y2, x1:x2].copy(), timestamp=self.timestamp, seq=self.seq)
+
+    # ------------------------------------------------------------------ 兼容PIL接口
+
+    def crop(self, box: Box) -> Image.Image:
+        """兼容PIL的crop，返回PIL图像"""
+        return self.image.crop(box)
+
+    def save(self, fp, *args, **kwargs):
+        """兼容PIL的save"""
+        return self.image.save(fp, *args, **kwargs)
+
+    def __array__(self, dtype=None, copy=None):
+        """np.array(frame) 返回RGB数组，与np.array(PIL图像)一致"""
+        array = self.rgb
+        if dtype is not None:
+            array = array.astype(dtype)
+        if copy:
+            array = array.copy()
+        return array
+
+    def __repr__(self):
+        return f"Frame(seq={self.seq}, size={self.size}, timestamp={self.timestamp:.3f})"
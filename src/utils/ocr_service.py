@@ -0,0 +1,329 @@
+"""
+OCR识别服务
+进程内唯一的OCR模型由服务线程独占，各设备提交的数字图像在很短的等待窗口内合并成一批识别；
+进程模式下主进程通过本地套接字对设备进程提供同一个服务，设备进程不再各自加载OCR模型
+"""
+
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 合批等待窗口（秒）：收到第一个请求后最多等待这么久以合并其他设备的请求
+DEFAULT_BATCH_WINDOW = 0.01
+# 单批最多识别的数字图像数量
+DEFAULT_MAX_BATCH_CROPS = 64
+
+OcrResult = Optional[Tuple[str, float]]
+
+
+def recognize_digit_strip(reader, crops: List[np.ndarray]) -> List[OcrResult]:
+    """
+    批量OCR识别数字图像：将所有裁剪图横向拼接成一张图，
+    跳过文字检测器，直接对每个已知的数字框做一次批量识别
+
+    Args:
+        reader: EasyOCR Reader
+        crops: 数字图像列表(单通道)
+
+    Returns:
+        list: 与crops一一对应的 (文本, 置信度)，未识别到为None
+    """
+    results: List[OcrResult] = [None] * len(crops)
+    if not crops or not reader:
+        return results
+
+    gap = 16
+    strip_height = max(crop.shape[0] for crop in crops)
+    strip_width = sum(crop.shape[1] for crop in crops) + gap * (len(crops) + 1)
+    strip = np.zeros((strip_height, strip_width), dtype=np.uint8)
+
+    boxes = []  # [x_min, x_max, y_min, y_max]
+    x = gap
+    for crop in crops:
+        h, w = crop.shape[:2]
+        strip[0:h, x:x + w] = crop
+        boxes.append([x, x + w, 0, h])
+        x += w + gap
+
+    try:
+        ocr_results = reader.recognize(
+            strip, horizontal_list=boxes, free_list=[],
+            allowlist='0123456789', detail=1, batch_size=len(crops)
+        )
+        # 按识别框的x坐标映射回原裁剪图
+        for bbox, text, prob in ocr_results:
+            box_x = min(point[0] for point in bbox)
+            for i, (x_min, x_max, _, _) in enumerate(boxes):
+                if x_min - 1 <= box_x < x_max:
+                    if results[i] is None or prob > results[i][1]:
+                        results[i] = (text, prob)
+                    break
+    except Exception as e:
+        logger.warning(f"批量OCR识别失败，改为逐个识别: {str(e)}")
+        for i, crop in enumerate(crops):
+            try:
+                ocr_results = reader.readtext(crop, allowlist='0123456789', detail=1)
+                if ocr_results:
+                    best_result = max(ocr_results, key=lambda item: item[2])
+                    results[i] = (best_result[1], best_result[2])
+            except Exception as inner_e:
+                logger.error(f"OCR识别出错: {str(inner_e)}")
+    return results
+
+
+class _OcrRequest:
+    __slots__ = ('crops', 'future', 'submit_time')
+
+    def __init__(self, crops):
+        self.crops = crops
+        self.future = Future()
+        self.submit_time = time.time()
+
+
+class OcrService:
+    """
+    OCR识别服务（进程内单例）
+
+    - 服务线程独占OCR模型，调用方线程只提交请求并等待结果
+    - 收到请求后在batch_window内继续收集其他请求，合并成一张拼接图一次识别
+    """
+
+    def __init__(self, reader, batch_window: float = DEFAULT_BATCH_WINDOW,
+                 max_batch_crops: int = DEFAULT_MAX_BATCH_CROPS):
+        """
+        Args:
+            reader: EasyOCR Reader，None表示OCR不可用
+            batch_window: 合批等待窗口（秒）
+            max_batch_crops: 单批最多识别的数字图像数量
+        """
+        self.reader = reader
+        self.batch_window = batch_window
+        self.max_batch_crops = max_batch_crops
+        self._queue: "queue.Queue[_OcrRequest]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+
+        # 统计
+        self.batches = 0
+        self.requests = 0
+        self.crops = 0
+        self.max_batch_size = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.total_inference_time = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="OcrService", daemon=True)
+        self._thread.start()
+
+    @property
+    def available(self) -> bool:
+        return self.reader is not None
+
+    def recognize_digits(self, crops: List[np.ndarray], timeout: float = 10.0) -> List[OcrResult]:
+        """
+        识别一组数字图像（阻塞直到所在批次识别完成）
+
+        Returns:
+            list: 与crops一一对应的 (文本, 置信度)，未识别到或超时为None
+        """
+        if not crops or self.reader is None:
+            return [None] * len(crops)
+        request = _OcrRequest(list(crops))
+        self._queue.put(request)
+        try:
+            return request.future.result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"OCR服务识别失败: {str(e)}")
+            return [None] * len(crops)
+
+    def _run(self):
+        """服务线程：收集请求、合批识别并分发结果"""
+        while True:
+            batch = [self._queue.get()]
+            crop_count = len(batch[0].crops)
+            deadline = time.time() + self.batch_window
+            while crop_count < self.max_batch_crops:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                crop_count += len(request.crops)
+
+            crops = [crop for request in batch for crop in request.crops]
+            start_time = time.time()
+            try:
+                results = recognize_digit_strip(self.reader, crops)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            inference_time = time.time() - start_time
+
+            offset = 0
+            finish_time = time.time()
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.crops += len(crops)
+                self.max_batch_size = max(self.max_batch_size, len(crops))
+                self.total_inference_time += inference_time
+                for request in batch:
+                    latency = finish_time - request.submit_time
+                    self.total_latency += latency
+                    self.max_latency = max(self.max_latency, latency)
+            for request in batch:
+                request.future.set_result(results[offset:offset + len(request.crops)])
+                offset += len(request.crops)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取服务统计信息"""
+        with self._stats_lock:
+            batches = self.batches or 1
+            requests = self.requests or 1
+            return {
+                'batches': self.batches,
+                'requests': self.requests,
+                'crops': self.crops,
+                'avg_batch_size': self.crops / batches,
+                'avg_requests_per_batch': self.requests / batches,
+                'max_batch_size': self.max_batch_size,
+                'avg_latency': self.total_latency / requests,
+                'max_latency': self.max_latency,
+                'avg_inference_time': self.total_inference_time / batches,
+            }
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出服务统计信息"""
+        log = target_logger or logger
+        stats = self.get_stats()
+        log.info(f"OCR服务: {stats['batches']} 批 / {stats['requests']} 次请求 / {stats['crops']} 个数字, "
+                 f"平均每批 {stats['avg_batch_size']:.1f} 个数字 ({stats['avg_requests_per_batch']:.1f} 次请求, "
+                 f"最大 {stats['max_batch_size']}), 平均延迟 {stats['avg_latency'] * 1000:.0f}ms "
+                 f"(最大 {stats['max_latency'] * 1000:.0f}ms), 平均识别耗时 {stats['avg_inference_time'] * 1000:.0f}ms")
+
+
+class OcrServer:
+    """在本地套接字上提供OcrService，供设备进程调用（每个连接一个处理线程）"""
+
+    def __init__(self, service: OcrService):
+        self.service = service
+        self.authkey = os.urandom(16)
+        self._listener = Listener(('127.0.0.1', 0), authkey=self.authkey)
+        self.address = self._listener.address
+        self._thread = threading.Thread(target=self._accept_loop, name="OcrServer", daemon=True)
+        self._thread.start()
+        logger.info(f"OCR服务已在 {self.address[0]}:{self.address[1]} 上启动")
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                logger.error(f"OCR服务接受连接失败: {str(e)}")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), name="OcrServerConn", daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                crops = conn.recv()
+                conn.send(self.service.recognize_digits(crops))
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            logger.error(f"OCR服务处理请求出错: {str(e)}")
+        finally:
+            conn.close()
+
+
+class RemoteOcrClient:
+    """设备进程中的OCR服务客户端，接口与OcrService一致"""
+
+    def __init__(self, address, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._conn = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def recognize_digits(self, crops: List[np.ndarray], timeout: float = 10.0) -> List[OcrResult]:
+        if not crops:
+            return []
+        start_time = time.time()
+        with self._lock:
+            try:
+                if self._conn is None:
+                    self._conn = Client(tuple(self.address), authkey=self.authkey)
+                self._conn.send(list(crops))
+                if not self._conn.poll(timeout):
+                    raise TimeoutError("等待OCR服务结果超时")
+                results = self._conn.recv()
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"调用OCR服务失败: {str(e)}")
+                # 连接状态未知，下次重新连接
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+                return [None] * len(crops)
+            latency = time.time() - start_time
+            self.requests += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'avg_latency': self.total_latency / requests,
+            'max_latency': self.max_latency,
+        }
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出客户端统计信息（合批统计见主进程的OCR服务）"""
+        log = target_logger or logger
+        stats = self.get_stats()
+        log.info(f"OCR服务调用: {stats['requests']} 次 (失败 {stats['failures']}), "
+                 f"平均往返 {stats['avg_latency'] * 1000:.0f}ms, 最大 {stats['max_latency'] * 1000:.0f}ms")
+
+
+_ocr_service = None
+_ocr_service_lock = threading.Lock()
+
+
+def use_remote_ocr_service(address, authkey: bytes):
+    """设置本进程使用主进程提供的OCR服务（在创建GameManager之前调用）"""
+    global _ocr_service
+    with _ocr_service_lock:
+        _ocr_service = RemoteOcrClient(address, authkey)
+
+
+def get_ocr_service():
+    """获取本进程的OCR服务，首次调用时用全局OCR reader创建"""
+    global _ocr_service
+    with _ocr_service_lock:
+        if _ocr_service is None:
+            from src.utils.gpu_utils import get_easyocr_reader
+            _ocr_service = OcrService(get_easyocr_reader())
+        return _ocr_service
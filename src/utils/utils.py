@@ -1,55 +1,269 @@
-
 import cv2
 import numpy as np
 import time
-from skimage.metrics import structural_similarity as ssim
 
-def wait_for_screen_stable(device_state, timeout=10, threshold=0.90, interval=0.1, max_checks=1):
+
+class ScreenStableResult:
+    """画面稳定检测结果，布尔值表示是否稳定（与原返回值兼容），并记录实际等待时间"""
+
+    def __init__(self, stable, waited, score):
+        self.stable = stable
+        self.waited = waited
+        self.score = score
+
+    def __bool__(self):
+        return self.stable
+
+    def __repr__(self):
+        return f"ScreenStableResult(stable={self.stable}, waited={self.waited:.2f}s, score={self.score:.3f})"
+
+
+def make_thumbnail(screenshot, region=None, scale=0.125):
+    """
+    生成用于画面比较的灰度缩略图
+
+    :param screenshot: Frame对象
+    :param region: 可选比较区域 (x1, y1, x2, y2)，None表示整帧
+    :param scale: 缩放比例
+    """
+    gray = screenshot.region_gray(region) if region else screenshot.gray
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+def thumbnail_similarity(thumb_a, thumb_b, pixel_tolerance=12):
+    """
+    计算两张缩略图的相似度：灰度差不超过pixel_tolerance的像素比例，范围[0,1]
+    完全相同时直接返回1.0
+    """
+    if thumb_a.shape != thumb_b.shape:
+        return 0.0
+    if np.array_equal(thumb_a, thumb_b):
+        return 1.0
+    changed = np.count_nonzero(cv2.absdiff(thumb_a, thumb_b) > pixel_tolerance)
+    return 1.0 - changed / thumb_a.size
+
+
+def wait_for_screen_stable(device_state, timeout=10, threshold=0.98, interval=0.1, max_checks=1,
+                           region=None, scale=0.125, pixel_tolerance=12, label=""):
     """
-    等待设备屏幕稳定
+    等待设备屏幕稳定（比较相邻两帧的降采样灰度缩略图）
 
     :param device_state: 设备状态对象
     :param timeout: 超时时间（秒）
-    :param threshold: 图像相似度阈值
+    :param threshold: 稳定阈值，缩略图中未变化像素的比例
     :param interval: 截图间隔时间（秒）
     :param max_checks: 连续稳定画面的次数
-    :return: 如果屏幕稳定则返回True，超时返回False
+    :param region: 只比较指定区域 (x1, y1, x2, y2)，None表示整帧
+    :param scale: 缩略图缩放比例
+    :param pixel_tolerance: 灰度差小于等于该值的像素视为未变化
+    :param label: 调用位置说明，用于日志
+    :return: ScreenStableResult，布尔值为True表示屏幕稳定，False表示超时
     """
     start_time = time.time()
-    last_screenshot = None
+    last_thumbnail = None
     stable_count = 0
+    score = 0.0
     change_logged = False  # 添加状态标记，跟踪是否已经输出了画面变化日志
+    prefix = f"[{label}] " if label else ""
+    last_timestamp = None
 
     while time.time() - start_time < timeout:
-        screenshot = device_state.take_screenshot()
-        if screenshot is None:
+        # 启用截图预取时要求帧在本次轮询开始后截取，避免与上一帧是同一帧而误判稳定
+        poll_start = time.time()
+        screenshot = device_state.take_screenshot(min_timestamp=poll_start)
+        if screenshot is None or screenshot.timestamp == last_timestamp:
             time.sleep(interval)
             continue
+        last_timestamp = screenshot.timestamp
 
-        # 将PIL图像转换为OpenCV格式
-        frame = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2GRAY)
+        thumbnail = make_thumbnail(screenshot, region, scale)
 
-        if last_screenshot is not None:
-            # 计算SSIM
-            score, _ = ssim(last_screenshot, frame, full=True)
-            
-            if score > threshold:
+        if last_thumbnail is not None:
+            score = thumbnail_similarity(last_thumbnail, thumbnail, pixel_tolerance)
+
+            if score >= threshold:
                 stable_count += 1
                 change_logged = False  # 画面稳定时重置标记
-                # device_state.logger.info(f"画面稳定检测: {stable_count}/{max_checks} (稳定度: {score:.3f})")
             else:
                 if not change_logged:  # 只在第一次检测到变化时输出日志
-                    # device_state.logger.info(f"画面变化，重置稳定计数 (稳定度: {score:.3f})")
-                    device_state.logger.info(f"画面特效持续中... (稳定度: {score:.3f})")
+                    device_state.logger.info(f"{prefix}画面特效持续中... (稳定度: {score:.3f})")
                     change_logged = True  # 设置标记，避免重复输出
                 stable_count = 0
 
             if stable_count >= max_checks:
-                device_state.logger.info(f"画面已稳定 (稳定度: {score:.3f})")
-                return True
-        
-        last_screenshot = frame
+                waited = time.time() - start_time
+                device_state.logger.info(f"{prefix}画面已稳定 (稳定度: {score:.3f}, 等待 {waited:.2f}s)")
+                return ScreenStableResult(True, waited, score)
+
+        last_thumbnail = thumbnail
         time.sleep(interval)
 
-    device_state.logger.warning("等待画面稳定超时")
-    return False
+    waited = time.time() - start_time
+    device_state.logger.warning(f"{prefix}等待画面稳定超时 (等待 {waited:.2f}s)")
+    return ScreenStableResult(False, waited, score)
+
+
+# ============================= 条件等待 =============================
+
+class WaitResult:
+    """条件等待结果，布尔值表示条件是否满足"""
+
+    def __init__(self, satisfied, waited, frame=None):
+        self.satisfied = satisfied
+        self.waited = waited
+        self.frame = frame  # 满足条件时的截图帧
+
+    def __bool__(self):
+        return self.satisfied
+
+    def __repr__(self):
+        return f"WaitResult(satisfied={self.satisfied}, waited={self.waited:.2f}s)"
+
+
+class WaitCondition:
+    """等待条件基类：reset在开始等待时调用，check对每一帧判断条件是否满足"""
+
+    description = "条件"
+
+    def reset(self, device_state):
+        pass
+
+    def check(self, device_state, frame) -> bool:
+        raise NotImplementedError
+
+
+class TemplateVisible(WaitCondition):
+    """任一模板出现在画面中（灰度模板匹配灰度图，彩色模板匹配BGR图并做颜色判定）"""
+
+    def __init__(self, *template_infos, threshold=None):
+        """
+        Args:
+            template_infos: TemplateManager的模板信息字典
+            threshold: 匹配阈值，默认使用模板自身的阈值
+        """
+        self.template_infos = [info for info in template_infos if info]
+        self.threshold = threshold
+        self.description = "模板出现(" + ", ".join(info['name'] for info in self.template_infos) + ")"
+
+    def check(self, device_state, frame) -> bool:
+        template_manager = device_state.game_manager.template_manager
+        for info in self.template_infos:
+            image = frame.gray if len(info['template'].shape) == 2 else frame.bgr
+            max_loc, max_val = template_manager.match_template(image, info)
+            threshold = self.threshold if self.threshold is not None else info['threshold']
+            if max_loc is not None and max_val >= threshold:
+                return True
+        return False
+
+
+class RoiChanged(WaitCondition):
+    """区域画面相对等待开始时（或指定的基准帧）发生变化"""
+
+    def __init__(self, region=None, baseline=None, threshold=0.98, scale=0.125, pixel_tolerance=12):
+        """
+        Args:
+            region: 比较区域 (x1, y1, x2, y2)，None表示整帧
+            baseline: 基准帧，默认使用等待开始后的第一帧
+            threshold: 未变化像素比例低于该值视为已变化
+        """
+        self.region = region
+        self.baseline = baseline
+        self.threshold = threshold
+        self.scale = scale
+        self.pixel_tolerance = pixel_tolerance
+        self.description = "画面变化"
+        self._baseline_thumbnail = None
+
+    def reset(self, device_state):
+        self._baseline_thumbnail = make_thumbnail(self.baseline, self.region, self.scale) if self.baseline is not None else None
+
+    def check(self, device_state, frame) -> bool:
+        thumbnail = make_thumbnail(frame, self.region, self.scale)
+        if self._baseline_thumbnail is None:
+            self._baseline_thumbnail = thumbnail
+            return False
+        return thumbnail_similarity(self._baseline_thumbnail, thumbnail, self.pixel_tolerance) < self.threshold
+
+
+class RoiStable(WaitCondition):
+    """区域画面连续stable_checks次与上一帧基本一致"""
+
+    def __init__(self, region=None, stable_checks=2, threshold=0.98, scale=0.125, pixel_tolerance=12):
+        """
+        Args:
+            region: 比较区域 (x1, y1, x2, y2)，None表示整帧
+            stable_checks: 需要连续稳定的次数
+            threshold: 未变化像素比例不低于该值视为稳定
+        """
+        self.region = region
+        self.stable_checks = stable_checks
+        self.threshold = threshold
+        self.scale = scale
+        self.pixel_tolerance = pixel_tolerance
+        self.description = "画面稳定"
+        self._last_thumbnail = None
+        self._stable_count = 0
+
+    def reset(self, device_state):
+        self._last_thumbnail = None
+        self._stable_count = 0
+
+    def check(self, device_state, frame) -> bool:
+        thumbnail = make_thumbnail(frame, self.region, self.scale)
+        if self._last_thumbnail is not None:
+            if thumbnail_similarity(self._last_thumbnail, thumbnail, self.pixel_tolerance) >= self.threshold:
+                self._stable_count += 1
+            else:
+                self._stable_count = 0
+        self._last_thumbnail = thumbnail
+        return self._stable_count >= self.stable_checks
+
+
+def wait_until(device_state, condition, timeout=5.0, poll=0.1, min_wait=0.0, legacy_delay=None, label=""):
+    """
+    轮询截图直到条件满足或超时，用于替代固定时长的sleep
+
+    :param device_state: 设备状态对象
+    :param condition: WaitCondition对象
+    :param timeout: 超时时间（秒），替代固定等待时一般取原等待时长，保证不会比原来更慢
+    :param poll: 轮询间隔（秒）
+    :param min_wait: 最短等待时间（秒），期间不判断条件（等待动画开始）
+    :param legacy_delay: 原固定等待时长，用于日志对比和统计节省的时间
+    :param label: 调用位置说明，用于日志
+    :return: WaitResult，布尔值为True表示条件满足，False表示超时
+    """
+    start_time = time.time()
+    condition.reset(device_state)
+    if min_wait > 0:
+        time.sleep(min_wait)
+
+    satisfied = False
+    frame = None
+    last_timestamp = None
+    while True:
+        poll_start = time.time()
+        # 要求帧在本次轮询开始后截取；同一帧不重复判断，避免比较相邻帧的条件把同一帧误判为稳定
+        frame = device_state.take_screenshot(min_timestamp=poll_start)
+        if frame is not None and frame.timestamp != last_timestamp:
+            last_timestamp = frame.timestamp
+            try:
+                satisfied = condition.check(device_state, frame)
+            except Exception as e:
+                device_state.logger.warning(f"等待条件判断出错: {str(e)}")
+        if satisfied or time.time() - start_time >= timeout:
+            break
+        remaining = poll - (time.time() - poll_start)
+        if remaining > 0:
+            time.sleep(min(remaining, max(0.0, timeout - (time.time() - start_time))))
+
+    waited = time.time() - start_time
+    prefix = f"[{label}] " if label else ""
+    status = "已满足" if satisfied else "超时"
+    if legacy_delay is not None:
+        saved = legacy_delay - waited
+        if hasattr(device_state, 'wait_time_saved'):
+            device_state.wait_time_saved += saved
+        device_state.logger.info(f"{prefix}等待{condition.description}{status}: 实际 {waited:.2f}s / 原固定 {legacy_delay:.2f}s")
+    else:
+        device_state.logger.debug(f"{prefix}等待{condition.description}{status}: {waited:.2f}s")
+    return WaitResult(satisfied, waited, frame if satisfied else None)
@@ -0,0 +1,204 @@
+"""
+视觉任务线程池
+进程级共享的长期线程池，限制全局并发数，按设备轮转调度并支持优先级，避免多设备同时识别时线程过量
+"""
+
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 任务优先级（数值越小越优先）
+PRIORITY_CRITICAL = 0    # 回合内关键识别（手牌、随从、护盾）
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2  # 可延后的后台识别
+
+_PRIORITY_NAMES = {
+    PRIORITY_CRITICAL: "关键",
+    PRIORITY_NORMAL: "普通",
+    PRIORITY_BACKGROUND: "后台",
+}
+
+
+class _Task:
+    __slots__ = ('future', 'fn', 'args', 'kwargs', 'priority', 'submit_time')
+
+    def __init__(self, future, fn, args, kwargs, priority):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.submit_time = time.time()
+
+
+class VisionWorkerPool:
+    """
+    视觉任务线程池
+
+    - 全局并发上限：所有设备共享max_workers个工作线程
+    - 优先级：总是先执行最高优先级的任务
+    - 设备公平：同一优先级内按设备轮转取任务，单个设备提交大量任务时不会饿死其他设备
+    - 在工作线程内再次提交的任务直接在当前线程执行，避免嵌套等待导致死锁
+    """
+
+    _shared_pool: Optional["VisionWorkerPool"] = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def get_shared(cls) -> "VisionWorkerPool":
+        """获取进程级共享线程池"""
+        with cls._shared_lock:
+            if cls._shared_pool is None:
+                cls._shared_pool = cls()
+            return cls._shared_pool
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Args:
+            max_workers: 全局并发上限，默认min(8, CPU核心数)
+        """
+        self.max_workers = max_workers or min(8, os.cpu_count() or 4)
+        # 优先级 -> 设备 -> 任务队列；设备轮转顺序
+        self._queues: Dict[int, Dict[str, deque]] = {p: {} for p in _PRIORITY_NAMES}
+        self._device_order: Dict[int, deque] = {p: deque() for p in _PRIORITY_NAMES}
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._workers = []
+        self._pending = 0
+
+        # 统计
+        self.max_queue_depth = 0
+        self.tasks_completed = 0
+        self.tasks_inline = 0
+        self._wait_total: Dict[int, float] = {p: 0.0 for p in _PRIORITY_NAMES}
+        self._wait_max: Dict[int, float] = {p: 0.0 for p in _PRIORITY_NAMES}
+        self._wait_count: Dict[int, int] = {p: 0 for p in _PRIORITY_NAMES}
+
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"VisionWorker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"视觉任务线程池已启动: {self.max_workers} 个工作线程")
+
+    def submit(self, fn: Callable, *args, device: Optional[str] = None,
+               priority: int = PRIORITY_NORMAL, **kwargs) -> Future:
+        """
+        提交任务
+
+        Args:
+            fn: 任务函数
+            device: 提交任务的设备（用于公平调度），None表示公共任务
+            priority: 任务优先级
+
+        Returns:
+            Future: 任务结果，可配合 concurrent.futures.as_completed 使用
+        """
+        future = Future()
+        # 工作线程内嵌套提交的任务直接执行
+        if getattr(self._local, 'is_worker', False):
+            self.tasks_inline += 1
+            self._run(future, fn, args, kwargs)
+            return future
+
+        if priority not in self._queues:
+            priority = PRIORITY_NORMAL
+        device_key = device or "_shared"
+        task = _Task(future, fn, args, kwargs, priority)
+        with self._cond:
+            queues = self._queues[priority]
+            if device_key not in queues:
+                queues[device_key] = deque()
+                self._device_order[priority].append(device_key)
+            queues[device_key].append(task)
+            self._pending += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._pending)
+            self._cond.notify()
+        return future
+
+    def _next_task(self) -> Optional[_Task]:
+        """取出下一个任务：最高优先级中按设备轮转（调用方需持有锁）"""
+        for priority in sorted(self._queues):
+            order = self._device_order[priority]
+            queues = self._queues[priority]
+            while order:
+                device_key = order.popleft()
+                queue = queues[device_key]
+                task = queue.popleft()
+                if queue:
+                    order.append(device_key)
+                else:
+                    del queues[device_key]
+                return task
+        return None
+
+    def _worker_loop(self):
+        self._local.is_worker = True
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    self._cond.wait()
+                    task = self._next_task()
+                self._pending -= 1
+                waited = time.time() - task.submit_time
+                self._wait_total[task.priority] += waited
+                self._wait_count[task.priority] += 1
+                self._wait_max[task.priority] = max(self._wait_max[task.priority], waited)
+
+            self._run(task.future, task.fn, task.args, task.kwargs)
+            with self._cond:
+                self.tasks_completed += 1
+
+    @staticmethod
+    def _run(future: Future, fn: Callable, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队中的任务数"""
+        return self._pending
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取线程池统计信息"""
+        with self._cond:
+            waits = {}
+            for priority, name in _PRIORITY_NAMES.items():
+                count = self._wait_count[priority]
+                waits[name] = {
+                    'count': count,
+                    'avg_wait': self._wait_total[priority] / count if count else 0.0,
+                    'max_wait': self._wait_max[priority],
+                }
+            return {
+                'max_workers': self.max_workers,
+                'queue_depth': self._pending,
+                'max_queue_depth': self.max_queue_depth,
+                'tasks_completed': self.tasks_completed,
+                'tasks_inline': self.tasks_inline,
+                'waits': waits,
+            }
+
+    def log_stats(self, target_logger: Optional[logging.Logger] = None):
+        """输出线程池统计信息"""
+        log = target_logger or logger
+        stats = self.get_stats()
+        log.info(f"视觉线程池: {stats['max_workers']} 线程, 当前排队 {stats['queue_depth']}, "
+                 f"最大排队 {stats['max_queue_depth']}, 完成 {stats['tasks_completed']} 个 "
+                 f"(嵌套直接执行 {stats['tasks_inline']} 个)")
+        for name, wait in stats['waits'].items():
+            if wait['count']:
+                log.info(f"  [{name}] {wait['count']} 个任务, 平均等待 {wait['avg_wait'] * 1000:.1f}ms, "
+                         f"最大等待 {wait['max_wait'] * 1000:.1f}ms")